@@ -0,0 +1,104 @@
+"""Compare building dashboard figures from scratch with the cached skeletons.
+
+Reports server-side build time (figure construction plus the JSON
+serialisation st.plotly_chart performs) and the payload size sent to the
+browser.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from benchmarks.common import best_of, report
+from utils import chart_templates
+
+
+def legacy_dashboard(health_score, risk_factors, health_trends):
+    """The per-rerun figure construction the dashboard used before skeletons."""
+    gauge = go.Figure(go.Indicator(
+        mode="gauge+number", value=health_score, title={'text': "Health Score"},
+        domain={'x': [0, 1], 'y': [0, 1]},
+        gauge={'axis': {'range': [0, 100]}, 'bar': {'color': "#0066cc"},
+               'steps': [{'range': [0, 50], 'color': "lightgray"},
+                         {'range': [50, 75], 'color': "gray"},
+                         {'range': [75, 100], 'color': "darkgray"}]}
+    ))
+    radar = go.Figure()
+    radar.add_trace(go.Scatterpolar(r=list(risk_factors.values()),
+                                    theta=list(risk_factors.keys()),
+                                    fill='toself', name='Risk Factors'))
+    radar.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+                        showlegend=False)
+    trends = go.Figure()
+    for metric in chart_templates.TREND_METRICS:
+        trends.add_trace(go.Scatter(x=health_trends['dates'], y=health_trends[metric],
+                                    name=metric.replace('_', ' ').title()))
+    trends.update_layout(xaxis_title="Date", yaxis_title="Value", hovermode='x unified')
+    return [gauge, radar, trends]
+
+
+def legacy_timeline(recommendations):
+    """One bar trace per activity, as the treatment plan page used to build it."""
+    fig = go.Figure()
+    base_date = datetime.now()
+    for category, items in recommendations.items():
+        for i, item in enumerate(items):
+            activity = f"{category}: {item}"
+            start = base_date + timedelta(days=i * 7)
+            span = (f"{start.strftime('%Y-%m-%d')} to "
+                    f"{(start + timedelta(days=28)).strftime('%Y-%m-%d')}")
+            fig.add_trace(go.Bar(
+                name=activity, x=[28], y=[activity], orientation='h',
+                marker_color=chart_templates.CATEGORY_COLORS.get(
+                    category, chart_templates.DEFAULT_CATEGORY_COLOR),
+                text=span, hovertext=f"{activity}<br>{span}"))
+    fig.update_layout(title="Treatment Schedule Timeline", xaxis_title="Duration (days)",
+                      showlegend=False, height=400, margin=dict(l=10, r=10, t=30, b=10))
+    return fig
+
+
+def cached_dashboard(health_score, risk_factors, health_trends):
+    return [chart_templates.health_score_gauge(health_score),
+            chart_templates.risk_radar(risk_factors),
+            chart_templates.trends_chart(health_trends)]
+
+
+def render(build, *args):
+    """Build figures and serialise them the way st.plotly_chart does."""
+    figures = build(*args)
+    figures = figures if isinstance(figures, list) else [figures]
+    return sum(len(pio.to_json(fig.to_dict(), validate=False)) for fig in figures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--activities', type=int, default=60)
+    args = parser.parse_args()
+
+    risk_factors = {'heart_disease': 0.4, 'diabetes': 0.7, 'cancer': 0.2, 'alzheimers': 0.1}
+    health_trends = {'dates': [f'2023-{m:02d}-28' for m in range(1, 13)],
+                     'blood_pressure': list(range(12)), 'glucose_levels': list(range(12)),
+                     'cholesterol': list(range(12))}
+    recommendations = {category: [f"Recommendation {i}" for i in range(args.activities // 3)]
+                       for category in ['Medications', 'Lifestyle Changes', 'Preventive Measures']}
+    chart_templates._skeleton.cache_clear()
+    render(cached_dashboard, 80, risk_factors, health_trends)  # warm the skeletons
+    render(chart_templates.schedule_timeline, recommendations)
+
+    rows = []
+    for label, build, arguments in [
+        ("dashboard, scratch", legacy_dashboard, (80, risk_factors, health_trends)),
+        ("dashboard, skeleton", cached_dashboard, (80, risk_factors, health_trends)),
+        ("timeline, N traces", legacy_timeline, (recommendations,)),
+        ("timeline, 1 trace", chart_templates.schedule_timeline, (recommendations,)),
+    ]:
+        elapsed = best_of(render, build, *arguments, repeat=20)
+        payload = render(build, *arguments)
+        rows.append((label, f"{elapsed * 1000:7.2f} ms  {payload / 1024:8.1f} KiB"))
+
+    report(f"Dashboard figures ({args.activities} timeline activities)", rows)
+
+
+if __name__ == '__main__':
+    main()
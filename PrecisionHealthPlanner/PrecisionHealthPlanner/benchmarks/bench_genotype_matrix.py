@@ -0,0 +1,68 @@
+"""Compare long-format genetic DataFrames with the packed GenotypeMatrix.
+
+Reports bytes per call, conversion time, cohort scoring time on each
+representation, and the time to memory-map a saved matrix.
+"""
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import best_of, report
+from utils.data_processor import GENE_RISK_WEIGHTS, DataProcessor
+from utils.genotype_matrix import GenotypeMatrix
+
+# Genes outside the risk model, to widen the matrix
+EXTRA_GENES = [f'GENE{i:04d}' for i in range(56)]
+
+
+def make_calls(n_patients, genes, seed=0):
+    """One call per patient and gene, as a genotyping panel would produce."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'patient_id': np.repeat(np.arange(n_patients), len(genes)),
+        'gene': np.tile(np.array(genes, dtype=object), n_patients),
+        'variant': rng.choice(np.array(['wild', 'het', 'hom'], dtype=object),
+                              n_patients * len(genes), p=[0.8, 0.15, 0.05]),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=100_000)
+    args = parser.parse_args()
+
+    genes = list(GENE_RISK_WEIGHTS) + EXTRA_GENES
+    calls = make_calls(args.patients, genes)
+    n_calls = len(calls)
+    categorical = calls.astype({'gene': 'category', 'variant': 'category'})
+
+    matrix = GenotypeMatrix.from_dataframe(categorical, genes)
+    convert_time = best_of(GenotypeMatrix.from_dataframe, categorical, genes, repeat=1)
+    long_time = best_of(DataProcessor.process_cohort_genetic_data, categorical, repeat=1)
+    packed_time = best_of(DataProcessor.process_genotype_matrix, matrix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix.save(tmp)
+        load_time = best_of(GenotypeMatrix.load, tmp)
+        loaded = GenotypeMatrix.load(tmp)
+        mapped_time = best_of(DataProcessor.process_genotype_matrix, loaded)
+
+    def per_call(frame):
+        return frame.memory_usage(deep=True).sum() / n_calls
+
+    report(f"Genotypes, {args.patients:,} patients x {len(genes)} genes", [
+        ("string DataFrame", f"{per_call(calls):8.2f} bytes/call"),
+        ("categorical DataFrame", f"{per_call(categorical):8.2f} bytes/call"),
+        ("GenotypeMatrix", f"{matrix.nbytes / n_calls:8.2f} bytes/call"),
+        ("convert categorical", f"{convert_time * 1000:8.1f} ms"),
+        ("score long format", f"{long_time * 1000:8.1f} ms"),
+        ("score packed", f"{packed_time * 1000:8.1f} ms"),
+        ("load (mmap)", f"{load_time * 1000:8.2f} ms"),
+        ("score packed, mmap", f"{mapped_time * 1000:8.1f} ms"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
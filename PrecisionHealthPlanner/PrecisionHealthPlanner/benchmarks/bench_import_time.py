@@ -0,0 +1,95 @@
+"""Profile cold-start import time of the app entry points with ``-X importtime``.
+
+Each entry point is imported in a fresh interpreter. The report lists the
+total import time and the cumulative cost of the heavy optional
+dependencies; ``--check`` exits non-zero if an entry point eagerly
+imports a dependency it is supposed to load lazily.
+
+Refresh the checked-in report with::
+
+    python -m benchmarks.bench_import_time --output benchmarks/results/import_time.txt
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that should only load when their feature is used
+HEAVY_MODULES = ('twilio', 'reportlab', 'plotly', 'pandas', 'numpy', 'streamlit')
+
+# Loading less than this much of a lazy dependency (e.g. a bare package
+# __init__ touched by streamlit's optional integrations) is tolerated
+LAZY_BUDGET_MS = 5.0
+
+# entry point -> heavy modules it must not import at load time
+ENTRY_POINTS = {
+    'main.py': ('twilio', 'reportlab', 'plotly'),
+    'pages/01_patient_input.py': ('twilio', 'reportlab', 'plotly'),
+    'pages/02_analysis_dashboard.py': ('twilio', 'reportlab', 'plotly'),
+    'pages/03_treatment_plan.py': ('twilio', 'reportlab', 'plotly'),
+    'pages/04_population_dashboard.py': ('twilio', 'reportlab', 'plotly'),
+    'utils/notification_service.py': ('twilio',),
+}
+
+LOADER = (
+    "import importlib.util, sys\n"
+    "spec = importlib.util.spec_from_file_location('entry_point', sys.argv[1])\n"
+    "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+)
+
+
+def profile(entry_point):
+    """Return {heavy module: microseconds spent in its own code} and the total."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', LOADER, entry_point],
+        cwd=APP_DIR, capture_output=True, text=True,
+        env={**os.environ, 'PYTHONPATH': APP_DIR},
+    )
+    costs = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        total += int(self_us)
+        package = name.strip().split('.')[0]
+        if package in HEAVY_MODULES:
+            costs[package] = costs.get(package, 0) + int(self_us)
+    return costs, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help="write the report to this file as well")
+    parser.add_argument('--check', action='store_true',
+                        help="fail if an entry point eagerly imports a lazy dependency")
+    args = parser.parse_args()
+
+    lines = []
+    violations = []
+    for entry_point, forbidden in ENTRY_POINTS.items():
+        costs, total = profile(entry_point)
+        lines.append(f"{entry_point}: {total / 1000:,.1f} ms total")
+        for module in HEAVY_MODULES:
+            if module in costs:
+                lines.append(f"  {module:<10} {costs[module] / 1000:>9,.1f} ms")
+                if module in forbidden and costs[module] / 1000 > LAZY_BUDGET_MS:
+                    violations.append(f"{entry_point} imports {module} at load time")
+    if violations:
+        lines.append('')
+        lines.extend(violations)
+
+    report = '\n'.join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    if args.check and violations:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
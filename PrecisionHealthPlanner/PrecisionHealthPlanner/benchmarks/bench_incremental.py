@@ -0,0 +1,77 @@
+"""Time re-evaluating the analysis after each kind of patient edit.
+
+A stored patient with a large genetic table is evaluated once, then each
+section is edited in turn and the nodes it recomputed are listed.
+tests/test_incremental.py checks which nodes each edit must recompute.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import make_cohort, report
+from utils.analysis_cache import analysis_graph, evaluate
+from utils.patient_repository import PatientRepository, StoredPatient
+
+ALL_NODES = ['risk_factors', 'health_score', 'health_trends', 'recommendations',
+             'timeline', 'treatment_plan_key']
+
+# Edits applied to the stored patient, in order
+EDITS = [
+    ("no change", None, None),
+    ("smoking status", 'lifestyle_factors', {'smoking_status': 'Never'}),
+    ("medication list", 'medical_history', {'medications': ['statin']}),
+    ("weight", 'personal_info', {'weight': 95}),
+    ("genetic data", 'genetic_data', None),
+]
+
+
+def make_patient(genetic_rows):
+    genetic_data = make_cohort(1, genes_per_patient=genetic_rows)[['gene', 'variant']]
+    return {
+        'personal_info': {'name': 'Bench Patient', 'age': 52, 'gender': 'Female',
+                          'height': 165, 'weight': 80},
+        'medical_history': {'conditions': ['Diabetes'], 'medications': [],
+                            'allergies': []},
+        'lifestyle_factors': {'exercise_frequency': 'Rarely', 'smoking_status': 'Current',
+                              'alcohol_consumption': 'Moderate', 'diet_type': 'Balanced'},
+        'genetic_data': genetic_data,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--genetic-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = PatientRepository(os.path.join(tmp, 'patients.db'))
+        patient_data = make_patient(args.genetic_rows)
+        patient = StoredPatient(repository.save(patient_data), repository)
+        analysis_graph.cache.clear()
+
+        start = time.perf_counter()
+        first = evaluate(patient, ALL_NODES)
+        rows = [("initial", f"{(time.perf_counter() - start) * 1000:8.1f} ms  "
+                            f"{len(first.recomputed)} nodes")]
+
+        for label, section, changes in EDITS:
+            if section == 'genetic_data':
+                genetic_data = patient['genetic_data'].copy()
+                genetic_data.loc[0, 'variant'] = (
+                    'wild' if genetic_data.loc[0, 'variant'] != 'wild' else 'hom')
+                patient[section] = genetic_data
+            elif section is not None:
+                patient[section] = {**patient[section], **changes}
+
+            start = time.perf_counter()
+            evaluation = evaluate(patient, ALL_NODES)
+            elapsed = time.perf_counter() - start
+            rows.append((label, f"{elapsed * 1000:8.1f} ms  "
+                                f"{', '.join(evaluation.recomputed) or '-'}"))
+
+    report(f"Incremental analysis ({args.genetic_rows:,} genetic rows)", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Load-test one app instance with concurrent simulated clinician sessions.
+
+Each session repeatedly walks the app the way a clinician would: the home
+page, patient input (form save plus a genetic CSV upload), the analysis
+dashboard, the treatment plan (PDF, full report and SMS reminders) and
+the population dashboard. Sessions are threads in this process, like the
+sessions of one Streamlit server, and every page is rendered by
+Streamlit's AppTest. Twilio is replaced by the stub client and all state
+goes to a temporary data directory, so the run is fully offline::
+
+    python -m benchmarks.bench_load --sessions 8 --walks 3
+
+Reports p50/p95/p99 latency per step, walk and page throughput, and the
+memory retained per session (measured in a second, traced phase).
+"""
+import argparse
+import gc
+import io
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+# Sessions write patients, PDFs and reminders, and the stub notification service
+# runs a real reminder worker; keep all of it out of the live data and shared state
+os.environ['HEALTH_PLANNER_DATA_DIR'] = tempfile.mkdtemp(prefix='health-planner-load-')
+os.environ['HEALTH_PLANNER_STATE'] = 'sqlite'
+
+import numpy as np
+
+from benchmarks.bench_recommendations import LIFESTYLE_OPTIONS
+from benchmarks.bench_sms_dispatch import FakeTwilioClient
+from benchmarks.common import make_cohort, report
+
+# AppTest script timeout per page run, in seconds
+PAGE_TIMEOUT = 120
+
+FROM_NUMBER = '+15550000000'
+
+# Steps of one walk, in order
+STEPS = ('home', 'patient_input', 'patient_input.save', 'genetic_upload',
+         'analysis_dashboard', 'treatment_plan', 'treatment_plan.pdf',
+         'treatment_plan.full_report', 'treatment_plan.reminders', 'population_dashboard')
+
+
+def install_shared_runtime():
+    """Let AppTest runs overlap on several threads.
+
+    AppTest installs a mock Runtime for each run and removes it afterwards,
+    which would pull it from under runs on other threads. One shared mock
+    is installed instead, with an in-memory media store so download
+    buttons register their files as they would on a server. Runs also
+    share one script cache, as a server's sessions do; with a cache per
+    run every page is recompiled concurrently, which Python 3.11's
+    ``compile`` does not reliably survive.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import (
+        MemoryCacheStorageManager)
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    # AppTest's per-run install and removal now go to a throwaway class
+    app_test.Runtime = type('RuntimeSlot', (), {'_instance': None})
+    config.set_option('global.appTest', True)
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+
+
+def install_stub_notifications(latency):
+    """Route reminders through the stub Twilio client; returns it and the service."""
+    from utils import notification_service
+
+    client = FakeTwilioClient(latency=latency)
+    service = notification_service.NotificationService(client=client, from_number=FROM_NUMBER)
+    # Pages import get_notification_service when a reminder is set up
+    notification_service.get_notification_service = lambda: service
+    return client, service
+
+
+def genetic_csv(genes_per_patient, seed):
+    calls = make_cohort(1, genes_per_patient=genes_per_patient, seed=seed)
+    return calls[['gene', 'variant']].to_csv(index=False).encode()
+
+
+class Session:
+    """One simulated clinician; records (step, seconds, error) per page run.
+
+    Like a browser session it keeps one session state across pages, and
+    every page is reached from ``main.py``.
+    """
+
+    def __init__(self, index, genes_per_patient):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.genes_per_patient = genes_per_patient
+        self.rng = np.random.default_rng(index)
+        self.app = AppTest.from_file('main.py', default_timeout=PAGE_TIMEOUT)
+        self.timings = []
+
+    def run(self, step, action):
+        """Time one page run; a page error or exception marks it failed."""
+        start = time.perf_counter()
+        try:
+            at = action()
+        except Exception as e:
+            self.timings.append((step, time.perf_counter() - start, f"{type(e).__name__}: {e}"))
+            raise
+        elapsed = time.perf_counter() - start
+        problems = [e.value for e in at.exception] + [e.value for e in at.error]
+        self.timings.append((step, elapsed, str(problems[0]) if problems else None))
+        return at
+
+    def visit(self, step, page):
+        return self.run(step, lambda: self.app.switch_page(page).run())
+
+    def walk(self, walk):
+        from utils.data_processor import DataProcessor
+
+        at = self.visit('home', 'main.py')
+        at = self.visit('patient_input', 'pages/01_patient_input.py')
+        [t for t in at.text_input if t.label == "Full Name"][0].input(
+            f"Load Patient {self.index}-{walk}")
+        for label, value in [("Age", int(self.rng.integers(18, 90))),
+                             ("Height (cm)", int(self.rng.integers(150, 200))),
+                             ("Weight (kg)", int(self.rng.integers(50, 120)))]:
+            [n for n in at.number_input if n.label == label][0].set_value(value)
+        for box in at.selectbox:
+            field = box.label.lower().replace(' ', '_')
+            if field in LIFESTYLE_OPTIONS:
+                box.set_value(str(self.rng.choice(LIFESTYLE_OPTIONS[field])))
+        save = [b for b in at.button if b.label == "Save Patient Data"][0]
+        at = self.run('patient_input.save', save.click().run)
+
+        # AppTest cannot drive st.file_uploader, so the upload is replayed
+        # through the same parser and stored on the saved patient
+        patient_data = at.session_state['patient_data']
+        csv = genetic_csv(self.genes_per_patient, seed=self.index * 1000 + walk)
+
+        def upload():
+            patient_data['genetic_data'] = DataProcessor.read_genetic_csv(io.BytesIO(csv))
+            return at
+        self.run('genetic_upload', upload)
+
+        self.visit('analysis_dashboard', 'pages/02_analysis_dashboard.py')
+        at = self.visit('treatment_plan', 'pages/03_treatment_plan.py')
+        for step, label in [('treatment_plan.pdf', "Generate Detailed PDF Report"),
+                            ('treatment_plan.full_report',
+                             "Generate Full Report with Health Trends")]:
+            button = [b for b in at.button if b.label == label][0]
+            at = self.run(step, button.click().run)
+        at = at.toggle[0].set_value(True).run()
+        [t for t in at.text_input if t.label == "Phone number for reminders"][0].input(
+            f'+1555{self.index:03d}{walk:04d}')
+        button = [b for b in at.button if b.label == "Set Up Reminders"][0]
+        self.run('treatment_plan.reminders', button.click().run)
+        self.visit('population_dashboard', 'pages/04_population_dashboard.py')
+
+
+def run_sessions(n_sessions, walks, genes_per_patient):
+    """Run sessions concurrently; returns (sessions, wall seconds)."""
+    sessions = [Session(i, genes_per_patient) for i in range(n_sessions)]
+    start_barrier = threading.Barrier(n_sessions)
+
+    def drive(session):
+        start_barrier.wait()
+        for walk in range(walks):
+            try:
+                session.walk(walk)
+            except Exception as e:
+                # A failed page run is already recorded; anything else ends the walk here
+                if not (session.timings and session.timings[-1][2]):
+                    session.timings.append(('walk', 0.0, f"{type(e).__name__}: {e}"))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_sessions) as executor:
+        list(executor.map(drive, sessions))
+    return sessions, time.perf_counter() - start
+
+
+def measure_memory(n_sessions, genes_per_patient):
+    """Retained bytes per session and peak traced bytes, for one concurrent walk."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sessions, _ = run_sessions(n_sessions, 1, genes_per_patient)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Sessions, and with them their session state, are still referenced here
+    assert len(sessions) == n_sessions
+    return (current - baseline) / n_sessions, peak - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=8, help="concurrent sessions")
+    parser.add_argument('--walks', type=int, default=3, help="walks per session")
+    parser.add_argument('--genes', type=int, default=2_000,
+                        help="variant calls per uploaded genetic CSV")
+    parser.add_argument('--sms-latency', type=float, default=0.05)
+    parser.add_argument('--memory-sessions', type=int, default=4,
+                        help="sessions in the traced memory phase (0 to skip)")
+    args = parser.parse_args()
+
+    install_shared_runtime()
+    client, service = install_stub_notifications(args.sms_latency)
+
+    # One untimed walk loads modules and warms the per-process caches
+    run_sessions(1, 1, args.genes)
+    sessions, elapsed = run_sessions(args.sessions, args.walks, args.genes)
+
+    timings = [timing for session in sessions for timing in session.timings]
+    rows = []
+    for step in STEPS:
+        seconds = np.array([s for name, s, _ in timings if name == step]) * 1000
+        if not len(seconds):
+            continue
+        failed = sum(1 for name, _, error in timings if name == step and error)
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+        rows.append((step, f"{p50:8.1f} {p95:8.1f} {p99:8.1f} ms  n={len(seconds)}"
+                           + (f"  failed={failed}" if failed else "")))
+    completed = sum(1 for session in sessions
+                    for name, _, error in session.timings
+                    if name == 'population_dashboard' and not error)
+    rows += [
+        ("walks completed", f"{completed} / {args.sessions * args.walks} "
+                            f"({completed / elapsed:.2f} walks/s)"),
+        ("page runs", f"{len(timings)} ({len(timings) / elapsed:.1f} runs/s)"),
+    ]
+
+    if args.memory_sessions:
+        per_session, peak = measure_memory(args.memory_sessions, args.genes)
+        rows += [
+            ("retained per session", f"{per_session / 1024:,.0f} KiB"),
+            (f"peak, {args.memory_sessions} sessions", f"{peak / 2**20:,.1f} MiB"),
+        ]
+
+    # Fire everything still waiting out its coalescing window
+    scheduler = service.scheduler
+    scheduler.stop()
+    scheduler.run_pending(scheduler.clock() + scheduler.window)
+    service.dispatcher.shutdown()
+    rows.append(("SMS sent to stub", f"{len(client.sent)}"))
+    report(f"Load test, {args.sessions} sessions x {args.walks} walks "
+           f"in {elapsed:.1f} s (step: p50 p95 p99)", rows)
+
+    errors = {error for _, _, error in timings if error}
+    for error in sorted(errors)[:5]:
+        print(f"  error: {error}")
+
+
+if __name__ == '__main__':
+    main()
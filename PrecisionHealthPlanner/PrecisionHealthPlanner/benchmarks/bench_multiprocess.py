@@ -0,0 +1,146 @@
+"""Local multi-process load test of the shared state layer.
+
+Spawns 1..N worker processes, as a load balancer would put in front of
+several Streamlit servers, and measures:
+
+* analysis throughput when each patient is requested several times by
+  different workers, with process-local caches (``memory`` backend)
+  against the shared ``sqlite`` backend, and how many analyses each
+  configuration actually computed;
+* the aggregate SMS send rate under per-process rate limiters against one
+  shared limit.
+
+On a single-core machine the workers time-share one CPU, so throughput
+cannot scale with worker count there; run it on the deployment host.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import make_cohort, report
+
+LIFESTYLE = {
+    'exercise_frequency': ['Regular', 'Occasional', 'Rarely', 'Never'],
+    'smoking_status': ['Never', 'Former', 'Current'],
+    'alcohol_consumption': ['None', 'Occasional', 'Moderate', 'Heavy'],
+    'diet_type': ['Balanced', 'Vegetarian', 'Vegan', 'Keto', 'Other'],
+}
+
+
+def make_patient(index, genetic_rows):
+    rng = np.random.default_rng(index)
+    cohort = make_cohort(1, genes_per_patient=genetic_rows, seed=index)
+    return {
+        'personal_info': {'name': f'Patient {index}', 'age': int(rng.integers(18, 90)),
+                          'gender': 'Female', 'height': 170, 'weight': int(rng.integers(50, 110))},
+        'medical_history': {'conditions': [], 'medications': [], 'allergies': []},
+        'lifestyle_factors': {field: str(rng.choice(options))
+                              for field, options in LIFESTYLE.items()},
+        'genetic_data': cohort[['gene', 'variant']],
+    }
+
+
+def analysis_worker(job):
+    """Serve a list of patient requests; returns (requests, computed, seconds)."""
+    requests, genetic_rows, start_at = job
+    from utils import analysis_cache
+
+    computed = 0
+    evaluate = analysis_cache.evaluate
+
+    def counting_evaluate(*args, **kwargs):
+        nonlocal computed
+        evaluation = evaluate(*args, **kwargs)
+        computed += 'health_score' in evaluation.recomputed
+        return evaluation
+
+    analysis_cache.evaluate = counting_evaluate
+    patients = {index: make_patient(index, genetic_rows) for index in set(requests)}
+    time.sleep(max(0.0, start_at - time.time()))
+    start = time.perf_counter()
+    for index in requests:
+        analysis_cache.get_patient_analysis(patients[index])
+    return len(requests), computed, time.perf_counter() - start
+
+
+def sms_worker(job):
+    """Send messages through a fake client; returns (messages, seconds)."""
+    n_messages, rate, shared, start_at = job
+    from benchmarks.bench_sms_dispatch import FakeTwilioClient
+    from utils.shared_state import SharedRateLimiter, get_shared_state
+    from utils.sms_dispatcher import RateLimiter, SMSDispatcher
+
+    limiter = (SharedRateLimiter(get_shared_state(), 'bench-sms', rate) if shared
+               else RateLimiter(rate))
+    dispatcher = SMSDispatcher(FakeTwilioClient(latency=0.0), '+15550000000',
+                               concurrency=4, rate_limiter=limiter)
+    time.sleep(max(0.0, start_at - time.time()))
+    start = time.perf_counter()
+    futures = [dispatcher.submit('+15551234567', f'message {i}') for i in range(n_messages)]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+    dispatcher.shutdown()
+    return n_messages, elapsed
+
+
+def run(worker, jobs, backend):
+    """Run one job per fresh worker process against ``backend``."""
+    os.environ['HEALTH_PLANNER_STATE'] = backend
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ['HEALTH_PLANNER_DATA_DIR'] = data_dir
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(len(jobs)) as pool:
+            return pool.map(worker, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--patients', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=4,
+                        help='times each patient is requested, spread over workers')
+    parser.add_argument('--genetic-rows', type=int, default=20_000)
+    parser.add_argument('--messages', type=int, default=250)
+    parser.add_argument('--rate', type=float, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    requests = rng.permutation(np.repeat(np.arange(args.patients), args.repeats)).tolist()
+    startup = 5.0  # seconds for spawned workers to import and build patients
+
+    rows = []
+    for backend in ['memory', 'sqlite']:
+        for n_workers in args.workers:
+            start_at = time.time() + startup + args.patients * args.genetic_rows / 2e6
+            jobs = [(requests[i::n_workers], args.genetic_rows, start_at)
+                    for i in range(n_workers)]
+            results = run(analysis_worker, jobs, backend)
+            served = sum(r[0] for r in results)
+            computed = sum(r[1] for r in results)
+            elapsed = max(r[2] for r in results)
+            rows.append((f"{backend:<6} x{n_workers}",
+                         f"{served / elapsed:8.1f} analyses/s  computed {computed:4d}"
+                         f" of {args.patients} patients"))
+    report(f"Analysis load ({args.patients} patients x {args.repeats} requests)", rows)
+
+    rows = []
+    for shared, label in [(False, 'per-process'), (True, 'shared')]:
+        for n_workers in args.workers:
+            start_at = time.time() + startup
+            results = run(sms_worker,
+                          [(args.messages, args.rate, shared, start_at)] * n_workers,
+                          'sqlite')
+            sent = sum(r[0] for r in results)
+            elapsed = max(r[1] for r in results)
+            rows.append((f"{label:<11} x{n_workers}",
+                         f"{sent / elapsed:8.1f} SMS/s  (limit {args.rate:g}/s)"))
+    report("SMS rate limit across workers", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Compare single-shot treatment plan PDFs with the pooled batch export."""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import best_of, report
+from utils.pdf_generator import PDFGenerator
+
+RECOMMENDATIONS = {
+    'Medications': ["Consider preventive cardiovascular medication"],
+    'Lifestyle Changes': [
+        "Increase physical activity to at least 150 minutes per week",
+        "Quit smoking - consider nicotine replacement therapy",
+    ],
+    'Preventive Measures': ["Regular blood pressure monitoring"],
+}
+
+
+def make_plans(n_plans):
+    for i in range(n_plans):
+        patient_data = {'personal_info': {'name': f'Patient {i}', 'age': 30 + i % 50,
+                                          'gender': 'Female'}}
+        yield patient_data, RECOMMENDATIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--plans', type=int, default=500)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    def single_shot():
+        for patient_data, recommendations in make_plans(args.plans):
+            PDFGenerator.generate_treatment_plan_pdf(patient_data, recommendations)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        single_time = best_of(single_shot, repeat=1)
+        zip_time = best_of(PDFGenerator.export_batch, make_plans(args.plans),
+                           os.path.join(tmp, 'plans.zip'), args.processes, repeat=1)
+        dir_time = best_of(PDFGenerator.export_batch, make_plans(args.plans),
+                           os.path.join(tmp, 'plans'), args.processes, repeat=1)
+
+    report(f"Treatment plan PDFs, {args.plans} plans, {args.processes} processes", [
+        ("single-shot loop", f"{args.plans / single_time:,.1f} PDFs/s"),
+        ("batch to zip", f"{args.plans / zip_time:,.1f} PDFs/s"),
+        ("batch to directory", f"{args.plans / dir_time:,.1f} PDFs/s"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare peak memory of list-built and streamed longitudinal PDF reports.
+
+Hourly readings for several years are written to a temporary time-series
+store, then the full report is built twice: once from a fully collected
+flowable list into memory, and once streamed into a temporary file.
+Peak Python allocations are measured with tracemalloc.
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate
+
+from benchmarks.common import report
+from utils.pdf_generator import PDFGenerator, _report_flowables
+from utils.timeseries_store import METRIC_DTYPES, TimeSeriesStore
+
+PATIENT_ID = 'bench-patient'
+
+
+def fill_store(store, years, seed=0):
+    """Write hourly readings for ``years`` years, one month at a time."""
+    rng = np.random.default_rng(seed)
+    for month in pd.period_range('2020-01', periods=years * 12, freq='M'):
+        times = pd.date_range(month.start_time, month.end_time, freq='h')
+        store.append(PATIENT_ID, times, {
+            metric: rng.normal(120, 10, len(times)) for metric in METRIC_DTYPES})
+
+
+def make_recommendations(n_items):
+    return {category: [f"{category} recommendation {i}" for i in range(n_items // 3)]
+            for category in ['Medications', 'Lifestyle Changes', 'Preventive Measures']}
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--recommendations', type=int, default=300)
+    args = parser.parse_args()
+
+    patient_data = {'personal_info': {'name': 'Bench Patient', 'age': 60,
+                                      'gender': 'Male', 'patient_id': PATIENT_ID}}
+    recommendations = make_recommendations(args.recommendations)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TimeSeriesStore(tmp)
+        fill_store(store, args.years)
+
+        def in_memory():
+            buffer = io.BytesIO()
+            doc = SimpleDocTemplate(buffer, pagesize=letter)
+            doc.build(list(_report_flowables(patient_data, recommendations, store)))
+            return buffer.getvalue()
+
+        def streamed():
+            with open(os.path.join(tmp, 'report.pdf'), 'wb') as output:
+                PDFGenerator.write_report_pdf(patient_data, recommendations, output, store)
+
+        rows = []
+        for label, build in [("list + BytesIO", in_memory), ("streamed to file", streamed)]:
+            elapsed, peak = measure(build)
+            rows.append((label, f"{elapsed:6.2f} s  peak {peak / 2**20:7.1f} MiB"))
+        size = os.path.getsize(os.path.join(tmp, 'report.pdf'))
+        rows.append(("streamed file size", f"{size / 2**20:.1f} MiB"))
+
+    report(f"Longitudinal report, {args.years} years hourly, "
+           f"{args.recommendations} recommendations", rows)
+
+
+if __name__ == '__main__':
+    main()
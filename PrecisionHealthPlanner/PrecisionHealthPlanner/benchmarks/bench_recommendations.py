@@ -0,0 +1,72 @@
+"""Compare per-patient recommendation generation with cohort rule evaluation."""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import best_of, report
+from utils.data_processor import RISK_CONDITIONS
+from utils.recommendation_engine import RuleSet
+
+LIFESTYLE_OPTIONS = {
+    'exercise_frequency': ['Regular', 'Occasional', 'Rarely', 'Never'],
+    'smoking_status': ['Never', 'Former', 'Current'],
+    'alcohol_consumption': ['None', 'Occasional', 'Moderate', 'Heavy'],
+    'diet_type': ['Balanced', 'Vegetarian', 'Vegan', 'Keto', 'Other'],
+}
+
+
+def make_rules(n_rules, seed=0):
+    """Build a synthetic rule table mixing categorical and threshold rules."""
+    rng = np.random.default_rng(seed)
+    rules = []
+    for i in range(n_rules):
+        if i % 2:
+            field = rng.choice(list(LIFESTYLE_OPTIONS))
+            op = rng.choice(['eq', 'ne'])
+            value = str(rng.choice(LIFESTYLE_OPTIONS[field]))
+        else:
+            field = rng.choice(RISK_CONDITIONS + ['age'])
+            op = rng.choice(['gt', 'ge', 'lt', 'le'])
+            value = float(rng.uniform(20, 80) if field == 'age' else rng.uniform())
+        rules.append({'id': f'rule_{i}', 'category': 'Preventive Measures',
+                      'field': str(field), 'op': str(op), 'value': value,
+                      'text': f'Synthetic recommendation {i}'})
+    return RuleSet(['Medications', 'Lifestyle Changes', 'Preventive Measures'], rules)
+
+
+def make_patients(n_patients, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {field: rng.choice(options, n_patients)
+               for field, options in LIFESTYLE_OPTIONS.items()}
+    columns.update({condition: rng.uniform(size=n_patients)
+                    for condition in RISK_CONDITIONS})
+    columns['age'] = rng.integers(18, 90, n_patients)
+    return pd.DataFrame(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rules', type=int, default=100)
+    parser.add_argument('--patients', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rules = make_rules(args.rules)
+    patients = make_patients(args.patients)
+    records = patients.to_dict('records')
+
+    def per_patient():
+        return [rules.recommendations_for(rules.evaluate_one(r)) for r in records]
+
+    loop_time = best_of(per_patient, repeat=1)
+    batch_time = best_of(rules.evaluate, patients)
+
+    report(f"Recommendations, {args.rules} rules x {args.patients:,} patients", [
+        ("per-patient dicts", f"{args.patients / loop_time:,.0f} patients/s"),
+        ("cohort evaluate", f"{args.patients / batch_time:,.0f} patients/s"),
+        ("speedup", f"{loop_time / batch_time:,.1f}x"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
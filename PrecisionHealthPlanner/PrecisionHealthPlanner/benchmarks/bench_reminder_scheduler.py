@@ -0,0 +1,51 @@
+"""Measure due-reminder lookup and batch claims with a large reminder store."""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import best_of, report
+from utils.reminder_scheduler import FREQUENCY_INTERVALS, ReminderScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reminders', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    now = time.time()
+    intervals = rng.choice(list(FREQUENCY_INTERVALS.values()), args.reminders)
+    # Spread fire times over the next week, with ~1% already due
+    offsets = rng.uniform(-0.01, 0.99, args.reminders) * FREQUENCY_INTERVALS['Weekly']
+    rows = ((f'+1555{i % 10_000_000:07d}', 'Take your medication', int(interval), now + offset)
+            for i, (interval, offset) in enumerate(zip(intervals, offsets)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sent = []
+        scheduler = ReminderScheduler(os.path.join(tmp, 'reminders.db'),
+                                      lambda phone, messages: sent.append(phone),
+                                      clock=lambda: now)
+        start = time.perf_counter()
+        scheduler.add_many(rows)
+        insert_time = time.perf_counter() - start
+
+        lookup_time = best_of(scheduler.next_due_time, repeat=100)
+        start = time.perf_counter()
+        fired = scheduler.run_pending()
+        fire_time = time.perf_counter() - start
+        remaining_due = scheduler.claim_due(limit=1)
+
+    report(f"Reminder scheduler, {args.reminders:,} reminders", [
+        ("bulk insert", f"{args.reminders / insert_time:,.0f} reminders/s"),
+        ("next-due lookup", f"{lookup_time * 1e6:,.1f} us"),
+        ("fire due reminders", f"{fired:,} in {fire_time:.2f}s "
+                               f"({fired / fire_time:,.0f}/s)"),
+        ("still due afterwards", len(remaining_due)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
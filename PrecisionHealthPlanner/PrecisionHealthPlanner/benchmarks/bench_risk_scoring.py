@@ -0,0 +1,30 @@
+"""Compare per-patient genetic risk scoring with the cohort batch path."""
+import argparse
+
+from benchmarks.common import best_of, make_cohort, report
+from utils.data_processor import DataProcessor
+
+
+def score_per_patient(cohort):
+    return {patient_id: DataProcessor.process_genetic_data(calls)
+            for patient_id, calls in cohort.groupby('patient_id', sort=False)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=10_000)
+    args = parser.parse_args()
+
+    cohort = make_cohort(args.patients)
+    loop_time = best_of(score_per_patient, cohort, repeat=1)
+    batch_time = best_of(DataProcessor.process_cohort_genetic_data, cohort)
+
+    report(f"Genetic risk scoring, {args.patients:,} patients", [
+        ("per-patient loop", f"{args.patients / loop_time:,.0f} patients/s"),
+        ("cohort batch", f"{args.patients / batch_time:,.0f} patients/s"),
+        ("speedup", f"{loop_time / batch_time:,.1f}x"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Similar-patient search: exact brute force against the IVF index.
+
+Reports encoding and build time, per-query latency, and the recall of the
+IVF index against exact search for several probe counts.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_recommendations import make_patients
+from benchmarks.common import best_of, report
+from utils.patient_similarity import (CONDITIONS, BruteForceIndex, IVFIndex,
+                                      encode_patients)
+
+
+def make_similarity_patients(n_patients, seed=0):
+    """Synthetic patients with every field the feature encoding reads."""
+    rng = np.random.default_rng(seed)
+    patients = make_patients(n_patients, seed)
+    patients['gender'] = rng.choice(['Male', 'Female', 'Other'], n_patients, p=[0.49, 0.49, 0.02])
+    patients['height'] = rng.normal(170, 10, n_patients).round()
+    patients['weight'] = rng.normal(75, 15, n_patients).clip(40).round()
+    flags = rng.uniform(size=(n_patients, len(CONDITIONS))) < 0.15
+    names = np.array(CONDITIONS, dtype=object)
+    patients['conditions'] = [list(names[row]) for row in flags]
+    return patients
+
+
+def latencies(search, queries):
+    """Per-query wall-clock times in milliseconds."""
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.array(times)
+
+
+def recall(approximate, exact):
+    """Fraction of the exact neighbours that the approximate search returned."""
+    hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approximate, exact))
+    return hits / sum(len(e) for e in exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    patients = make_similarity_patients(args.patients)
+    encode_time = best_of(encode_patients, patients, repeat=1)
+    vectors = encode_patients(patients)
+    ids = np.arange(args.patients)
+    queries = encode_patients(make_similarity_patients(args.queries, seed=1))
+
+    brute = BruteForceIndex(vectors, ids)
+    start = time.perf_counter()
+    ivf = IVFIndex.build(vectors, ids)
+    build_time = time.perf_counter() - start
+
+    exact_times = latencies(lambda q: brute.search(q, args.k), queries)
+    exact = [brute.search(q, args.k)[0] for q in queries]
+
+    rows = [
+        ("encode", f"{encode_time:8.2f} s"),
+        ("build IVF", f"{build_time:8.2f} s ({len(ivf.centroids)} lists)"),
+        ("brute force p50 / p99",
+         f"{np.median(exact_times):8.2f} / {np.percentile(exact_times, 99):.2f} ms"),
+    ]
+    for n_probe in (1, 4, 8, 16, 32):
+        times = latencies(lambda q: ivf.search(q, args.k, n_probe), queries)
+        found = [ivf.search(q, args.k, n_probe)[0] for q in queries]
+        rows.append((f"IVF n_probe={n_probe} p50 / p99",
+                     f"{np.median(times):8.2f} / {np.percentile(times, 99):.2f} ms, "
+                     f"recall@{args.k} {recall(found, exact):.3f}"))
+    report(f"Similar patients, {args.patients:,} patients x {vectors.shape[1]} features", rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Count the SMS sent for bursts of reminders, with and without coalescing.
+
+Each patient has several reminders (some scheduled twice) firing within a
+few seconds of each other. The scheduler runs on a fake clock against a
+stub Twilio client, so the windows close without waiting.
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.bench_sms_dispatch import FakeTwilioClient
+from benchmarks.common import report
+from utils.reminder_scheduler import ReminderScheduler
+from utils.sms_coalescer import ReminderCoalescer, merge_bodies
+
+FROM_NUMBER = '+15550000000'
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_reminders(n_patients, per_patient, duplicate_rate, seed=0):
+    """(phone, message, fire offset) rows; a patient's reminders fire within 5 s."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for patient in range(n_patients):
+        phone = f'+1555{patient:07d}'
+        for i in range(per_patient):
+            message = f"Hello Patient {patient}, take medication {i} according to schedule: Daily"
+            copies = 2 if rng.uniform() < duplicate_rate else 1
+            rows.extend((phone, message, rng.uniform(0, 5)) for _ in range(copies))
+    return rows
+
+
+def run(rows, window):
+    """Fire every reminder through the scheduler; returns (client, coalescer, s).
+
+    ``window=None`` sends every reminder as its own SMS, for comparison.
+    """
+    client = FakeTwilioClient(latency=0)
+    clock = FakeClock(1_000_000.0)
+
+    def send(to_number, body):
+        return client.messages.create(body=body, from_=FROM_NUMBER, to=to_number)
+
+    coalescer = ReminderCoalescer(send)
+    if window is None:
+        deliver = lambda phone, messages: [send(phone, message) for message in messages]
+    else:
+        deliver = coalescer.submit
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = ReminderScheduler(os.path.join(tmp, 'reminders.db'), deliver,
+                                      clock=clock, window=window or 0)
+        scheduler.add_many([(phone, message, None, clock.now + offset)
+                            for phone, message, offset in rows])
+        start = time.perf_counter()
+        # Step the clock a second at a time until every window has closed
+        while scheduler.next_due_time() is not None:
+            clock.now += 1
+            scheduler.run_pending()
+        elapsed = time.perf_counter() - start
+    return client, coalescer, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patients', type=int, default=10_000)
+    parser.add_argument('--reminders-per-patient', type=int, default=4)
+    parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--window', type=float, default=30)
+    args = parser.parse_args()
+
+    rows = make_reminders(args.patients, args.reminders_per_patient, args.duplicate_rate)
+    direct, _, direct_time = run(rows, window=None)
+    client, coalescer, coalesce_time = run(rows, window=args.window)
+
+    # Every patient gets exactly one SMS listing each distinct reminder once
+    expected = {}
+    for phone, message, _ in sorted(rows, key=lambda row: row[2]):
+        expected.setdefault(phone, {})[message] = None
+    per_phone = Counter(to for to, _ in client.sent)
+    assert set(per_phone.values()) == {1}, "a patient received more than one SMS"
+    assert all(body == merge_bodies(list(expected[to])) for to, body in client.sent), \
+        "a coalesced SMS does not list each reminder once in firing order"
+
+    stats = coalescer.stats()
+    report(f"SMS coalescing, {len(rows):,} reminders for {args.patients:,} patients", [
+        ("SMS without coalescing", f"{len(direct.sent):,} ({direct_time:.2f} s)"),
+        (f"SMS with {args.window:g} s window", f"{len(client.sent):,} ({coalesce_time:.2f} s)"),
+        ("duplicates dropped", f"{stats['duplicates']:,}"),
+        ("SMS saved", f"{stats['saved']:,} ({stats['saved'] / stats['submitted']:.0%})"),
+        ("longest body", f"{max(len(body) for _, body in client.sent)} chars"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
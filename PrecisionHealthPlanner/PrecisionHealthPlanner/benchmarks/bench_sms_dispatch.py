@@ -0,0 +1,70 @@
+"""Measure SMS throughput of the background dispatcher against a fake Twilio client."""
+import argparse
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import report
+from utils.sms_dispatcher import SMSDispatcher
+
+
+class FakeTwilioClient:
+    """Stands in for twilio.rest.Client with a fixed per-request latency."""
+
+    def __init__(self, latency=0.05, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.sent = []
+        self._calls = itertools.count(1)
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, body, from_, to):
+        time.sleep(self.latency)
+        call = next(self._calls)
+        if self.fail_every and call % self.fail_every == 0:
+            raise ConnectionError("simulated transport failure")
+        with self._lock:
+            self.sent.append((to, body))
+        return SimpleNamespace(sid=f'SM{call:032d}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--fail-every', type=int, default=10)
+    args = parser.parse_args()
+
+    client = FakeTwilioClient(args.latency)
+    start = time.perf_counter()
+    for i in range(args.messages // 10):
+        client.messages.create(body='reminder', from_='+15550000000', to=f'+1555{i:07d}')
+    sequential_rate = (args.messages // 10) / (time.perf_counter() - start)
+
+    client = FakeTwilioClient(args.latency, fail_every=args.fail_every)
+    dispatcher = SMSDispatcher(client, '+15550000000', concurrency=args.concurrency,
+                               rate_per_second=args.rate, backoff=0.01)
+    start = time.perf_counter()
+    jobs = [dispatcher.submit(f'+1555{i:07d}', 'reminder') for i in range(args.messages)]
+    submit_time = time.perf_counter() - start
+    for job in jobs:
+        job.result()
+    elapsed = time.perf_counter() - start
+    dispatcher.shutdown()
+    stats = dispatcher.stats()
+
+    report(f"SMS dispatch, {args.messages} messages, {args.latency * 1000:.0f} ms latency", [
+        ("sequential", f"{sequential_rate:,.1f} msg/s"),
+        (f"dispatcher x{args.concurrency}", f"{args.messages / elapsed:,.1f} msg/s"),
+        ("submit latency", f"{submit_time / args.messages * 1e6:,.1f} us/msg"),
+        ("delivered", f"{stats['sent']} ({stats['retries']} retries, "
+                      f"{stats['failures']} failed)"),
+    ])
+
+
+if __name__ == '__main__':
+    main()
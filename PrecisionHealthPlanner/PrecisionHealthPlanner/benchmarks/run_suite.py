@@ -0,0 +1,187 @@
+"""Benchmark every utils hot path at realistic sizes and record the results.
+
+Each run appends one JSON line per case to ``benchmarks/results/history.jsonl``
+(tagged with the git commit) and compares it with the previous run of the
+same case, so performance regressions across commits stand out::
+
+    python -m benchmarks.run_suite            # 1 / 1k / 100k patients
+    python -m benchmarks.run_suite --quick    # smaller sizes for a fast check
+
+This is a standalone script rather than pytest-benchmark cases under
+``tests/``: the tests check behaviour and stay fast, while these cases run
+for minutes at full size and keep a per-commit history that pytest-benchmark
+would need its own storage and comparison flags for.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# The notification case starts a real reminder worker and rate limiter; give
+# them a throwaway data directory so they never touch live reminders
+os.environ['HEALTH_PLANNER_DATA_DIR'] = tempfile.mkdtemp(prefix='health-planner-suite-')
+os.environ['HEALTH_PLANNER_STATE'] = 'sqlite'
+# Read when NotificationService is built; the case times dispatch, not throttling
+os.environ['SMS_RATE_PER_SECOND'] = '1000000'
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_pdf_export import RECOMMENDATIONS
+from benchmarks.bench_recommendations import make_patients
+from benchmarks.bench_sms_dispatch import FakeTwilioClient
+from benchmarks.common import best_of, make_cohort
+from utils.data_processor import DataProcessor
+from utils.notification_service import NotificationService
+from utils.pdf_generator import PDFGenerator
+from utils.recommendation_engine import RecommendationEngine
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'results', 'history.jsonl')
+
+# A case is flagged when it is this much slower than its previous run
+REGRESSION_THRESHOLD = 1.2
+
+PATIENT_SIZES = (1, 1_000, 100_000)
+GENETIC_ROWS = (10, 1_000, 100_000, 1_000_000)
+# Rendering is ~1 ms per PDF, so the largest size is capped
+PDF_SIZES = (1, 100, 1_000)
+QUICK_PATIENT_SIZES = (1, 1_000)
+QUICK_GENETIC_ROWS = (10, 1_000, 100_000)
+QUICK_PDF_SIZES = (1, 100)
+
+
+def patient_records(n_patients):
+    patients = make_patients(n_patients)
+    lifestyle = ['exercise_frequency', 'smoking_status', 'alcohol_consumption', 'diet_type']
+    return [{'personal_info': {'name': f'Patient {i}', 'age': int(row['age'])},
+             'lifestyle_factors': {field: row[field] for field in lifestyle}}
+            for i, row in enumerate(patients.to_dict('records'))]
+
+
+def cases(patient_sizes, genetic_rows, pdf_sizes):
+    """Yield (name, size, unit, callable) for every benchmark case."""
+    for rows in genetic_rows:
+        calls = make_cohort(1, genes_per_patient=rows)
+        yield ('process_genetic_data', rows, 'rows',
+               lambda calls=calls: DataProcessor.process_genetic_data(calls))
+
+    for n in patient_sizes:
+        cohort = make_cohort(n)
+        yield ('process_cohort_genetic_data', n, 'patients',
+               lambda cohort=cohort: DataProcessor.process_cohort_genetic_data(cohort))
+
+    for n in patient_sizes:
+        records = patient_records(n)
+        yield ('calculate_health_score', n, 'patients',
+               lambda records=records: [DataProcessor.calculate_health_score(r) for r in records])
+
+    for n in patient_sizes:
+        records = patient_records(n)
+        risks = make_patients(n)[['heart_disease', 'diabetes']].to_dict('records')
+        yield ('generate_recommendations', n, 'patients',
+               lambda records=records, risks=risks: [
+                   RecommendationEngine.generate_recommendations(r, k)
+                   for r, k in zip(records, risks)])
+
+    for n in patient_sizes:
+        patients = make_patients(n)
+        yield ('generate_cohort_recommendations', n, 'patients',
+               lambda patients=patients: RecommendationEngine.generate_cohort_recommendations(patients))
+
+    # One service for every size, as in the app; only sending is timed
+    service = NotificationService(client=FakeTwilioClient(latency=0), from_number='+15550000000')
+    try:
+        for n in patient_sizes:
+            yield ('notification_dispatch', n, 'messages',
+                   lambda n=n: dispatch_messages(service, n))
+    finally:
+        service.scheduler.stop()
+        service.dispatcher.shutdown()
+
+    yield ('generate_mock_trends', 1, 'calls', DataProcessor.generate_mock_trends)
+
+    for n in pdf_sizes:
+        yield ('generate_treatment_plan_pdf', n, 'pdfs',
+               lambda n=n: [PDFGenerator.generate_treatment_plan_pdf(
+                   {'personal_info': {'name': f'Patient {i}'}}, RECOMMENDATIONS)
+                   for i in range(n)])
+
+
+def dispatch_messages(service, n_messages):
+    """Queue messages on ``service`` and wait until all are delivered."""
+    jobs = [service.send_sms_async(f'+1555{i:07d}', 'Take your medication')
+            for i in range(n_messages)]
+    for job in jobs:
+        job.result()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(path):
+    """Latest recorded seconds per (case, size)."""
+    previous = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                previous[(entry['case'], entry['size'])] = entry['seconds']
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help="skip the largest sizes")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--no-record', action='store_true', help="do not append to the history")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    sizes = ((QUICK_PATIENT_SIZES, QUICK_GENETIC_ROWS, QUICK_PDF_SIZES) if args.quick
+             else (PATIENT_SIZES, GENETIC_ROWS, PDF_SIZES))
+    previous = load_previous(args.history)
+    run = {'commit': git_commit(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+           'python': platform.python_version(), 'numpy': np.__version__,
+           'pandas': pd.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+    entries = []
+    regressions = []
+    print(f"{'case':<34} {'size':>9}  {'seconds':>10}  {'throughput':>16}  vs last")
+    for name, size, unit, func in cases(*sizes):
+        # Large cases run once; repeating them only adds wall time
+        seconds = best_of(func, repeat=args.repeat if size < 100_000 else 1)
+        before = previous.get((name, size))
+        change = ''
+        if before:
+            ratio = seconds / before
+            change = f"{ratio:5.2f}x"
+            if ratio > REGRESSION_THRESHOLD:
+                change += ' REGRESSION'
+                regressions.append(name)
+        print(f"{name:<34} {size:>9,}  {seconds:>10.4f}  "
+              f"{size / seconds:>10,.0f} {unit}/s  {change}".rstrip())
+        entries.append({**run, 'case': name, 'size': size, 'unit': unit, 'seconds': seconds})
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, 'a') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+    if args.fail_on_regression and regressions:
+        sys.exit(f"Regressions in: {', '.join(sorted(set(regressions)))}")
+
+
+if __name__ == '__main__':
+    main()
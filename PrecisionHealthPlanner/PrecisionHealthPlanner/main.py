@@ -1,7 +1,5 @@
 import streamlit as st
-import pandas as pd
-from utils.notification_service import send_notification #This line is added from the edited code
-import base64
+from utils.instrumentation import run_page
 
 st.set_page_config(
     page_title="Medical Treatment Planning System",
@@ -143,4 +141,4 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_page('home', main)
\ No newline at end of file
@@ -1,9 +1,31 @@
 import streamlit as st
+from utils.instrumentation import run_page
 import pandas as pd
-import io
+from utils.data_processor import DataProcessor
+from utils.patient_repository import StoredPatient, get_patient_repository
+
+def load_existing_patient():
+    """Let the user pick up a previously saved patient by name."""
+    with st.expander("Load Existing Patient"):
+        query = st.text_input("Search by name")
+        if not query:
+            return
+        matches = get_patient_repository().find_by_name(query)
+        if not matches:
+            st.info("No saved patients match that name.")
+            return
+        patient_id = st.selectbox(
+            "Matching patients",
+            [patient_id for patient_id, _ in matches],
+            format_func=dict(matches).get
+        )
+        if st.button("Load Patient"):
+            st.session_state.patient_data = StoredPatient(patient_id)
+            st.success("Patient loaded.")
 
 def patient_input_form():
     st.title("Patient Data Input")
+    load_existing_patient()
     
     with st.form("patient_data_form"):
         st.subheader("Personal Information")
@@ -50,7 +72,11 @@ def patient_input_form():
         
         if st.form_submit_button("Save Patient Data"):
             if genetic_file is not None:
-                genetic_data = pd.read_csv(genetic_file)
+                try:
+                    genetic_data = DataProcessor.read_genetic_csv(genetic_file)
+                except ValueError as e:
+                    st.error(f"Could not read genetic data: {str(e)}")
+                    return
             else:
                 # Mock genetic data
                 genetic_data = pd.DataFrame({
@@ -58,14 +84,29 @@ def patient_input_form():
                     'variant': ['wild', 'mutation', 'wild']
                 })
             
-            st.session_state.patient_data = {
+            # Re-saving the same patient updates it; a new name creates a patient
+            current = st.session_state.get('patient_data')
+            patient_id = getattr(current, 'patient_id', None)
+            if patient_id is not None and current['personal_info'].get('name') != personal_info['name']:
+                patient_id = None
+
+            patient_id = get_patient_repository().save({
                 'personal_info': personal_info,
                 'medical_history': medical_history,
                 'lifestyle_factors': lifestyle_factors,
                 'genetic_data': genetic_data
-            }
+            }, patient_id)
+            # The session keeps only the id; sections load on demand
+            st.session_state.patient_data = StoredPatient(patient_id)
+
+            # Score now so the population rollups and similar-patient index include this save
+            from utils.analysis_cache import (get_patient_analysis, patient_fingerprint,
+                                              record_cohort_analysis)
+            patient = st.session_state.patient_data
+            record_cohort_analysis(patient, get_patient_analysis(patient),
+                                   patient_fingerprint(patient))
             
             st.success("Patient data saved successfully!")
 
 if __name__ == "__main__":
-    patient_input_form()
+    run_page('patient_input', patient_input_form)
@@ -1,7 +1,9 @@
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-from utils.data_processor import DataProcessor
+from utils.instrumentation import run_page
+from utils.analysis_cache import get_patient_analysis
+from utils import chart_templates
+from utils.timeseries_store import get_health_trends
+from utils.data_processor import get_population_percentiles
 
 def create_dashboard():
     st.title("Patient Analysis Dashboard")
@@ -9,15 +11,18 @@ def create_dashboard():
     if not st.session_state.patient_data['personal_info']:
         st.warning("Please input patient data first!")
         return
-    
-    # Process data
-    risk_factors = DataProcessor.process_genetic_data(
-        st.session_state.patient_data['genetic_data']
-    )
-    health_score = DataProcessor.calculate_health_score(
-        st.session_state.patient_data
-    )
-    health_trends = DataProcessor.generate_mock_trends()
+
+    # Process data (cached across reruns and shared with the treatment plan)
+    analysis = get_patient_analysis(st.session_state.patient_data)
+    risk_factors = analysis['risk_factors']
+    health_score = analysis['health_score']
+    health_trends = analysis['health_trends']
+
+    # Prefer recorded readings, downsampled server-side, over mock trends
+    personal_info = st.session_state.patient_data['personal_info']
+    stored_trends = get_health_trends(personal_info.get('patient_id', personal_info.get('name')))
+    if stored_trends is not None:
+        health_trends = stored_trends
     
     # Dashboard layout
     col1, col2 = st.columns(2)
@@ -30,53 +35,23 @@ def create_dashboard():
         st.write(f"**Gender:** {personal_info['gender']}")
         
         # Health Score Gauge
-        fig_health_score = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=health_score,
-            title={'text': "Health Score"},
-            domain={'x': [0, 1], 'y': [0, 1]},
-            gauge={'axis': {'range': [0, 100]},
-                   'bar': {'color': "#0066cc"},
-                   'steps': [
-                       {'range': [0, 50], 'color': "lightgray"},
-                       {'range': [50, 75], 'color': "gray"},
-                       {'range': [75, 100], 'color': "darkgray"}
-                   ]}
-        ))
+        fig_health_score = chart_templates.health_score_gauge(health_score)
         st.plotly_chart(fig_health_score)
+        population = get_population_percentiles()
+        if population is not None:
+            percentile = population.rank(health_score)
+            st.caption(f"Health score is at or above {percentile:.0f}% of the population")
     
     with col2:
         st.subheader("Risk Factors")
         # Risk factors radar chart
-        fig_risks = go.Figure()
-        fig_risks.add_trace(go.Scatterpolar(
-            r=list(risk_factors.values()),
-            theta=list(risk_factors.keys()),
-            fill='toself',
-            name='Risk Factors'
-        ))
-        fig_risks.update_layout(
-            polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
-            showlegend=False
-        )
+        fig_risks = chart_templates.risk_radar(risk_factors)
         st.plotly_chart(fig_risks)
     
     # Health Metrics Trends
     st.subheader("Health Metrics Trends")
-    fig_trends = go.Figure()
-    metrics = ['blood_pressure', 'glucose_levels', 'cholesterol']
-    for metric in metrics:
-        fig_trends.add_trace(go.Scatter(
-            x=health_trends['dates'],
-            y=health_trends[metric],
-            name=metric.replace('_', ' ').title()
-        ))
-    fig_trends.update_layout(
-        xaxis_title="Date",
-        yaxis_title="Value",
-        hovermode='x unified'
-    )
+    fig_trends = chart_templates.trends_chart(health_trends)
     st.plotly_chart(fig_trends)
 
 if __name__ == "__main__":
-    create_dashboard()
+    run_page('analysis_dashboard', create_dashboard)
@@ -1,52 +1,43 @@
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
-from utils.recommendation_engine import RecommendationEngine
-from utils.data_processor import DataProcessor
-from utils.pdf_generator import PDFGenerator
-from utils.notification_service import notification_service
-from datetime import datetime, timedelta
-
-def create_schedule_timeline(recommendations):
+from utils.instrumentation import run_page
+from utils.analysis_cache import (get_patient_analysis, get_schedule_timeline,
+                                  get_treatment_plan_pdf)
+from utils.patient_similarity import find_similar_patients
+from utils.timeseries_store import latest_readings
+from datetime import datetime
+import os
+
+def create_schedule_timeline(patient_data):
     """Create a timeline visualization for treatment schedule"""
-    activities = []
-    start_dates = []
-    end_dates = []
-    colors = []
-
-    base_date = datetime.now()
-    for category, items in recommendations.items():
-        for i, item in enumerate(items):
-            activities.append(f"{category}: {item}")
-            start = base_date + timedelta(days=i*7)
-            end = start + timedelta(days=28)
-            start_dates.append(start.strftime('%Y-%m-%d'))
-            end_dates.append(end.strftime('%Y-%m-%d'))
-            colors.append('#0066cc' if category == 'Medications' else 
-                         '#00cc99' if category == 'Lifestyle Changes' else '#ff9900')
-
-    fig = go.Figure()
-
-    for i in range(len(activities)):
-        fig.add_trace(go.Bar(
-            name=activities[i],
-            x=[28],  # Duration in days
-            y=[activities[i]],
-            orientation='h',
-            marker_color=colors[i],
-            text=f"{start_dates[i]} to {end_dates[i]}",
-            hovertext=f"{activities[i]}<br>{start_dates[i]} to {end_dates[i]}"
-        ))
-
-    fig.update_layout(
-        title="Treatment Schedule Timeline",
-        xaxis_title="Duration (days)",
-        showlegend=False,
-        height=400,
-        margin=dict(l=10, r=10, t=30, b=10)
-    )
-
-    return fig
+    return get_schedule_timeline(patient_data)
+
+def show_similar_patients(patient_data, analysis):
+    """Table of the nearest stored patients with their scores and latest readings"""
+    similar = find_similar_patients(patient_data, analysis)
+    if not similar:
+        st.info("No similar patients yet. Saved patients are compared once they are analysed.")
+        return
+
+    rows = []
+    for patient in similar:
+        risks = patient['risk_factors']
+        top_risk = max(risks, key=risks.get)
+        readings = latest_readings(patient['patient_id']) or {}
+        rows.append({
+            'Patient': f"#{patient['patient_id']}",
+            'Distance': round(patient['distance'], 3),
+            'Age': patient['age'],
+            'Gender': patient['gender'],
+            'Conditions': ', '.join(c for c in patient['conditions'] if c != 'None') or '-',
+            'Health Score': patient['health_score'],
+            'Highest Risk': f"{top_risk.replace('_', ' ').title()} ({risks[top_risk]:.0%})",
+            'Blood Pressure': readings.get('blood_pressure'),
+            'Glucose': readings.get('glucose_levels'),
+            'Cholesterol': readings.get('cholesterol'),
+        })
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+    st.caption("Nearest patients by genetic risk, age, BMI, lifestyle and existing conditions; "
+               "readings are each patient's most recent.")
 
 def generate_treatment_plan():
     st.title("Advanced Treatment Plan Generator")
@@ -57,14 +48,9 @@ def generate_treatment_plan():
         return
 
     try:
-        # Process data and generate recommendations
-        risk_factors = DataProcessor.process_genetic_data(
-            st.session_state.patient_data.get('genetic_data', pd.DataFrame())
-        )
-        recommendations = RecommendationEngine.generate_recommendations(
-            st.session_state.patient_data,
-            risk_factors
-        )
+        # Process data and generate recommendations (cached across reruns)
+        analysis = get_patient_analysis(st.session_state.patient_data)
+        recommendations = analysis['recommendations']
 
         # Display personalized header
         patient_name = st.session_state.patient_data['personal_info'].get('name', 'Patient')
@@ -77,7 +63,7 @@ def generate_treatment_plan():
 
         try:
             # Display timeline
-            timeline = create_schedule_timeline(recommendations)
+            timeline = create_schedule_timeline(st.session_state.patient_data)
             st.plotly_chart(timeline, use_container_width=True)
         except Exception as e:
             st.error(f"Could not create timeline visualization. Error: {str(e)}")
@@ -108,6 +94,13 @@ def generate_treatment_plan():
             for metric, frequency in metrics.items():
                 st.markdown(f"**{metric}** - Monitor {frequency}")
 
+        # Patients like this one, and how they are doing
+        st.subheader("👥 Similar Patients")
+        try:
+            show_similar_patients(st.session_state.patient_data, analysis)
+        except Exception as e:
+            st.error(f"Could not find similar patients. Error: {str(e)}")
+
         # Treatment Schedule
         st.subheader("📅 Treatment Schedule")
         schedule_col1, schedule_col2 = st.columns(2)
@@ -142,36 +135,59 @@ def generate_treatment_plan():
 
             if st.button("Set Up Reminders"):
                 if phone_number:
-                    st.session_state.patient_data['personal_info']['phone'] = phone_number
-                    notification_service.schedule_reminder(
+                    from utils.notification_service import get_notification_service
+                    personal_info = st.session_state.patient_data['personal_info']
+                    personal_info['phone'] = phone_number
+                    # Assign the section back so stored patients persist it
+                    st.session_state.patient_data['personal_info'] = personal_info
+                    reminder_id = get_notification_service().schedule_reminder(
                         st.session_state.patient_data,
                         'medication',
-                        f"Schedule: {reminder_frequency}"
+                        reminder_frequency
                     )
-                    st.success("Reminders set up successfully!")
+                    if reminder_id is not None:
+                        st.success("Reminders set up successfully!")
                 else:
                     st.error("Please enter a valid phone number")
 
         # Generate PDF report
         if st.button("Generate Detailed PDF Report"):
             try:
-                pdf_buffer = PDFGenerator.generate_treatment_plan_pdf(
+                # Served from the shared PDF cache; only rendered on a miss
+                with get_treatment_plan_pdf(st.session_state.patient_data) as pdf_file:
+                    st.download_button(
+                        label="Download Treatment Plan PDF",
+                        data=pdf_file,
+                        file_name=f"treatment_plan_{datetime.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf"
+                    )
+            except Exception as e:
+                st.error(f"Could not generate PDF report. Error: {str(e)}")
+
+        # Full report with stored health trends, rendered page by page to disk
+        if st.button("Generate Full Report with Health Trends"):
+            try:
+                from utils.pdf_generator import PDFGenerator
+                report_path = PDFGenerator.generate_report_file(
                     st.session_state.patient_data,
                     recommendations
                 )
-
-                st.download_button(
-                    label="Download Treatment Plan PDF",
-                    data=pdf_buffer,
-                    file_name=f"treatment_plan_{datetime.now().strftime('%Y%m%d')}.pdf",
-                    mime="application/pdf"
-                )
+                try:
+                    with open(report_path, 'rb') as report_file:
+                        st.download_button(
+                            label="Download Full Report PDF",
+                            data=report_file,
+                            file_name=f"health_report_{datetime.now().strftime('%Y%m%d')}.pdf",
+                            mime="application/pdf"
+                        )
+                finally:
+                    os.remove(report_path)
             except Exception as e:
-                st.error(f"Could not generate PDF report. Error: {str(e)}")
+                st.error(f"Could not generate full report. Error: {str(e)}")
 
     except Exception as e:
         st.error(f"An error occurred while generating the treatment plan: {str(e)}")
         st.info("Please ensure all required patient information is entered correctly.")
 
 if __name__ == "__main__":
-    generate_treatment_plan()
\ No newline at end of file
+    run_page('treatment_plan', generate_treatment_plan)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import streamlit as st
+from utils.instrumentation import run_page
+from utils import chart_templates
+from utils.population_rollups import get_population_rollups
+
+def create_population_dashboard():
+    st.title("Population Dashboard")
+
+    # Pre-aggregated rollups; loading them never scans patient records
+    rollups = get_population_rollups().snapshot()
+    if not rollups['patients']:
+        st.info("No patients have been scored yet. Saved patients appear here "
+                "once they are analysed.")
+        return
+
+    scores = rollups['health_score']
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Patients", f"{rollups['patients']:,}")
+    col2.metric("Mean health score", f"{scores['mean']:.1f}")
+    col3.metric("Median health score", f"{scores['median']:.1f}")
+    col4.metric("Interquartile range", f"{scores['p25']:.1f} – {scores['p75']:.1f}")
+
+    st.subheader("Health Score Distribution")
+    st.plotly_chart(chart_templates.histogram_chart(scores['edges'], scores['counts'],
+                                                    "Health score"),
+                    use_container_width=True)
+
+    st.subheader("Genetic Risk Distributions")
+    risks = rollups['risks']
+    condition = st.selectbox("Condition", list(risks),
+                             format_func=lambda name: name.replace('_', ' ').title())
+    risk = risks[condition]
+    st.caption(f"Mean risk {risk['mean']:.2f}, median {risk['median']:.2f}, "
+               f"interquartile range {risk['p25']:.2f} – {risk['p75']:.2f}")
+    st.plotly_chart(chart_templates.histogram_chart(risk['edges'], risk['counts'], "Risk"),
+                    use_container_width=True)
+
+    st.subheader("Recommendation Frequency")
+    recommendations = rollups['recommendations']
+    if not recommendations:
+        st.write("No recommendations have been made yet.")
+    for category, frequencies in recommendations.items():
+        st.markdown(f"**{category}**")
+        st.plotly_chart(chart_templates.frequency_chart(frequencies),
+                        use_container_width=True)
+
+if __name__ == "__main__":
+    run_page('population_dashboard', create_population_dashboard)
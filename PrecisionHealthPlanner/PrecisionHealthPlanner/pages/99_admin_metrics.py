@@ -0,0 +1,90 @@
+import os
+import streamlit as st
+from utils import instrumentation
+from utils.instrumentation import LATENCY_BUCKETS, run_page
+from utils.pdf_cache import get_pdf_cache
+
+def bucket_quantile(buckets, count, q):
+    """Upper bound of the histogram bucket containing quantile q."""
+    rank = q * count
+    for bound, cumulative in zip(LATENCY_BUCKETS, buckets):
+        if cumulative >= rank:
+            return bound
+    return float('inf')
+
+def admin_metrics():
+    st.title("Performance Metrics")
+
+    if os.getenv('HEALTH_PLANNER_ADMIN') != '1':
+        st.info("This page is only available when HEALTH_PLANNER_ADMIN=1 is set.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        enabled = st.toggle("Collect timing metrics", value=instrumentation.is_enabled())
+        if enabled != instrumentation.is_enabled():
+            if enabled:
+                instrumentation.enable()
+            else:
+                instrumentation.disable()
+    with col2:
+        if st.button("Reset metrics"):
+            instrumentation.reset()
+
+    st.markdown("Append `?profile=1` to any page URL to capture a cProfile report "
+                "of a single rerun.")
+
+    st.subheader("PDF cache")
+    pdf_stats = get_pdf_cache().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hit rate", "n/a" if pdf_stats['hit_rate'] is None
+                else f"{pdf_stats['hit_rate']:.0%}")
+    col2.metric("Hits / misses", f"{pdf_stats['hits']} / {pdf_stats['misses']}")
+    col3.metric("Bytes saved", f"{pdf_stats['bytes_saved'] / 1024:,.0f} KiB")
+    col4.metric("On disk", f"{pdf_stats['files']} files, "
+                           f"{pdf_stats['disk_bytes'] / 1024:,.0f} KiB")
+    st.caption("Hits, misses and bytes saved are counted by this worker process; "
+               "the files on disk are shared by all workers.")
+
+    st.subheader("SMS reminders")
+    # Imported here so the page only loads the SMS stack when it is shown
+    from utils.notification_service import get_notification_service
+    service = get_notification_service()
+    coalescer = service.coalescer
+    if coalescer is None:
+        st.caption("SMS notifications are not configured.")
+    else:
+        sms_stats = coalescer.stats()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Reminders", sms_stats['submitted'])
+        col2.metric("SMS sent", sms_stats['sent'])
+        col3.metric("SMS saved", sms_stats['saved'])
+        col4.metric("Duplicates dropped", sms_stats['duplicates'])
+        st.caption(f"Reminders for one number within {service.scheduler.window:g} s are merged; "
+                   "counts are for this worker process.")
+
+    metrics = instrumentation.snapshot()
+    if not metrics:
+        st.warning("No calls recorded yet.")
+        return
+
+    st.dataframe([
+        {
+            'name': name,
+            'calls': m['count'],
+            'mean ms': round(m['sum'] / m['count'] * 1000, 2),
+            'p50 ≤ ms': bucket_quantile(m['buckets'], m['count'], 0.5) * 1000,
+            'p95 ≤ ms': bucket_quantile(m['buckets'], m['count'], 0.95) * 1000,
+            'total s': round(m['sum'], 3),
+        }
+        for name, m in metrics.items()
+    ], use_container_width=True)
+
+    text = instrumentation.render_metrics()
+    with st.expander("Prometheus text format"):
+        st.code(text)
+    st.download_button("Download metrics", data=text, file_name="metrics.txt",
+                       mime="text/plain")
+
+if __name__ == "__main__":
+    run_page('admin_metrics', admin_metrics)
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Modules under test open stores under the data directory; never the real one
+os.environ['HEALTH_PLANNER_DATA_DIR'] = tempfile.mkdtemp(prefix='health-planner-tests-')
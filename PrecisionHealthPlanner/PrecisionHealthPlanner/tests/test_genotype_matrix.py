@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_processor import GENE_RISK_WEIGHTS, RISK_CONDITIONS, VARIANT_EFFECT, DataProcessor
+from utils.genotype_matrix import GenotypeMatrix
+
+GENES = list(GENE_RISK_WEIGHTS) + ['MTHFR']
+
+
+def test_repeated_calls_score_the_same_from_dataframe_and_matrix():
+    calls = pd.DataFrame({'gene': ['BRCA1', 'APOE', 'APOE', 'MTHFR'],
+                          'variant': ['mutation', 'het', 'hom', 'het']})
+    from_dataframe = DataProcessor.process_genetic_data(calls)
+    from_matrix = DataProcessor.process_genetic_data(GenotypeMatrix.from_dataframe(calls, GENES))
+
+    assert from_dataframe == pytest.approx(from_matrix)
+    # Only the hom APOE call counts
+    assert from_dataframe == pytest.approx(DataProcessor.process_genetic_data(calls.drop(index=1)))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_cohort_with_repeated_calls_scores_the_same(seed):
+    rng = np.random.default_rng(seed)
+    n_rows = 2_000
+    cohort = pd.DataFrame({
+        'patient_id': rng.integers(0, 100, n_rows),
+        # Few genes per patient, so most genes are called several times
+        'gene': rng.choice(GENES, n_rows),
+        'variant': rng.choice(list(VARIANT_EFFECT), n_rows),
+    })
+    long_format = DataProcessor.process_cohort_genetic_data(cohort)
+    packed = DataProcessor.process_genotype_matrix(GenotypeMatrix.from_dataframe(cohort, GENES))
+
+    pd.testing.assert_frame_equal(long_format.sort_index()[RISK_CONDITIONS],
+                                  packed.sort_index()[RISK_CONDITIONS],
+                                  check_dtype=False, check_index_type=False, atol=1e-6)
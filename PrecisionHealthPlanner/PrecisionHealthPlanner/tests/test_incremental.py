@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from utils.analysis_cache import analysis_graph, evaluate
+from utils.incremental import IncrementalGraph, Node
+from utils.patient_repository import PatientRepository, StoredPatient
+
+ALL_NODES = ['risk_factors', 'health_score', 'health_trends', 'recommendations',
+             'timeline', 'treatment_plan_key']
+
+
+@pytest.fixture
+def patient(tmp_path):
+    repository = PatientRepository(str(tmp_path / 'patients.db'))
+    patient_data = {
+        'personal_info': {'name': 'Test Patient', 'age': 52, 'gender': 'Female',
+                          'height': 165, 'weight': 80},
+        'medical_history': {'conditions': ['Diabetes'], 'medications': [], 'allergies': []},
+        'lifestyle_factors': {'exercise_frequency': 'Rarely', 'smoking_status': 'Current',
+                              'alcohol_consumption': 'Moderate', 'diet_type': 'Balanced'},
+        'genetic_data': pd.DataFrame({'gene': ['APOE', 'TCF7L2', 'MTHFR'],
+                                      'variant': ['e4', 'risk', 'wild']}),
+    }
+    patient = StoredPatient(repository.save(patient_data), repository)
+    analysis_graph.cache.clear()
+    assert evaluate(patient, ALL_NODES).recomputed == ALL_NODES
+    return patient
+
+
+@pytest.mark.parametrize('section, changes, expected', [
+    (None, None, []),
+    ('lifestyle_factors', {'smoking_status': 'Never'},
+     ['health_score', 'recommendations', 'timeline', 'treatment_plan_key']),
+    ('medical_history', {'medications': ['statin']},
+     ['health_score', 'recommendations', 'timeline', 'treatment_plan_key']),
+    ('personal_info', {'weight': 95},
+     ['health_score', 'health_trends', 'recommendations', 'timeline', 'treatment_plan_key']),
+    ('genetic_data', {'variant': 'wild'},
+     ['risk_factors', 'recommendations', 'timeline', 'treatment_plan_key']),
+], ids=['no change', 'smoking status', 'medication list', 'weight', 'genetic data'])
+def test_edit_recomputes_only_dependent_nodes(patient, section, changes, expected):
+    if section == 'genetic_data':
+        genetic_data = patient[section].copy()
+        genetic_data.loc[0, 'variant'] = changes['variant']
+        patient[section] = genetic_data
+    elif section is not None:
+        patient[section] = {**patient[section], **changes}
+
+    assert evaluate(patient, ALL_NODES).recomputed == expected
+
+
+def test_none_result_is_cached():
+    graph = IncrementalGraph([Node('nothing', ['source'], lambda source: None)])
+    sources = {'source': ('v1', lambda: 1)}
+
+    assert graph.evaluate(sources).recomputed == ['nothing']
+    assert graph.evaluate(sources).recomputed == []
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from utils.population_rollups import SCORE_BINS, histogram_quantile
+
+SCORE_EDGES = np.arange(SCORE_BINS + 1, dtype=float)
+
+
+def score_counts(scores):
+    return np.bincount(scores, minlength=SCORE_BINS)
+
+
+def test_discrete_median_interpolates_between_occupied_bins():
+    assert histogram_quantile(score_counts([60, 80]), SCORE_EDGES, 0.5, discrete=True) == 70
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('q', [0, 0.25, 0.5, 0.75, 1])
+def test_discrete_quantile_matches_numpy(seed, q):
+    scores = np.random.default_rng(seed).integers(0, SCORE_BINS, seed * 7 + 1)
+    assert histogram_quantile(score_counts(scores), SCORE_EDGES, q, discrete=True) == \
+        pytest.approx(np.percentile(scores, q * 100))
+
+
+def test_continuous_quantile_interpolates_within_bin():
+    edges = np.linspace(0, 1, 11)
+    counts = np.zeros(10)
+    counts[5] = 4
+    assert histogram_quantile(counts, edges, 0.5) == pytest.approx(0.55)
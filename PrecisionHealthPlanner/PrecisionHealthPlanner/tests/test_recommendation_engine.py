@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from utils.recommendation_engine import RuleSet
+
+RULES = [
+    {'id': 'smoker', 'category': 'lifestyle', 'field': 'smoking_status', 'op': 'eq',
+     'value': 'Current', 'text': 'Quit smoking'},
+    {'id': 'not_never', 'category': 'lifestyle', 'field': 'smoking_status', 'op': 'ne',
+     'value': 'Never', 'text': 'Review smoking history'},
+    {'id': 'inactive', 'category': 'lifestyle', 'field': 'exercise_frequency', 'op': 'in',
+     'value': ['Never', 'Rarely'], 'text': 'Exercise more'},
+    {'id': 'heart', 'category': 'medical', 'field': 'heart_disease', 'op': 'gt',
+     'value': 0.3, 'text': 'See a cardiologist'},
+]
+
+
+@pytest.fixture
+def rules():
+    return RuleSet(['lifestyle', 'medical'], RULES)
+
+
+@pytest.mark.parametrize('features', [
+    {'smoking_status': 'Current', 'exercise_frequency': 'Rarely', 'heart_disease': 0.5},
+    {'smoking_status': 'Never', 'exercise_frequency': 'Daily', 'heart_disease': '0.5'},
+    {'heart_disease': 'unknown'},
+    {'heart_disease': None, 'smoking_status': None},
+    {'smoking_status': ['Current'], 'exercise_frequency': {'Rarely': 1}, 'heart_disease': [0.5]},
+], ids=['typical', 'numeric string', 'non-numeric', 'missing', 'unhashable'])
+def test_single_and_batch_paths_agree(rules, features):
+    batch = rules.evaluate(pd.DataFrame([features]))
+    assert list(rules.evaluate_one(features)) == list(batch[0])
+
+
+def test_non_numeric_value_fires_no_numeric_rule(rules):
+    mask = rules.evaluate_one({'heart_disease': 'high'})
+    assert not mask[[rule['id'] for rule in RULES].index('heart')]
+
+
+@pytest.mark.parametrize('rule, message', [
+    ({'field': 'conditions', 'op': 'eq', 'value': 'Diabetes'}, 'holds a list'),
+    ({'field': 'smoking_status', 'op': 'eq', 'value': ['Current']}, 'Unhashable'),
+    ({'field': 'smoking_status', 'op': 'in', 'value': [['Current']]}, 'Unhashable'),
+])
+def test_rejects_rules_that_cannot_match(rule, message):
+    rule = {'id': 'bad', 'category': 'lifestyle', 'text': '', **rule}
+    with pytest.raises(ValueError, match=message):
+        RuleSet(['lifestyle'], [rule])
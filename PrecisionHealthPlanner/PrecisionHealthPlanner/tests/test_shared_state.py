@@ -0,0 +1,134 @@
+import pytest
+
+from utils.shared_state import (MemoryBackend, RedisBackend, SharedRateLimiter, SharedState,
+                                SQLiteBackend)
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StubRedis:
+    """The redis-py calls RedisBackend makes, on a dict and a fake clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._entries = {}
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= self.clock():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        entry = self._live(key)
+        return None if entry is None else entry[0]
+
+    def set(self, key, value, px=None):
+        self._entries[key] = (value, None if px is None else self.clock() + px / 1000)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def incr(self, key):
+        entry = self._live(key) or (b'0', None)
+        count = int(entry[0]) + 1
+        self._entries[key] = (str(count).encode(), entry[1])
+        return count
+
+    def pexpire(self, key, milliseconds):
+        if self._live(key) is not None:
+            self._entries[key] = (self._entries[key][0], self.clock() + milliseconds / 1000)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, tmp_path, clock):
+    if request.param == 'memory':
+        return MemoryBackend(clock)
+    if request.param == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'shared_state.db'), clock)
+    return RedisBackend(StubRedis(clock))
+
+
+def test_get_set_delete(backend):
+    assert backend.get('k') is None
+    backend.set('k', b'v1')
+    backend.set('k', b'v2')
+    assert backend.get('k') == b'v2'
+    backend.delete('k')
+    assert backend.get('k') is None
+
+
+def test_set_expires_after_ttl(backend, clock):
+    backend.set('k', b'v', ttl=0.5)
+    clock.now += 0.4
+    assert backend.get('k') == b'v'
+    clock.now += 0.1
+    assert backend.get('k') is None
+
+
+def test_incr_counts_from_one(backend):
+    assert [backend.incr('n') for _ in range(3)] == [1, 2, 3]
+
+
+def test_incr_ttl_starts_at_creation_and_resets(backend, clock):
+    assert backend.incr('n', ttl=0.5) == 1
+    clock.now += 0.25
+    # A later incr does not push the expiry back
+    assert backend.incr('n', ttl=0.5) == 2
+    clock.now += 0.25
+    assert backend.incr('n', ttl=0.5) == 1
+    clock.now += 0.375
+    assert backend.incr('n', ttl=0.5) == 2
+
+
+def test_shared_state_round_trips_values(backend):
+    state = SharedState(backend)
+    state.set('plan', {'steps': [1, 2]})
+    assert state.get('plan') == {'steps': [1, 2]}
+    assert state.incr('hits') == 1
+
+
+@pytest.mark.parametrize('rate, limit, window', [
+    (0.5, 1, 2.0),
+    (2.5, 1, 0.4),
+    (50, 5, 0.1),
+    (125, 12, 0.096),
+])
+def test_rate_limit_window_fits_whole_acquisitions(rate, limit, window):
+    limiter = SharedRateLimiter(SharedState(MemoryBackend()), 'sms', rate)
+    assert limiter.limit == limit
+    assert limiter.window == pytest.approx(window)
+    assert limiter.limit / limiter.window == pytest.approx(rate)
+
+
+@pytest.mark.parametrize('rate', [0.5, 2.5, 50])
+def test_rate_limiter_never_exceeds_rate(monkeypatch, clock, rate):
+    def sleep(seconds):
+        clock.now += seconds
+    monkeypatch.setattr('utils.shared_state.time.sleep', sleep)
+    limiter = SharedRateLimiter(SharedState(MemoryBackend(clock)), 'sms', rate)
+
+    start, acquired = clock.now, []
+    while clock.now - start < 20:
+        limiter.acquire()
+        acquired.append(clock.now)
+    # Besides the window open at the end, none admits more than rate allows
+    assert len(acquired) <= rate * 20 + 2 * limiter.limit
+
+
+@pytest.mark.parametrize('rate', [0, -1])
+def test_rate_limiter_rejects_non_positive_rate(rate):
+    with pytest.raises(ValueError):
+        SharedRateLimiter(SharedState(MemoryBackend()), 'sms', rate)
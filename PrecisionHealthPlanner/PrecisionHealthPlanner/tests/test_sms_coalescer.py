@@ -0,0 +1,150 @@
+from concurrent.futures import Future
+
+import pytest
+
+from utils.reminder_scheduler import ReminderScheduler
+from utils.sms_coalescer import MAX_BODY_CHARS, ReminderCoalescer, merge_bodies
+
+PHONE = '+15550000001'
+
+
+class FakeClock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StubSend:
+    """Records (to_number, body) and returns a fake message SID."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def __call__(self, to_number, body):
+        if self.error is not None:
+            raise self.error
+        self.sent.append((to_number, body))
+        return f'SM{len(self.sent)}'
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_scheduler(tmp_path, send, clock, window):
+    return ReminderScheduler(str(tmp_path / 'reminders.db'), send, clock=clock, window=window)
+
+
+def test_window_closes_exactly_at_deadline(tmp_path, clock):
+    send = StubSend()
+    coalescer = ReminderCoalescer(send)
+    scheduler = make_scheduler(tmp_path, coalescer.submit, clock, window=30)
+    scheduler.add(PHONE, 'first', first_fire_at=clock.now)
+    scheduler.add(PHONE, 'second', first_fire_at=clock.now + 20)
+
+    assert scheduler.run_pending(clock.now + 29.5) == 0
+    assert send.sent == []
+
+    assert scheduler.run_pending(clock.now + 30) == 2
+    assert send.sent == [(PHONE, merge_bodies(['first', 'second']))]
+
+
+def test_reminder_after_window_opens_a_new_batch(tmp_path, clock):
+    send = StubSend()
+    scheduler = make_scheduler(tmp_path, ReminderCoalescer(send).submit, clock, window=30)
+    scheduler.add(PHONE, 'first', first_fire_at=clock.now)
+    scheduler.add(PHONE, 'late', first_fire_at=clock.now + 31)
+
+    scheduler.run_pending(clock.now + 30)
+    scheduler.run_pending(clock.now + 60)
+    assert send.sent == [(PHONE, 'first')]
+    scheduler.run_pending(clock.now + 61)
+    assert send.sent == [(PHONE, 'first'), (PHONE, 'late')]
+
+
+def test_zero_window_sends_as_soon_as_due(tmp_path, clock):
+    send = StubSend()
+    scheduler = make_scheduler(tmp_path, ReminderCoalescer(send).submit, clock, window=0)
+    scheduler.add(PHONE, 'now')
+    scheduler.add('+15550000002', 'other')
+
+    assert scheduler.run_pending() == 2
+    assert sorted(send.sent) == [(PHONE, 'now'), ('+15550000002', 'other')]
+
+
+def test_reminders_in_window_survive_restart(tmp_path, clock):
+    first = make_scheduler(tmp_path, ReminderCoalescer(StubSend()).submit, clock, window=30)
+    first.add(PHONE, 'pending', first_fire_at=clock.now)
+    first.run_pending(clock.now + 10)
+
+    send = StubSend()
+    restarted = make_scheduler(tmp_path, ReminderCoalescer(send).submit, clock, window=30)
+    restarted.run_pending(clock.now + 30)
+    assert send.sent == [(PHONE, 'pending')]
+
+
+def test_duplicates_are_dropped():
+    send = StubSend()
+    coalescer = ReminderCoalescer(send)
+    coalescer.submit(PHONE, ['take pills', 'see doctor', 'take pills'])
+
+    assert send.sent == [(PHONE, merge_bodies(['take pills', 'see doctor']))]
+    assert coalescer.stats()['duplicates'] == 1
+
+
+def test_group_is_split_at_max_body_chars():
+    send = StubSend()
+    bodies = [f'{i} ' + 'x' * 500 for i in range(5)]
+    futures = ReminderCoalescer(send).submit(PHONE, bodies)
+
+    assert len(send.sent) == len(futures) == 2
+    assert all(len(body) <= MAX_BODY_CHARS for _, body in send.sent)
+    assert send.sent[0][1] == merge_bodies(bodies[:3])
+    assert send.sent[1][1] == merge_bodies(bodies[3:])
+
+
+def test_send_error_reaches_the_future():
+    error = ConnectionError("twilio down")
+    [future] = ReminderCoalescer(StubSend(error)).submit(PHONE, ['a', 'b'])
+
+    assert future.exception() is error
+
+
+def test_dispatcher_future_is_chained():
+    job = Future()
+    [future] = ReminderCoalescer(lambda to_number, body: job).submit(PHONE, ['a'])
+    assert not future.done()
+
+    job.set_result('SM1')
+    assert future.result() == 'SM1'
+
+
+def test_stats_count_only_handed_over_reminders(tmp_path, clock):
+    send = StubSend()
+    coalescer = ReminderCoalescer(send)
+    scheduler = make_scheduler(tmp_path, coalescer.submit, clock, window=30)
+    for body in ['a', 'b', 'b', 'c']:
+        scheduler.add(PHONE, body, first_fire_at=clock.now)
+    scheduler.add('+15550000002', 'd', first_fire_at=clock.now + 100)
+    scheduler.run_pending(clock.now + 30)
+
+    # The reminder still waiting out its window is in the store, not counted
+    assert coalescer.stats() == {'submitted': 4, 'duplicates': 1, 'sent': 1, 'saved': 3}
+
+
+def test_delivery_is_at_most_once(tmp_path, clock):
+    failing = make_scheduler(tmp_path, StubSend(ConnectionError("dispatcher down")),
+                             clock, window=0)
+    failing.add(PHONE, 'once', first_fire_at=clock.now)
+    failing.add(PHONE, 'daily', 'Daily', first_fire_at=clock.now)
+    assert failing.run_pending(clock.now) == 2
+
+    # The failed one-off is gone and the recurring one waits for its next slot
+    send = StubSend()
+    retry = make_scheduler(tmp_path, ReminderCoalescer(send).submit, clock, window=0)
+    assert retry.run_pending(clock.now + 1) == 0
+    assert retry.next_due_time() == clock.now + 24 * 3600
@@ -0,0 +1,122 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.sms_dispatcher import RateLimiter, SMSDispatcher
+
+FROM_NUMBER = '+15550000000'
+
+
+class TwilioError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class StubClient:
+    """Twilio-shaped client that fails with ``errors`` first, then succeeds."""
+
+    def __init__(self, latency=0.0, errors=()):
+        self.latency = latency
+        self.errors = list(errors)
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, body, from_, to):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            error = self.errors.pop(0) if self.errors else None
+        try:
+            time.sleep(self.latency)
+            if error is not None:
+                raise error
+            return SimpleNamespace(sid=f'SM{self.calls}')
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def send_all(dispatcher, n_messages):
+    jobs = [dispatcher.submit(f'+1555{i:07d}', 'reminder') for i in range(n_messages)]
+    return [job.result() for job in jobs]
+
+
+def test_sends_concurrently():
+    client = StubClient(latency=0.05)
+    dispatcher = SMSDispatcher(client, FROM_NUMBER, concurrency=8, rate_per_second=1000)
+    send_all(dispatcher, 16)
+    dispatcher.shutdown()
+
+    # Wall-clock time is too noisy on a loaded machine; overlap is not
+    assert client.max_in_flight == 8
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_retries_throttling_and_server_errors_with_backoff(monkeypatch, status):
+    sleeps = []
+    monkeypatch.setattr('utils.sms_dispatcher.time.sleep', sleeps.append)
+    client = StubClient(errors=[TwilioError(status), TwilioError(status)])
+    dispatcher = SMSDispatcher(client, FROM_NUMBER, rate_per_second=1000, backoff=0.5)
+
+    assert dispatcher.submit('+15550000001', 'reminder').result() == 'SM3'
+    dispatcher.shutdown()
+    # The stub's own zero-latency sleeps share the patched function
+    assert [seconds for seconds in sleeps if seconds] == [0.5, 1.0]
+    assert dispatcher.stats() == {'sent': 1, 'retries': 2, 'failures': 0}
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr('utils.sms_dispatcher.time.sleep', lambda seconds: None)
+    client = StubClient(errors=[TwilioError(503)] * 3)
+    dispatcher = SMSDispatcher(client, FROM_NUMBER, rate_per_second=1000, max_retries=2)
+
+    with pytest.raises(TwilioError):
+        dispatcher.submit('+15550000001', 'reminder').result()
+    dispatcher.shutdown()
+    assert client.calls == 3
+    assert dispatcher.stats() == {'sent': 0, 'retries': 2, 'failures': 1}
+
+
+@pytest.mark.parametrize('status', [400, 404])
+def test_client_errors_are_not_retried(status):
+    client = StubClient(errors=[TwilioError(status)])
+    dispatcher = SMSDispatcher(client, FROM_NUMBER, rate_per_second=1000)
+
+    with pytest.raises(TwilioError):
+        dispatcher.submit('+15550000001', 'reminder').result()
+    dispatcher.shutdown()
+    assert client.calls == 1
+    assert dispatcher.stats()['failures'] == 1
+
+
+def test_throughput_is_bounded_by_rate():
+    rate, n_messages = 40, 21
+    dispatcher = SMSDispatcher(StubClient(), FROM_NUMBER, concurrency=8,
+                               rate_limiter=RateLimiter(rate, burst=1))
+    start = time.perf_counter()
+    send_all(dispatcher, n_messages)
+    elapsed = time.perf_counter() - start
+    dispatcher.shutdown()
+
+    # The first message uses the initial token; each later one waits 1 / rate
+    assert (n_messages - 1) / elapsed <= rate * 1.05
+
+
+def test_fractional_rate_still_sends():
+    limiter = RateLimiter(0.5)
+    start = time.perf_counter()
+    limiter.acquire()
+    assert time.perf_counter() - start < 0.1
+
+
+@pytest.mark.parametrize('rate', [0, -1])
+def test_rejects_non_positive_rate(rate):
+    with pytest.raises(ValueError):
+        RateLimiter(rate)
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+
+from utils.timeseries_store import METRIC_DTYPES, TimeSeriesStore
+
+
+def readings(values):
+    return {metric: np.asarray(values, dtype=float) for metric in METRIC_DTYPES}
+
+
+def test_append_after_torn_write_keeps_rows_aligned(tmp_path):
+    store = TimeSeriesStore(str(tmp_path))
+    store.append('p1', ['2024-01-01', '2024-01-02'], readings([1, 2]))
+
+    # A crash after the metric columns were written but before the timestamps,
+    # with the last metric value itself only half written
+    partition = tmp_path / 'p1' / '2024-01'
+    for metric in METRIC_DTYPES:
+        with open(partition / f'{metric}.bin', 'ab') as f:
+            f.write(np.float32(99).tobytes()[:2 if metric == 'cholesterol' else 4])
+    assert len(store.query('p1')['timestamp']) == 2
+
+    store.append('p1', ['2024-01-03'], readings([3]))
+    result = store.query('p1')
+    assert list(result['timestamp'].astype(str)) == ['2024-01-01T00:00:00',
+                                                    '2024-01-02T00:00:00',
+                                                    '2024-01-03T00:00:00']
+    for metric in METRIC_DTYPES:
+        assert list(result[metric]) == [1, 2, 3]
+        assert os.path.getsize(partition / f'{metric}.bin') == 3 * 4
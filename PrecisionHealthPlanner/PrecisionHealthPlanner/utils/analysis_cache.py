@@ -0,0 +1,168 @@
+import hashlib
+from datetime import date, datetime
+
+import pandas as pd
+
+from utils import chart_templates
+from utils.data_processor import DataProcessor
+from utils.incremental import IncrementalGraph, Node, digest_value
+from utils.instrumentation import timed
+from utils.lru_cache import LRUCache
+from utils.patient_repository import JSON_SECTIONS, PATIENT_SECTIONS
+from utils.pdf_cache import get_pdf_cache, treatment_plan_key
+from utils.patient_similarity import record_patient_vector
+from utils.population_rollups import record_patient_analysis
+from utils.recommendation_engine import RecommendationEngine
+from utils.shared_state import get_shared_state
+
+# Analyses kept per process before least-recently-used eviction
+ANALYSIS_CACHE_SIZE = 256
+
+# How long analyses stay in the cache shared by all worker processes, in seconds
+SHARED_ANALYSIS_TTL = 24 * 3600
+
+# Values returned by get_patient_analysis
+ANALYSIS_NODES = ('risk_factors', 'health_score', 'health_trends', 'recommendations')
+
+
+def _sections(personal_info, medical_history, lifestyle_factors):
+    return {'personal_info': personal_info, 'medical_history': medical_history,
+            'lifestyle_factors': lifestyle_factors}
+
+
+def _health_trends(personal_info):
+    # Seeded from the patient's identity so both pages, and edits to other
+    # fields, show the same trends
+    identity = personal_info.get('patient_id', personal_info.get('name', ''))
+    return DataProcessor.generate_mock_trends(seed=int(digest_value(identity)[:16], 16))
+
+
+# Derived values and the sections they read. A lifestyle edit recomputes
+# the score and recommendations but never touches the genetic data.
+analysis_graph = IncrementalGraph([
+    Node('risk_factors', ['genetic_data'], DataProcessor.process_genetic_data),
+    Node('health_score', JSON_SECTIONS,
+         lambda *sections: DataProcessor.calculate_health_score(_sections(*sections))),
+    Node('health_trends', ['personal_info'], _health_trends),
+    Node('recommendations', [*JSON_SECTIONS, 'risk_factors'],
+         lambda *inputs: RecommendationEngine.generate_recommendations(
+             _sections(*inputs[:-1]), inputs[-1])),
+    Node('timeline', ['recommendations', 'today'],
+         lambda recommendations, today: chart_templates.schedule_timeline(
+             recommendations, base_date=datetime.combine(today, datetime.min.time()))),
+    Node('treatment_plan_key', ['personal_info', 'recommendations'], treatment_plan_key),
+])
+
+
+def section_digests(patient_data):
+    """Content hash of each patient section.
+
+    Stored patients (see utils.patient_repository) read their digests from
+    the database, so nothing has to be loaded or hashed.
+    """
+    if hasattr(patient_data, 'section_digests'):
+        return patient_data.section_digests()
+    digests = {section: digest_value(patient_data.get(section) or {})
+               for section in JSON_SECTIONS}
+
+    genetic_data = patient_data.get('genetic_data')
+    if genetic_data is None:
+        digests['genetic_data'] = 'none'
+    else:
+        digest = hashlib.sha256(','.join(map(str, genetic_data.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(genetic_data, index=False)
+                      .to_numpy().tobytes())
+        digests['genetic_data'] = digest.hexdigest()
+    return digests
+
+
+def patient_fingerprint(patient_data, digests=None):
+    """Content hash of a patient's data, including the genetic DataFrame."""
+    digests = digests or section_digests(patient_data)
+    return hashlib.sha256(
+        ''.join(digests[section] for section in PATIENT_SECTIONS).encode()).hexdigest()
+
+
+def evaluate(patient_data, targets, digests=None):
+    """Evaluate nodes of the analysis graph for a patient.
+
+    Sections are only loaded if a node reading them has to be recomputed.
+    Returns the graph's Evaluation, whose ``recomputed`` list names the
+    nodes that were not already cached.
+    """
+    digests = digests or section_digests(patient_data)
+    if hasattr(patient_data, 'load_section'):
+        def loader(section):
+            return lambda: patient_data.load_section(section, digests[section])
+    else:
+        def loader(section):
+            return lambda: patient_data.get(section)
+
+    sources = {section: (digests[section], loader(section)) for section in PATIENT_SECTIONS}
+    today = date.today()
+    sources['today'] = (today.isoformat(), lambda: today)
+    return analysis_graph.evaluate(sources, targets)
+
+
+analysis_cache = LRUCache(ANALYSIS_CACHE_SIZE)
+
+
+@timed('analysis_cache.get_patient_analysis')
+def get_patient_analysis(patient_data):
+    """Return risk factors, health score, trends and recommendations for a patient.
+
+    Results are shared by every page and session in the process, so a
+    rerun with unchanged patient data is a single dictionary lookup, and
+    an edit only recomputes the values that depend on the edited section.
+    Other worker processes see them through the shared state backend.
+    Freshly scored stored patients are folded into the cohort-wide stores
+    (see record_cohort_analysis).
+    Callers must treat the returned dict as read-only.
+    """
+    digests = section_digests(patient_data)
+    key = patient_fingerprint(patient_data, digests)
+    analysis = analysis_cache.get(key)
+    if analysis is not None:
+        return analysis
+
+    shared_state = get_shared_state()
+    analysis = shared_state.get(f'analysis:{key}')
+    if analysis is None:
+        values = evaluate(patient_data, ANALYSIS_NODES, digests).values
+        analysis = {name: values[name] for name in ANALYSIS_NODES}
+        shared_state.set(f'analysis:{key}', analysis, ttl=SHARED_ANALYSIS_TTL)
+        record_cohort_analysis(patient_data, analysis, key)
+    analysis_cache.put(key, analysis)
+    return analysis
+
+
+def record_cohort_analysis(patient_data, analysis, fingerprint):
+    """Fold a stored patient's analysis into the rollups and similar-patient index.
+
+    Both skip a patient whose fingerprint they have already recorded.
+    """
+    record_patient_analysis(patient_data, analysis, fingerprint)
+    record_patient_vector(patient_data, analysis, fingerprint)
+
+
+@timed('analysis_cache.get_schedule_timeline')
+def get_schedule_timeline(patient_data):
+    """The treatment schedule figure, rebuilt only when recommendations change."""
+    return evaluate(patient_data, ['timeline']).values['timeline']
+
+
+@timed('analysis_cache.get_treatment_plan_pdf')
+def get_treatment_plan_pdf(patient_data):
+    """Open the treatment plan PDF from the shared disk cache.
+
+    It is rendered only if no session or worker has rendered a plan with
+    the same content before. The caller must close the returned file.
+    """
+    values = evaluate(patient_data, ['treatment_plan_key']).values
+
+    def render(output):
+        # Imported lazily so pages that never export do not load reportlab
+        from utils.pdf_generator import PDFGenerator
+        PDFGenerator.write_treatment_plan_pdf(patient_data, values['recommendations'], output)
+
+    return get_pdf_cache().open(values['treatment_plan_key'], render)
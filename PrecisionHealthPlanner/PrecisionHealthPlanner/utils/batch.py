@@ -0,0 +1,207 @@
+"""Headless cohort processing: genetic risk scoring, recommendations and PDFs.
+
+Run from the app directory, e.g.::
+
+    python -m utils.batch patients.csv --genetic variants.csv --output results/
+
+``patients.csv`` has one row per patient with a ``patient_id`` column and
+any of the patient input fields (name, age, exercise_frequency, ...).
+Multiple ``conditions`` are separated by ``;``.
+``variants.csv`` holds long-format ``patient_id,gene,variant`` calls.
+Patients are processed in chunks across a process pool; each finished
+chunk is written as its own part file, so rerunning the same command after
+an interruption skips the chunks that are already done.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import (
+    BASE_RISK, GENE_RISK_WEIGHTS, RISK_CONDITIONS, VARIANT_EFFECT, DataProcessor,
+    HealthScorePercentiles
+)
+from utils.recommendation_engine import RecommendationEngine, get_rule_set
+
+DEFAULT_CHUNK_SIZE = 10_000
+MANIFEST_NAME = '_manifest.json'
+
+
+def read_variant_calls(path):
+    """Read cohort variant calls with compact categorical columns."""
+    return pd.read_csv(path, usecols=['patient_id', 'gene', 'variant'], dtype={
+        'gene': pd.CategoricalDtype(list(GENE_RISK_WEIGHTS)),
+        'variant': pd.CategoricalDtype(list(VARIANT_EFFECT)),
+    }).dropna(subset=['gene', 'variant'])
+
+
+def score_chunk(patients, calls):
+    """Risk factors and triggered recommendation rules for one chunk of patients."""
+    risks = DataProcessor.process_cohort_genetic_data(calls)
+    risks = risks.reindex(patients['patient_id']).fillna(BASE_RISK).set_axis(patients.index)
+    features = patients.drop(columns=RISK_CONDITIONS, errors='ignore').join(risks)
+
+    mask = RecommendationEngine.generate_cohort_recommendations(features).to_numpy()
+    rule_ids = np.array([rule['id'] for rule in get_rule_set().rules])
+    rows, columns = np.nonzero(mask)
+    triggered = (pd.Series(rule_ids[columns]).groupby(rows).agg('|'.join)
+                 .reindex(range(len(patients)), fill_value=''))
+
+    result = features[['patient_id']].copy()
+    result[RISK_CONDITIONS] = features[RISK_CONDITIONS]
+    result = result.join(DataProcessor.calculate_cohort_health_scores(patients))
+    result['recommendations'] = triggered.to_numpy()
+    return result, features, mask
+
+
+def write_pdfs(features, mask, pdf_dir):
+    from utils.pdf_generator import PDFGenerator
+
+    rules = get_rule_set()
+    for row, patient_mask in zip(features.to_dict('records'), mask):
+        patient_data = {'personal_info': {'name': row.get('name', row['patient_id']),
+                                          'age': row.get('age', 'N/A'),
+                                          'gender': row.get('gender', 'N/A')}}
+        PDFGenerator.write_treatment_plan_pdf(
+            patient_data, rules.recommendations_for(patient_mask),
+            os.path.join(pdf_dir, f"treatment_plan_{row['patient_id']}.pdf"))
+
+
+def process_chunk(index, patients, calls, output_dir, fmt, pdf_dir):
+    """Worker entry point: score one chunk and write its part file atomically."""
+    result, features, mask = score_chunk(patients, calls)
+    if pdf_dir:
+        write_pdfs(features, mask, pdf_dir)
+    path = os.path.join(output_dir, f'part-{index:05d}.{fmt}')
+    tmp_path = f'{path}.tmp'
+    if fmt == 'parquet':
+        result.to_parquet(tmp_path, index=False)
+    else:
+        result.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return index, len(result)
+
+
+def load_manifest(output_dir, cohort, chunk_size):
+    """Reuse the chunking of an interrupted run, or record a new one."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {'cohort': os.path.abspath(cohort), 'chunk_size': chunk_size}
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise SystemExit(f"{output_dir} holds a run with different settings "
+                             f"({previous}); use a new output directory")
+    else:
+        with open(path, 'w') as f:
+            json.dump(manifest, f)
+
+
+def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    if args.pdf_dir:
+        os.makedirs(args.pdf_dir, exist_ok=True)
+    load_manifest(args.output, args.cohort, args.chunk_size)
+
+    patients = pd.read_csv(args.cohort)
+    if 'patient_id' not in patients:
+        raise SystemExit("Cohort file must have a patient_id column")
+    if 'conditions' in patients:
+        patients['conditions'] = patients['conditions'].fillna('').astype(str).str.split(';')
+    calls = (read_variant_calls(args.genetic) if args.genetic
+             else pd.DataFrame(columns=['patient_id', 'gene', 'variant']))
+
+    # Order calls by chunk so each chunk's calls are one contiguous slice
+    chunk_of = pd.Series(np.arange(len(patients)) // args.chunk_size,
+                         index=patients['patient_id'])
+    call_chunks = chunk_of.reindex(calls['patient_id']).to_numpy()
+    calls = calls[~np.isnan(call_chunks)]
+    call_chunks = call_chunks[~np.isnan(call_chunks)].astype(int)
+    order = np.argsort(call_chunks, kind='stable')
+    calls, call_chunks = calls.iloc[order], call_chunks[order]
+
+    n_chunks = -(-len(patients) // args.chunk_size)
+    bounds = np.searchsorted(call_chunks, np.arange(n_chunks + 1))
+    done = {i for i in range(n_chunks)
+            if os.path.exists(os.path.join(args.output, f'part-{i:05d}.{args.format}'))}
+    if done:
+        print(f"Resuming: {len(done)}/{n_chunks} chunks already written", file=sys.stderr)
+
+    start = time.perf_counter()
+    processed = 0
+    workers = args.workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for i in range(n_chunks):
+            if i in done:
+                continue
+            pending.add(pool.submit(
+                process_chunk, i,
+                patients.iloc[i * args.chunk_size:(i + 1) * args.chunk_size].reset_index(drop=True),
+                calls.iloc[bounds[i]:bounds[i + 1]],
+                args.output, args.format, args.pdf_dir
+            ))
+            # Bound queued chunks so memory stays flat for huge cohorts
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                processed += report_progress(finished, done, n_chunks, start, processed)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            processed += report_progress(finished, done, n_chunks, start, processed)
+
+    if args.save_population:
+        save_population(args.output, args.format, n_chunks)
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {processed:,} patients in {elapsed:.1f}s "
+          f"({processed / max(elapsed, 1e-9):,.0f} patients/s)", file=sys.stderr)
+
+
+def report_progress(finished, done, n_chunks, start, processed):
+    count = 0
+    for future in finished:
+        index, rows = future.result()
+        done.add(index)
+        count += rows
+    elapsed = time.perf_counter() - start
+    total = processed + count
+    print(f"[{len(done)}/{n_chunks} chunks] {total:,} patients, "
+          f"{total / max(elapsed, 1e-9):,.0f} patients/s", file=sys.stderr)
+    return count
+
+
+def save_population(output_dir, fmt, n_chunks):
+    """Store the cohort's health scores as the population for percentile ranks."""
+    scores = []
+    for i in range(n_chunks):
+        path = os.path.join(output_dir, f'part-{i:05d}.{fmt}')
+        part = (pd.read_parquet(path, columns=['health_score']) if fmt == 'parquet'
+                else pd.read_csv(path, usecols=['health_score']))
+        scores.append(part['health_score'].to_numpy())
+    HealthScorePercentiles.from_scores(np.concatenate(scores)).save()
+    print("Saved population health scores for percentile ranking", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.batch', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cohort', help="CSV with one row per patient and a patient_id column")
+    parser.add_argument('--genetic', help="CSV of patient_id,gene,variant calls")
+    parser.add_argument('--output', required=True, help="directory for result part files")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--pdf-dir', help="also write a treatment plan PDF per patient here")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--save-population', action='store_true',
+                        help="use this cohort's health scores for dashboard percentiles")
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cores)")
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
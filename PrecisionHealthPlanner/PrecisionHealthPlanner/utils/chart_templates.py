@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from utils.instrumentation import timed
+
+# Trend metrics plotted on the dashboard, in trace order
+TREND_METRICS = ['blood_pressure', 'glucose_levels', 'cholesterol']
+
+# Timeline bar colour per recommendation category
+CATEGORY_COLORS = {
+    'Medications': '#0066cc',
+    'Lifestyle Changes': '#00cc99',
+}
+DEFAULT_CATEGORY_COLOR = '#ff9900'
+
+
+@lru_cache(maxsize=None)
+def _skeleton(name):
+    """Build and validate a figure once per process, returned as a plain dict."""
+    import plotly.graph_objects as go
+
+    if name == 'health_score':
+        fig = go.Figure(go.Indicator(
+            mode="gauge+number",
+            title={'text': "Health Score"},
+            domain={'x': [0, 1], 'y': [0, 1]},
+            gauge={'axis': {'range': [0, 100]},
+                   'bar': {'color': "#0066cc"},
+                   'steps': [
+                       {'range': [0, 50], 'color': "lightgray"},
+                       {'range': [50, 75], 'color': "gray"},
+                       {'range': [75, 100], 'color': "darkgray"}
+                   ]}
+        ))
+    elif name == 'risk_radar':
+        fig = go.Figure(go.Scatterpolar(fill='toself', name='Risk Factors'))
+        fig.update_layout(
+            polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+            showlegend=False
+        )
+    elif name == 'trends':
+        fig = go.Figure([go.Scatter(name=metric.replace('_', ' ').title())
+                         for metric in TREND_METRICS])
+        fig.update_layout(
+            xaxis_title="Date",
+            yaxis_title="Value",
+            hovermode='x unified'
+        )
+    elif name == 'timeline':
+        fig = go.Figure(go.Bar(orientation='h'))
+        fig.update_layout(
+            title="Treatment Schedule Timeline",
+            xaxis_title="Duration (days)",
+            showlegend=False,
+            height=400,
+            margin=dict(l=10, r=10, t=30, b=10)
+        )
+    elif name == 'histogram':
+        fig = go.Figure(go.Bar(marker_color="#0066cc"))
+        fig.update_layout(
+            yaxis_title="Patients",
+            bargap=0,
+            showlegend=False,
+            margin=dict(l=10, r=10, t=30, b=10)
+        )
+    elif name == 'frequency':
+        fig = go.Figure(go.Bar(orientation='h', marker_color="#00cc99"))
+        fig.update_layout(
+            xaxis_title="Patients",
+            yaxis=dict(autorange='reversed'),
+            showlegend=False,
+            margin=dict(l=10, r=10, t=30, b=10)
+        )
+    else:
+        raise ValueError(f"Unknown chart template: {name}")
+    return fig.to_dict()
+
+
+def _from_skeleton(name, *trace_updates):
+    """Fill a cached skeleton's traces with new data arrays.
+
+    The skeleton was validated when it was built and the arrays come from
+    our own code, so plotly's per-property validation is skipped here.
+    """
+    import plotly.graph_objects as go
+
+    skeleton = _skeleton(name)
+    data = [{**trace, **updates} for trace, updates in zip(skeleton['data'], trace_updates)]
+    return go.Figure({'data': data, 'layout': skeleton['layout']}, _validate=False)
+
+
+@timed('chart_templates.health_score_gauge')
+def health_score_gauge(health_score):
+    return _from_skeleton('health_score', {'value': health_score})
+
+
+@timed('chart_templates.risk_radar')
+def risk_radar(risk_factors):
+    return _from_skeleton('risk_radar', {'r': list(risk_factors.values()),
+                                         'theta': list(risk_factors.keys())})
+
+
+@timed('chart_templates.trends_chart')
+def trends_chart(health_trends):
+    return _from_skeleton('trends', *[
+        {'x': health_trends['dates'], 'y': health_trends[metric]}
+        for metric in TREND_METRICS
+    ])
+
+
+@timed('chart_templates.schedule_timeline')
+def schedule_timeline(recommendations, base_date=None, duration_days=28):
+    """Timeline of recommendations as a single bar trace with per-bar colours."""
+    base_date = base_date or datetime.now()
+    activities, colors, hovertext, text = [], [], [], []
+    for category, items in recommendations.items():
+        color = CATEGORY_COLORS.get(category, DEFAULT_CATEGORY_COLOR)
+        for i, item in enumerate(items):
+            start = base_date + timedelta(days=i * 7)
+            span = (f"{start.strftime('%Y-%m-%d')} to "
+                    f"{(start + timedelta(days=duration_days)).strftime('%Y-%m-%d')}")
+            activity = f"{category}: {item}"
+            activities.append(activity)
+            colors.append(color)
+            text.append(span)
+            hovertext.append(f"{activity}<br>{span}")
+
+    return _from_skeleton('timeline', {
+        'x': [duration_days] * len(activities),
+        'y': activities,
+        'marker': {'color': colors},
+        'text': text,
+        'hovertext': hovertext,
+    })
+
+
+@timed('chart_templates.histogram_chart')
+def histogram_chart(edges, counts, x_title):
+    """Pre-binned histogram: one bar per bin, centred between its edges."""
+    edges = list(edges)
+    figure = _from_skeleton('histogram', {
+        'x': [(lo + hi) / 2 for lo, hi in zip(edges[:-1], edges[1:])],
+        'y': list(counts),
+        'width': [hi - lo for lo, hi in zip(edges[:-1], edges[1:])],
+    })
+    figure.update_layout(xaxis_title=x_title)
+    return figure
+
+
+@timed('chart_templates.frequency_chart')
+def frequency_chart(frequencies):
+    """Horizontal bars of label -> count, in the given order."""
+    return _from_skeleton('frequency', {'x': list(frequencies.values()),
+                                        'y': list(frequencies.keys())})
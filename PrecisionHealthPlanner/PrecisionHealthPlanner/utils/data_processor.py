@@ -1,41 +1,317 @@
+import os
 import pandas as pd
 import numpy as np
+from functools import lru_cache
+from utils.genotype_matrix import GENOTYPES, GenotypeMatrix
+from utils.instrumentation import timed
+from utils.risk_index import RiskIndex
+from utils.storage import data_path
+
+# Conditions scored by the genetic risk model, in output column order
+RISK_CONDITIONS = ['heart_disease', 'diabetes', 'cancer', 'alzheimers']
+
+# Baseline population risk before any genetic contribution
+BASE_RISK = 0.1
+
+# Per-gene risk weights for a fully penetrant (homozygous) variant
+GENE_RISK_WEIGHTS = {
+    'APOE': {'heart_disease': 0.6, 'diabetes': 0.0, 'cancer': 0.0, 'alzheimers': 1.2},
+    'BRCA1': {'heart_disease': 0.0, 'diabetes': 0.0, 'cancer': 1.4, 'alzheimers': 0.0},
+    'BRCA2': {'heart_disease': 0.0, 'diabetes': 0.0, 'cancer': 1.1, 'alzheimers': 0.0},
+    'LDLR': {'heart_disease': 1.3, 'diabetes': 0.0, 'cancer': 0.0, 'alzheimers': 0.0},
+    'PCSK9': {'heart_disease': 0.9, 'diabetes': 0.0, 'cancer': 0.0, 'alzheimers': 0.0},
+    'TCF7L2': {'heart_disease': 0.2, 'diabetes': 1.0, 'cancer': 0.0, 'alzheimers': 0.0},
+    'KCNJ11': {'heart_disease': 0.0, 'diabetes': 0.7, 'cancer': 0.0, 'alzheimers': 0.0},
+    'TP53': {'heart_disease': 0.0, 'diabetes': 0.0, 'cancer': 1.6, 'alzheimers': 0.0},
+}
+
+# Fraction of the gene weight contributed by each variant call
+VARIANT_EFFECT = {
+    'wild': 0.0,
+    'het': 0.5,
+    'hom': 1.0,
+    'mutation': 1.0,
+}
+
+# Health score before any lifestyle, BMI or condition adjustments
+HEALTH_SCORE_BASE = 70
+
+# Health score points per answer on the patient input form
+LIFESTYLE_POINTS = {
+    'exercise_frequency': {'Regular': 10, 'Occasional': 5, 'Rarely': -5, 'Never': -10},
+    'smoking_status': {'Never': 10, 'Former': 0, 'Current': -15},
+    'alcohol_consumption': {'None': 5, 'Occasional': 2, 'Moderate': 0, 'Heavy': -10},
+    'diet_type': {'Balanced': 5, 'Vegetarian': 5, 'Vegan': 3, 'Keto': 0, 'Other': 0},
+}
+
+# BMI band lower bounds, and the points for each band (below, normal, over, obese)
+BMI_BANDS = np.array([18.5, 25.0, 30.0])
+BMI_POINTS = np.array([-5, 5, 0, -10])
+
+# Points lost per existing condition, and the most that conditions can cost
+CONDITION_PENALTY = 5
+MAX_CONDITION_PENALTY = 20
+# Condition entries that do not count as a condition
+NO_CONDITION = ('None', '')
+
+# Sorted population health scores used for percentile ranking
+POPULATION_SCORES_FILE = 'health_score_population.npy'
+
+# Rows per chunk when streaming genetic CSV uploads
+GENETIC_CSV_CHUNKSIZE = 100_000
+
+
+def _risk_from_score(score):
+    """Map an additive genetic score onto a 0-1 risk."""
+    return BASE_RISK + (1 - BASE_RISK) * (1 - np.exp(-score))
+
+
+def _bmi(height_cm, weight_kg):
+    """BMI from height and weight; NaN where either is missing or zero."""
+    height_m = np.asarray(height_cm, dtype=float) / 100
+    weight_kg = np.asarray(weight_kg, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bmi = weight_kg / height_m ** 2
+    return np.where((height_m > 0) & (weight_kg > 0), bmi, np.nan)
+
+
+def _bmi_points(bmi):
+    points = BMI_POINTS[np.searchsorted(BMI_BANDS, np.nan_to_num(bmi), side='right')]
+    return np.where(np.isnan(bmi), 0, points)
+
+
+def _condition_points(n_conditions):
+    return -np.minimum(np.asarray(n_conditions) * CONDITION_PENALTY, MAX_CONDITION_PENALTY)
+
+
+def _count_conditions(conditions):
+    return sum(1 for condition in conditions or [] if condition not in NO_CONDITION)
+
+
+class HealthScorePercentiles:
+    """Population health scores kept sorted so a rank is one binary search."""
+
+    def __init__(self, sorted_scores):
+        self.sorted_scores = sorted_scores
+
+    @classmethod
+    def from_scores(cls, scores):
+        return cls(np.sort(np.asarray(scores, dtype=np.float32)))
+
+    @classmethod
+    def load(cls, path=None):
+        """Memory-map a saved population, or return None if there is none."""
+        path = path or data_path(POPULATION_SCORES_FILE)
+        try:
+            return cls(np.load(path, mmap_mode='r'))
+        except FileNotFoundError:
+            return None
+
+    def save(self, path=None):
+        """Write the population atomically so concurrent workers never see a partial file."""
+        path = path or data_path(POPULATION_SCORES_FILE)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.sorted_scores)
+        os.replace(tmp_path, path)
+
+    def rank(self, scores):
+        """Percentage of the population scoring at or below each score."""
+        if not len(self.sorted_scores):
+            return np.full(np.shape(scores), np.nan)
+        positions = np.searchsorted(self.sorted_scores, scores, side='right')
+        return positions / len(self.sorted_scores) * 100
+
+
+def get_population_percentiles():
+    """The saved population for percentile ranks, or None if none is saved."""
+    return HealthScorePercentiles.load()
+
+
+@lru_cache(maxsize=None)
+def get_risk_index():
+    """Load the shared risk index once per process."""
+    return RiskIndex.load_or_build(GENE_RISK_WEIGHTS, VARIANT_EFFECT, RISK_CONDITIONS)
+
 
 class DataProcessor:
     @staticmethod
-    def process_genetic_data(genetic_data):
-        """Process mock genetic data and return risk factors."""
-        # Mock genetic analysis
-        risk_factors = {
-            'heart_disease': np.random.uniform(0, 1),
-            'diabetes': np.random.uniform(0, 1),
-            'cancer': np.random.uniform(0, 1),
-            'alzheimers': np.random.uniform(0, 1)
+    @timed('data_processor.read_genetic_csv')
+    def read_genetic_csv(source, chunksize=GENETIC_CSV_CHUNKSIZE):
+        """Stream a gene/variant CSV, keeping only calls the risk model uses.
+
+        The file is read in chunks with categorical dtypes, so peak memory
+        is bounded by the chunk size plus the retained calls rather than
+        by the size of the upload.
+        """
+        dtypes = {
+            'gene': pd.CategoricalDtype(list(GENE_RISK_WEIGHTS)),
+            'variant': pd.CategoricalDtype(list(VARIANT_EFFECT)),
         }
-        return risk_factors
-    
+        try:
+            reader = pd.read_csv(source, usecols=list(dtypes), dtype=dtypes,
+                                 chunksize=chunksize)
+        except ValueError as e:
+            raise ValueError(
+                "Genetic data must have 'gene' and 'variant' columns") from e
+
+        chunks = []
+        with reader:
+            for chunk in reader:
+                # Genes and variants outside the model parse as NaN
+                chunk = chunk.dropna()
+                if not chunk.empty:
+                    chunks.append(chunk)
+
+        if not chunks:
+            return pd.DataFrame({name: pd.Series(dtype=dtype)
+                                 for name, dtype in dtypes.items()})
+        return pd.concat(chunks, ignore_index=True)
+
+    @staticmethod
+    @timed('data_processor.process_genetic_data')
+    def process_genetic_data(genetic_data):
+        """Process a patient's gene/variant calls and return risk factors.
+
+        ``genetic_data`` is a gene/variant DataFrame or a one-patient
+        GenotypeMatrix. Either way a gene called more than once counts
+        once, with its most severe call.
+        """
+        if isinstance(genetic_data, GenotypeMatrix):
+            scores = DataProcessor._genotype_scores(genetic_data)[0]
+        elif genetic_data is None or genetic_data.empty:
+            scores = np.zeros(len(RISK_CONDITIONS))
+        else:
+            scores = DataProcessor._call_scores(
+                np.zeros(len(genetic_data), dtype=np.intp), 1, genetic_data)[0]
+
+        return {condition: float(risk)
+                for condition, risk in zip(RISK_CONDITIONS, _risk_from_score(scores))}
+
     @staticmethod
+    @timed('data_processor.process_cohort_genetic_data')
+    def process_cohort_genetic_data(cohort_data):
+        """Score a whole cohort of variant calls in one vectorized pass.
+
+        ``cohort_data`` is a long-format DataFrame with ``patient_id``,
+        ``gene`` and ``variant`` columns. Returns a DataFrame indexed by
+        patient_id with one risk column per condition in RISK_CONDITIONS.
+        Repeated calls for a gene count once, as in process_genetic_data.
+        """
+        patient_codes, patients = pd.factorize(cohort_data['patient_id'])
+        scores = DataProcessor._call_scores(patient_codes, len(patients), cohort_data)
+        return pd.DataFrame(_risk_from_score(scores), index=patients,
+                            columns=RISK_CONDITIONS).rename_axis('patient_id')
+
+    @staticmethod
+    def _call_scores(patient_codes, n_patients, calls):
+        index = get_risk_index()
+        # Rank repeated calls the way GenotypeMatrix does: wild < het < hom
+        severity = [VARIANT_EFFECT.get(variant, 0.0) for variant in index.variants]
+        return index.patient_scores(patient_codes, n_patients, calls['gene'], calls['variant'],
+                                    severity)
+
+    @staticmethod
+    def _genotype_scores(matrix):
+        table = get_risk_index().genotype_table(matrix.genes, GENOTYPES)
+        return matrix.weighted_sum(table)
+
+    @staticmethod
+    @timed('data_processor.process_genotype_matrix')
+    def process_genotype_matrix(matrix):
+        """Score a packed GenotypeMatrix without unpacking it.
+
+        Returns the same frame as process_cohort_genetic_data: one row per
+        patient, one risk column per condition in RISK_CONDITIONS.
+        """
+        return pd.DataFrame(_risk_from_score(DataProcessor._genotype_scores(matrix)),
+                            index=matrix.patients,
+                            columns=RISK_CONDITIONS).rename_axis('patient_id')
+
+    @staticmethod
+    def patient_features(patient_data, risk_factors=None):
+        """Flatten a patient's sections (and risk factors) into one feature dict."""
+        features = {}
+        for section in ('personal_info', 'medical_history', 'lifestyle_factors'):
+            features.update(patient_data.get(section) or {})
+        features.update(risk_factors or {})
+        return features
+
+    @staticmethod
+    @timed('data_processor.calculate_health_score')
     def calculate_health_score(patient_data):
         """Calculate overall health score based on various factors."""
-        base_score = 70  # Base health score
-        
+        score = HEALTH_SCORE_BASE
+
         # Adjust score based on lifestyle factors
-        lifestyle = patient_data.get('lifestyle_factors', {})
-        if lifestyle.get('exercise_frequency') == 'Regular':
-            base_score += 10
-        if lifestyle.get('smoking_status') == 'Never':
-            base_score += 10
-        
-        # Cap score at 100
-        return min(base_score, 100)
-    
-    @staticmethod
-    def generate_mock_trends():
-        """Generate mock health metric trends."""
-        dates = pd.date_range(start='2023-01-01', periods=12, freq='M')
+        lifestyle = patient_data.get('lifestyle_factors') or {}
+        for field, points in LIFESTYLE_POINTS.items():
+            score += points.get(lifestyle.get(field), 0)
+
+        personal_info = patient_data.get('personal_info') or {}
+        score += _bmi_points(_bmi(personal_info.get('height') or 0,
+                                  personal_info.get('weight') or 0))
+        conditions = (patient_data.get('medical_history') or {}).get('conditions')
+        score += _condition_points(_count_conditions(conditions))
+
+        return int(np.clip(score, 0, 100))
+
+    @staticmethod
+    @timed('data_processor.calculate_cohort_health_scores')
+    def calculate_cohort_health_scores(patients):
+        """Score a DataFrame of patients, returning each score's components.
+
+        ``patients`` has one row per patient with any of the lifestyle
+        columns, ``height``/``weight`` and ``conditions`` (lists of
+        condition names, or a numeric ``n_conditions`` column). Missing
+        columns contribute no points. Returns a DataFrame on the same index
+        with one ``*_points`` column per component, ``bmi`` and the clipped
+        ``health_score``.
+        """
+        n = len(patients)
+        components = pd.DataFrame(index=patients.index)
+        components['base_points'] = np.full(n, HEALTH_SCORE_BASE)
+
+        for field, points in LIFESTYLE_POINTS.items():
+            if field in patients:
+                # Unknown answers take code -1, i.e. the trailing zero
+                table = np.append(np.array(list(points.values())), 0)
+                codes = pd.Index(list(points)).get_indexer(patients[field])
+                components[f'{field}_points'] = table[codes]
+            else:
+                components[f'{field}_points'] = 0
+
+        if 'height' in patients and 'weight' in patients:
+            components['bmi'] = _bmi(patients['height'].fillna(0), patients['weight'].fillna(0))
+        else:
+            components['bmi'] = np.nan
+        components['bmi_points'] = _bmi_points(components['bmi'].to_numpy())
+
+        if 'n_conditions' in patients:
+            n_conditions = patients['n_conditions'].fillna(0).to_numpy()
+        elif 'conditions' in patients:
+            exploded = patients['conditions'].explode()
+            counted = exploded.notna() & ~exploded.isin(NO_CONDITION)
+            n_conditions = counted.groupby(level=0, sort=False).sum().reindex(
+                patients.index, fill_value=0).to_numpy()
+        else:
+            n_conditions = np.zeros(n)
+        components['conditions_points'] = _condition_points(n_conditions)
+
+        point_columns = [c for c in components if c.endswith('_points')]
+        components['health_score'] = np.clip(
+            components[point_columns].sum(axis=1), 0, 100).astype(int)
+        return components
+
+    @staticmethod
+    @timed('data_processor.generate_mock_trends')
+    def generate_mock_trends(seed=None):
+        """Generate mock health metric trends, reproducibly when seeded."""
+        rng = np.random.default_rng(seed)
+        dates = pd.date_range(start='2023-01-01', periods=12, freq='ME')
         return {
-            'blood_pressure': [np.random.randint(110, 140) for _ in range(12)],
-            'glucose_levels': [np.random.randint(80, 120) for _ in range(12)],
-            'cholesterol': [np.random.randint(150, 200) for _ in range(12)],
+            'blood_pressure': rng.integers(110, 140, 12).tolist(),
+            'glucose_levels': rng.integers(80, 120, 12).tolist(),
+            'cholesterol': rng.integers(150, 200, 12).tolist(),
             'dates': dates.strftime('%Y-%m-%d').tolist()
         }
@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.risk_index import encode_column
+
+# 2-bit genotype codes; MISSING is also the padding in the last byte of a row
+WILD, HET, HOM, MISSING = 0, 1, 2, 3
+GENOTYPES = ('wild', 'het', 'hom')
+
+# Variant calls accepted by from_dataframe and their genotype code
+VARIANT_CODES = {'wild': WILD, 'het': HET, 'hom': HOM, 'mutation': HOM}
+
+# Genotype calls packed into each byte
+CALLS_PER_BYTE = 4
+_SHIFTS = np.arange(CALLS_PER_BYTE, dtype=np.uint8) * 2
+
+# Patients scored per block by weighted_sum, bounding its working memory
+SCORE_BLOCK_ROWS = 65_536
+
+
+def _pack(codes):
+    """Pack an (n, genes) uint8 code array into (n, ceil(genes / 4)) bytes."""
+    n, n_genes = codes.shape
+    padded_genes = -(-n_genes // CALLS_PER_BYTE) * CALLS_PER_BYTE
+    padded = np.full((n, padded_genes), MISSING, dtype=np.uint8)
+    padded[:, :n_genes] = codes
+    grouped = padded.reshape(n, -1, CALLS_PER_BYTE) << _SHIFTS
+    return np.bitwise_or.reduce(grouped, axis=2).astype(np.uint8)
+
+
+def _unpack(packed, n_genes):
+    """Inverse of _pack."""
+    codes = (np.asarray(packed)[:, :, None] >> _SHIFTS) & 3
+    return codes.reshape(len(packed), -1)[:, :n_genes]
+
+
+class GenotypeMatrix:
+    """Patients x genes genotype calls packed 2 bits per call.
+
+    Each row holds one patient's calls, four genes per byte, so a cohort
+    takes a quarter byte per call instead of the ~100 bytes of a string
+    DataFrame row. Rows are plain numpy arrays: patient slices are views,
+    and a saved matrix is memory-mapped on load.
+    """
+
+    def __init__(self, packed, patients, genes):
+        self.packed = packed
+        self.patients = pd.Index(patients)
+        self.genes = pd.Index(genes)
+
+    @classmethod
+    def from_codes(cls, codes, patients, genes):
+        """Build from an (n_patients, n_genes) array of genotype codes."""
+        return cls(_pack(np.asarray(codes, dtype=np.uint8)), patients, genes)
+
+    @classmethod
+    def from_dataframe(cls, genetic_data, genes, patient_column='patient_id'):
+        """Convert long-format gene/variant calls.
+
+        ``genetic_data`` has ``gene`` and ``variant`` columns and, for a
+        cohort, a ``patient_id`` column; without it the rows are one
+        patient. Genes outside ``genes`` are dropped, and genes without a
+        recognised call are MISSING. A patient can only have one genotype
+        per gene, so repeated calls keep the most severe; the long-format
+        scoring in DataProcessor applies the same rule.
+        """
+        genes = pd.Index(genes)
+        if patient_column in genetic_data:
+            patient_codes, patients = pd.factorize(genetic_data[patient_column])
+        else:
+            patient_codes, patients = np.zeros(len(genetic_data), dtype=np.intp), [0]
+
+        gene_codes = encode_column(genetic_data['gene'], genes)
+        variant_lookup = np.append(np.array(list(VARIANT_CODES.values()), dtype=np.int8), -1)
+        variant_codes = variant_lookup[
+            encode_column(genetic_data['variant'], pd.Index(list(VARIANT_CODES)))]
+
+        known = (gene_codes >= 0) & (variant_codes >= 0)
+        codes = np.full((len(patients), len(genes)), -1, dtype=np.int8)
+        np.maximum.at(codes, (patient_codes[known], gene_codes[known]), variant_codes[known])
+        codes[codes < 0] = MISSING
+        return cls.from_codes(codes, patients, genes)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Open a saved matrix; the packed calls are memory-mapped."""
+        with open(os.path.join(directory, 'genotypes.json')) as f:
+            meta = json.load(f)
+        packed = np.load(os.path.join(directory, 'genotypes.npy'), mmap_mode=mmap_mode)
+        patients = np.load(os.path.join(directory, 'patients.npy'), allow_pickle=False)
+        return cls(packed, patients, meta['genes'])
+
+    def save(self, directory):
+        """Write the matrix so concurrent readers never see a partial file."""
+        os.makedirs(directory, exist_ok=True)
+        pid = os.getpid()
+        patients = self.patients.to_numpy()
+        if patients.dtype == object:
+            patients = patients.astype(str)
+        for name, array in [('genotypes', np.ascontiguousarray(self.packed)),
+                            ('patients', patients)]:
+            path = os.path.join(directory, f'{name}.npy')
+            with open(f'{path}.{pid}.tmp', 'wb') as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(f'{path}.{pid}.tmp', path)
+        path = os.path.join(directory, 'genotypes.json')
+        with open(f'{path}.{pid}.tmp', 'w') as f:
+            json.dump({'genes': self.genes.tolist(), 'shape': list(self.shape)}, f)
+        os.replace(f'{path}.{pid}.tmp', path)
+
+    @property
+    def shape(self):
+        return len(self.patients), len(self.genes)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def __len__(self):
+        return len(self.patients)
+
+    def __repr__(self):
+        return f'GenotypeMatrix({len(self.patients)} patients x {len(self.genes)} genes)'
+
+    def __getitem__(self, key):
+        """Positional slicing: ``matrix[patients]`` or ``matrix[patients, genes]``."""
+        rows, columns = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(rows, (int, np.integer)):
+            rows = slice(rows, rows + 1 or None)
+        packed = self.packed[rows]
+        patients = self.patients[rows]
+        if isinstance(columns, slice) and columns == slice(None):
+            return GenotypeMatrix(packed, patients, self.genes)
+        if isinstance(columns, (int, np.integer)):
+            columns = [columns]
+        return GenotypeMatrix.from_codes(_unpack(packed, len(self.genes))[:, columns],
+                                         patients, self.genes[columns])
+
+    def select(self, patients=None, genes=None):
+        """Label-based slicing by patient ids and gene names."""
+        rows = columns = slice(None)
+        if patients is not None:
+            rows = self.patients.get_indexer(patients)
+            if (rows < 0).any():
+                raise KeyError("Unknown patient ids")
+        if genes is not None:
+            columns = self.genes.get_indexer(genes)
+            if (columns < 0).any():
+                raise KeyError("Unknown genes")
+        return self[rows, columns]
+
+    def codes(self):
+        """Unpacked (n_patients, n_genes) uint8 genotype codes."""
+        return _unpack(self.packed, len(self.genes))
+
+    def to_dataframe(self, patient_column='patient_id'):
+        """Long-format calls, omitting MISSING genotypes."""
+        codes = self.codes()
+        rows, columns = np.nonzero(codes != MISSING)
+        return pd.DataFrame({
+            patient_column: self.patients[rows],
+            'gene': pd.Categorical.from_codes(columns, categories=self.genes),
+            'variant': pd.Categorical.from_codes(codes[rows, columns], categories=GENOTYPES),
+        })
+
+    def weighted_sum(self, table, block_rows=SCORE_BLOCK_ROWS):
+        """Sum a per-(gene, genotype) weight over each patient's calls.
+
+        ``table`` has shape (n_genes, 4, k): the weights of each genotype
+        code for each gene, MISSING included. The weights of every possible
+        byte are precomputed, so scoring is one table lookup per packed
+        byte and never unpacks the calls. Returns an (n_patients, k)
+        float64 array.
+        """
+        table = np.asarray(table, dtype=np.float64)
+        n_bytes = self.packed.shape[1]
+        padded = np.zeros((n_bytes * CALLS_PER_BYTE, 4, table.shape[2]))
+        padded[:len(self.genes)] = table
+
+        # byte_weights[b, v] = sum over the four calls packed in value v of byte b
+        byte_values = np.arange(256, dtype=np.uint8)
+        byte_codes = (byte_values[:, None] >> _SHIFTS) & 3
+        per_call = padded.reshape(n_bytes, CALLS_PER_BYTE, 4, -1)
+        byte_weights = sum(per_call[:, i][:, byte_codes[:, i]] for i in range(CALLS_PER_BYTE))
+
+        result = np.zeros((len(self.packed), table.shape[2]))
+        for start in range(0, len(self.packed), block_rows):
+            block = np.asarray(self.packed[start:start + block_rows])
+            for b in range(n_bytes):
+                result[start:start + len(block)] += byte_weights[b][block[:, b]]
+        return result
@@ -0,0 +1,108 @@
+import hashlib
+import json
+
+from utils.lru_cache import LRUCache
+
+# Node results kept per process, shared across sessions and patients
+NODE_CACHE_SIZE = 1024
+
+# Cache miss marker; a node may legitimately compute None
+_MISSING = object()
+
+
+def digest_value(value):
+    """Content hash of a JSON-serialisable value."""
+    text = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Node:
+    """A derived value computed from named sources or other nodes."""
+
+    def __init__(self, name, inputs, compute):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.compute = compute
+
+
+class Evaluation:
+    """Result of one graph evaluation.
+
+    ``values`` maps every requested node (and its dependencies) to its value,
+    ``versions`` maps them to the content version the value was computed
+    from, and ``recomputed`` lists, in evaluation order, the nodes that had
+    no cached value for their inputs.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.versions = {}
+        self.recomputed = []
+
+
+class IncrementalGraph:
+    """Dependency-tracked evaluation of derived patient values.
+
+    Sources are the raw inputs (patient sections, today's date, ...), each
+    given as a ``(version, load)`` pair: ``version`` is a content hash and
+    ``load`` a zero-argument callable that is only called if some node that
+    reads the source has to be recomputed. A node's version is the hash of
+    its name and its inputs' versions, and results are cached under it, so
+    a node is recomputed only when something it depends on has changed.
+    Because versions are content hashes the cache is shared by every
+    session: two patients with the same lifestyle answers share a score.
+    """
+
+    def __init__(self, nodes, cache_size=NODE_CACHE_SIZE):
+        self.nodes = {node.name: node for node in nodes}
+        self.cache = LRUCache(cache_size)
+
+    def dependencies(self, targets):
+        """Node names needed for ``targets``, in evaluation order."""
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order or name not in self.nodes:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.nodes[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets:
+            if target not in self.nodes:
+                raise KeyError(target)
+            visit(target)
+        return order
+
+    def evaluate(self, sources, targets=None):
+        """Evaluate ``targets`` (default: every node) against ``sources``."""
+        evaluation = Evaluation()
+        loaded = {}
+
+        def read(name):
+            if name in self.nodes:
+                return evaluation.values[name]
+            if name not in loaded:
+                loaded[name] = sources[name][1]()
+            return loaded[name]
+
+        for name in self.dependencies(targets or list(self.nodes)):
+            node = self.nodes[name]
+            input_versions = [evaluation.versions[i] if i in self.nodes else sources[i][0]
+                              for i in node.inputs]
+            version = hashlib.sha256(
+                '\0'.join([name, *input_versions]).encode()).hexdigest()
+
+            value = self.cache.get(version, _MISSING)
+            if value is _MISSING:
+                value = node.compute(*(read(i) for i in node.inputs))
+                self.cache.put(version, value)
+                evaluation.recomputed.append(name)
+            evaluation.values[name] = value
+            evaluation.versions[name] = version
+        return evaluation
@@ -0,0 +1,179 @@
+"""Lightweight call timing for the utils hot paths and page renders.
+
+Timing is off unless ``HEALTH_PLANNER_METRICS=1`` (or ``enable()`` is
+called); a disabled ``timed`` wrapper costs one global check per call.
+Metrics are exposed in Prometheus text format through ``render_metrics``,
+the admin metrics page, and optionally a tiny HTTP endpoint on
+``HEALTH_PLANNER_METRICS_PORT``.
+"""
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.getenv('HEALTH_PLANNER_METRICS') == '1'
+_metrics = {}
+_lock = threading.Lock()
+_server = None
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def record(name, seconds):
+    """Add one observation to ``name``'s latency histogram."""
+    bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            # Per-bucket counts (last is +Inf), total count, total seconds
+            metric = _metrics[name] = [[0] * (len(LATENCY_BUCKETS) + 1), 0, 0.0]
+        metric[0][bucket] += 1
+        metric[1] += 1
+        metric[2] += seconds
+
+
+@contextmanager
+def _timing(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def span(name):
+    """Context manager timing a block; a no-op when metrics are disabled."""
+    return _timing(name) if _enabled else nullcontext()
+
+
+def timed(name):
+    """Decorator recording each call's latency under ``name``."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Return {name: {'count', 'sum', 'buckets'}} with cumulative bucket counts."""
+    with _lock:
+        items = [(name, list(m[0]), m[1], m[2]) for name, m in _metrics.items()]
+    result = {}
+    for name, counts, count, total in sorted(items):
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        result[name] = {'count': count, 'sum': total, 'buckets': cumulative}
+    return result
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+
+def render_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    lines = [
+        '# HELP health_planner_call_duration_seconds Latency of instrumented calls.',
+        '# TYPE health_planner_call_duration_seconds histogram',
+    ]
+    bounds = [str(b) for b in LATENCY_BUCKETS] + ['+Inf']
+    for name, metric in snapshot().items():
+        for bound, count in zip(bounds, metric['buckets']):
+            lines.append(f'health_planner_call_duration_seconds_bucket'
+                         f'{{name="{name}",le="{bound}"}} {count}')
+        lines.append(f'health_planner_call_duration_seconds_sum{{name="{name}"}} {metric["sum"]}')
+        lines.append(f'health_planner_call_duration_seconds_count{{name="{name}"}} {metric["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """Serve render_metrics() over HTTP once per process, if a port is configured."""
+    global _server
+    port = port or os.getenv('HEALTH_PLANNER_METRICS_PORT')
+    with _lock:
+        if _server is not None or not port:
+            return _server
+        _server = ThreadingHTTPServer(('127.0.0.1', int(port)), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    return _server
+
+
+@contextmanager
+def profile(limit=40):
+    """Profile the enclosed block with cProfile; yields a dict filled with the report."""
+    report = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        report['text'] = out.getvalue()
+
+
+def run_page(name, render):
+    """Render a Streamlit page with timing, plus a cProfile capture on ``?profile=1``.
+
+    Profiles show internal paths and call stacks, so they are only captured
+    when the app runs with ``HEALTH_PLANNER_ADMIN=1``, like the metrics page.
+    """
+    import streamlit as st
+
+    start_metrics_server()
+    if os.getenv('HEALTH_PLANNER_ADMIN') != '1' or st.query_params.get('profile') != '1':
+        with span(f'page.{name}'):
+            return render()
+
+    with profile() as report:
+        with span(f'page.{name}'):
+            result = render()
+    with st.expander("Profile of this rerun"):
+        st.code(report['text'])
+    return result
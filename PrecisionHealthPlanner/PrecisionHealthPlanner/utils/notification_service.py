@@ -1,23 +1,55 @@
-from twilio.rest import Client
 import streamlit as st
 import os
-from datetime import datetime
+from functools import lru_cache
+from utils.sms_coalescer import COALESCE_WINDOW, ReminderCoalescer
+from utils.sms_dispatcher import SMSDispatcher
+from utils.reminder_scheduler import FREQUENCY_INTERVALS, ReminderScheduler
+from utils.shared_state import SharedRateLimiter, get_shared_state
+from utils.storage import data_path
+from utils.instrumentation import timed
 
 class NotificationService:
-    def __init__(self):
+    def __init__(self, client=None, from_number=None):
         self.twilio_client = None
+        self.dispatcher = None
+        self.coalescer = None
+        self.scheduler = None
         self.setup_complete = False
         try:
-            account_sid = os.getenv('TWILIO_ACCOUNT_SID')
-            auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-            self.from_number = os.getenv('TWILIO_PHONE_NUMBER')
-            
-            if account_sid and auth_token and self.from_number:
-                self.twilio_client = Client(account_sid, auth_token)
+            self.from_number = from_number or os.getenv('TWILIO_PHONE_NUMBER')
+
+            if client is None:
+                account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+                auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+                if account_sid and auth_token and self.from_number:
+                    # Deferred so the Twilio SDK only loads when SMS is configured
+                    from twilio.rest import Client
+                    client = Client(account_sid, auth_token)
+
+            if client is not None and self.from_number:
+                self.twilio_client = client
+                # One Twilio rate limit for every worker process
+                rate_limiter = SharedRateLimiter(
+                    get_shared_state(), 'sms',
+                    float(os.getenv('SMS_RATE_PER_SECOND', '10'))
+                )
+                self.dispatcher = SMSDispatcher(
+                    client,
+                    self.from_number,
+                    concurrency=int(os.getenv('SMS_CONCURRENCY', '4')),
+                    rate_limiter=rate_limiter
+                )
+                # Reminders due together for one number go out as one SMS
+                self.coalescer = ReminderCoalescer(self.dispatcher.submit)
+                self.scheduler = ReminderScheduler(data_path('reminders.db'),
+                                                   self.coalescer.submit,
+                                                   window=COALESCE_WINDOW)
+                self.scheduler.start()
                 self.setup_complete = True
         except Exception as e:
             st.warning("Notification service not configured. Some features may be limited.")
     
+    @timed('notification_service.send_sms')
     def send_sms(self, to_number, message):
         """Send SMS notification using Twilio"""
         if not self.setup_complete:
@@ -25,24 +57,38 @@ class NotificationService:
             return False
             
         try:
-            message = self.twilio_client.messages.create(
-                body=message,
-                from_=self.from_number,
-                to=to_number
-            )
+            self.dispatcher.submit(to_number, message).result()
             return True
         except Exception as e:
             st.error(f"Failed to send SMS: {str(e)}")
             return False
+
+    def send_sms_async(self, to_number, message):
+        """Queue an SMS on the background dispatcher and return its job handle"""
+        if not self.setup_complete:
+            st.warning("SMS notifications are not configured.")
+            return None
+        return self.dispatcher.submit(to_number, message)
     
+    @timed('notification_service.schedule_reminder')
     def schedule_reminder(self, patient_data, reminder_type, schedule):
-        """Schedule a reminder for medication or appointment"""
+        """Schedule a reminder for medication or appointment.
+
+        ``schedule`` is either a recurrence from FREQUENCY_INTERVALS
+        ("Daily", "Every 2 days", "Weekly"), which first fires now and then
+        repeats, or free text for a one-off reminder. Returns the stored
+        reminder id, or None if the reminder could not be scheduled.
+        """
         if not patient_data.get('personal_info', {}).get('phone'):
             st.warning("Please update your phone number to receive reminders.")
             return
-            
+        if not self.setup_complete:
+            st.warning("SMS notifications are not configured.")
+            return
+
         message = self._generate_reminder_message(patient_data, reminder_type, schedule)
-        return self.send_sms(patient_data['personal_info']['phone'], message)
+        frequency = schedule if schedule in FREQUENCY_INTERVALS else None
+        return self.scheduler.add(patient_data['personal_info']['phone'], message, frequency)
     
     def _generate_reminder_message(self, patient_data, reminder_type, schedule):
         """Generate appropriate reminder message"""
@@ -58,9 +104,11 @@ class NotificationService:
             return (f"Hello {name}, this is a reminder for your "
                    f"healthcare activity: {schedule}")
 
-# Initialize notification service
-notification_service = NotificationService()
+@lru_cache(maxsize=None)
+def get_notification_service():
+    """Create the shared notification service on first use"""
+    return NotificationService()
 
 def send_notification(to_number, message):
     """Wrapper function for sending notifications"""
-    return notification_service.send_sms(to_number, message)
+    return get_notification_service().send_sms(to_number, message)
@@ -0,0 +1,265 @@
+import copy
+import hashlib
+import io
+import json
+import time
+from collections.abc import MutableMapping
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.lru_cache import LRUCache
+from utils.storage import POOL_SIZE, ConnectionPool, data_path
+
+# Sections stored as JSON columns, in the order pages expect them
+JSON_SECTIONS = ('personal_info', 'medical_history', 'lifestyle_factors')
+PATIENT_SECTIONS = JSON_SECTIONS + ('genetic_data',)
+
+# Decoded patient sections kept per process, shared across sessions
+FIELD_CACHE_SIZE = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    personal_info TEXT NOT NULL,
+    medical_history TEXT NOT NULL,
+    lifestyle_factors TEXT NOT NULL,
+    genetic_data BLOB,
+    genetic_digest TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (name);
+"""
+
+
+def encode_genetic_data(genetic_data):
+    """Pack a DataFrame into a compressed columnar blob.
+
+    String and categorical columns are stored as integer codes plus their
+    category list; numeric columns are stored as-is. Everything goes through
+    ``np.savez_compressed``.
+    """
+    if genetic_data is None:
+        return None
+    arrays = {}
+    manifest = []
+    for i, column in enumerate(genetic_data.columns):
+        values = genetic_data[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            categorical = values.astype('category')
+            arrays[f'codes_{i}'] = categorical.cat.codes.to_numpy()
+            manifest.append({'name': str(column), 'kind': 'category',
+                             'categories': categorical.cat.categories.astype(str).tolist()})
+        else:
+            arrays[f'values_{i}'] = values.to_numpy()
+            manifest.append({'name': str(column), 'kind': 'values'})
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, manifest=np.array(json.dumps(manifest)), **arrays)
+    return buffer.getvalue()
+
+
+def decode_genetic_data(blob):
+    """Inverse of encode_genetic_data; string columns come back categorical."""
+    if blob is None:
+        return None
+    with np.load(io.BytesIO(blob)) as arrays:
+        manifest = json.loads(str(arrays['manifest']))
+        columns = {}
+        for i, column in enumerate(manifest):
+            if column['kind'] == 'category':
+                columns[column['name']] = pd.Categorical.from_codes(
+                    arrays[f'codes_{i}'], categories=column['categories'])
+            else:
+                columns[column['name']] = arrays[f'values_{i}']
+    return pd.DataFrame(columns)
+
+
+class PatientRepository:
+    """Persistent patient store shared by every Streamlit session and worker."""
+
+    def __init__(self, path, pool_size=POOL_SIZE):
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(patients)')}
+            if 'genetic_digest' not in columns:
+                # Databases created before per-section digests
+                conn.execute('ALTER TABLE patients ADD COLUMN genetic_digest TEXT')
+        self._fields = LRUCache(FIELD_CACHE_SIZE)
+
+    @staticmethod
+    def _encode(section, value):
+        if section == 'genetic_data':
+            return encode_genetic_data(value)
+        if section == 'personal_info':
+            value = {k: v for k, v in (value or {}).items() if k != 'patient_id'}
+        return json.dumps(value or {}, default=str)
+
+    @staticmethod
+    def _digest(raw):
+        if raw is None:
+            return 'none'
+        if isinstance(raw, str):
+            raw = raw.encode()
+        return hashlib.sha256(raw).hexdigest()
+
+    def save(self, patient_data, patient_id=None):
+        """Insert a patient, or replace every section of an existing one."""
+        values = [self._encode(section, patient_data.get(section))
+                  for section in PATIENT_SECTIONS]
+        values.append(self._digest(values[-1]))
+        name = (patient_data.get('personal_info') or {}).get('name', '')
+        with self.pool.connection() as conn:
+            if patient_id is None:
+                cursor = conn.execute(
+                    'INSERT INTO patients (name, personal_info, medical_history, '
+                    'lifestyle_factors, genetic_data, genetic_digest, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (name, *values, time.time())
+                )
+                return cursor.lastrowid
+            conn.execute(
+                'UPDATE patients SET name = ?, personal_info = ?, medical_history = ?, '
+                'lifestyle_factors = ?, genetic_data = ?, genetic_digest = ?, '
+                'version = version + 1, updated_at = ? WHERE id = ?',
+                (name, *values, time.time(), patient_id)
+            )
+        return patient_id
+
+    def update_section(self, patient_id, section, value):
+        """Replace a single section and bump the patient's version."""
+        if section not in PATIENT_SECTIONS:
+            raise KeyError(section)
+        assignments = f'{section} = ?, version = version + 1, updated_at = ?'
+        params = [self._encode(section, value), time.time()]
+        if section == 'genetic_data':
+            assignments += ', genetic_digest = ?'
+            params.append(self._digest(params[0]))
+        elif section == 'personal_info':
+            assignments += ', name = ?'
+            params.append((value or {}).get('name', ''))
+        with self.pool.connection() as conn:
+            conn.execute(f'UPDATE patients SET {assignments} WHERE id = ?',
+                         (*params, patient_id))
+
+    def version(self, patient_id):
+        with self.pool.connection() as conn:
+            row = conn.execute('SELECT version FROM patients WHERE id = ?',
+                               (patient_id,)).fetchone()
+        if row is None:
+            raise KeyError(patient_id)
+        return row[0]
+
+    def section_digests(self, patient_id):
+        """Content hash of each section, without loading the genetic data."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT personal_info, medical_history, lifestyle_factors, genetic_digest, '
+                'genetic_data IS NULL, version FROM patients WHERE id = ?',
+                (patient_id,)).fetchone()
+        if row is None:
+            raise KeyError(patient_id)
+        *json_sections, genetic_digest, no_genetic_data, version = row
+        digests = {section: self._digest(raw)
+                   for section, raw in zip(JSON_SECTIONS, json_sections)}
+        if genetic_digest is None:
+            # Rows saved before digests were stored fall back to the version
+            genetic_digest = 'none' if no_genetic_data else f'{patient_id}:v{version}'
+        digests['genetic_data'] = genetic_digest
+        return digests
+
+    def load_section(self, patient_id, section, digest=None):
+        """Load one decoded section, via the process-wide cache.
+
+        Cached values are keyed by the section's digest, so editing one
+        section does not evict the others. Pass ``digest`` if it is already
+        known to skip looking it up.
+        """
+        if section not in PATIENT_SECTIONS:
+            raise KeyError(section)
+        if digest is None:
+            digest = self.section_digests(patient_id)[section]
+        key = (patient_id, section, digest)
+        value = self._fields.get(key)
+        if value is None:
+            with self.pool.connection() as conn:
+                raw = conn.execute(f'SELECT {section} FROM patients WHERE id = ?',
+                                   (patient_id,)).fetchone()[0]
+            value = (decode_genetic_data(raw) if section == 'genetic_data'
+                     else json.loads(raw))
+            self._fields.put(key, value)
+        if section == 'personal_info':
+            value = {**value, 'patient_id': patient_id}
+        return value
+
+    def ids(self):
+        """Every stored patient id, in insertion order."""
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute('SELECT id FROM patients ORDER BY id')]
+
+    def find_by_name(self, name, limit=20):
+        """Return (id, name) pairs whose name starts with ``name``."""
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'SELECT id, name FROM patients WHERE name >= ? AND name < ? '
+                'ORDER BY name LIMIT ?',
+                (name, name + '\uffff', limit)
+            ).fetchall()
+
+
+class StoredPatient(MutableMapping):
+    """Session-side handle to a stored patient that loads sections on access.
+
+    It holds only the patient id, so session memory stays constant no matter
+    how large the patient's genetic data is. JSON sections are returned as
+    copies; assign a section back to persist a change. The genetic
+    DataFrame is shared with other sessions and must not be mutated.
+    """
+
+    def __init__(self, patient_id, repository=None):
+        self.patient_id = patient_id
+        self._repository = repository
+
+    @property
+    def repository(self):
+        return self._repository or get_patient_repository()
+
+    def section_digests(self):
+        return self.repository.section_digests(self.patient_id)
+
+    def load_section(self, section, digest=None):
+        """Like ``self[section]`` but reuses an already known digest."""
+        value = self.repository.load_section(self.patient_id, section, digest)
+        return copy.deepcopy(value) if section in JSON_SECTIONS else value
+
+    def fingerprint(self):
+        digests = self.section_digests()
+        return hashlib.sha256(
+            ''.join(digests[section] for section in PATIENT_SECTIONS).encode()).hexdigest()
+
+    def __getitem__(self, section):
+        return self.load_section(section)
+
+    def __setitem__(self, section, value):
+        self.repository.update_section(self.patient_id, section, value)
+
+    def __delitem__(self, section):
+        raise TypeError("Patient sections cannot be deleted")
+
+    def __iter__(self):
+        return iter(PATIENT_SECTIONS)
+
+    def __len__(self):
+        return len(PATIENT_SECTIONS)
+
+    def __repr__(self):
+        return f'StoredPatient({self.patient_id})'
+
+
+@lru_cache(maxsize=None)
+def get_patient_repository():
+    """Open the shared patient database once per process."""
+    return PatientRepository(data_path('patients.db'))
@@ -0,0 +1,456 @@
+import argparse
+import json
+import logging
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import BASE_RISK, RISK_CONDITIONS, DataProcessor, _bmi
+from utils.instrumentation import timed
+from utils.storage import ConnectionPool, data_path
+
+logger = logging.getLogger(__name__)
+
+# Lifestyle answers on the patient input form, from healthiest to least healthy
+ORDINAL_FIELDS = {
+    'exercise_frequency': ['Regular', 'Occasional', 'Rarely', 'Never'],
+    'smoking_status': ['Never', 'Former', 'Current'],
+    'alcohol_consumption': ['None', 'Occasional', 'Moderate', 'Heavy'],
+}
+
+# Unordered answers, one-hot encoded
+CATEGORICAL_FIELDS = {
+    'diet_type': ['Balanced', 'Vegetarian', 'Vegan', 'Keto', 'Other'],
+    'gender': ['Male', 'Female', 'Other'],
+}
+
+# Existing conditions offered on the patient input form, one flag each
+CONDITIONS = ['Diabetes', 'Hypertension', 'Heart Disease', 'Asthma']
+
+# Ranges mapped onto [0, 1]; missing values sit mid-range
+AGE_RANGE = (0, 100)
+BMI_RANGE = (15, 40)
+
+# Weight of each feature group in the Euclidean distance
+FEATURE_WEIGHTS = {'risk': 1.0, 'age': 1.0, 'bmi': 1.0, 'lifestyle': 0.5,
+                   'categorical': 0.5, 'conditions': 1.0}
+
+FEATURE_NAMES = [
+    *RISK_CONDITIONS, 'age', 'bmi', *ORDINAL_FIELDS,
+    *(f'{field}={value}' for field, values in CATEGORICAL_FIELDS.items() for value in values),
+    *(f'condition={condition}' for condition in CONDITIONS),
+]
+
+# Similar patients shown by default
+DEFAULT_NEIGHBOURS = 5
+
+# Inverted lists probed per IVF query; more lists mean higher recall
+DEFAULT_N_PROBE = 16
+
+# Lloyd iterations, and sampled vectors per centroid, when training IVF centroids
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+# Vectors assigned to centroids per block, bounding the distance matrix size
+ASSIGN_BLOCK_ROWS = 16_384
+
+# Below this many patients exact search is fast enough and IVF is not built
+IVF_MIN_ROWS = 20_000
+
+# Vectors recorded since the last build that are searched exhaustively
+# before the index is rebuilt
+DELTA_MAX_ROWS = 2_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patient_vectors (
+    patient_id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patient_vectors_seq ON patient_vectors (seq);
+"""
+
+
+def _scaled(values, value_range):
+    lo, hi = value_range
+    scaled = (np.asarray(values, dtype=float) - lo) / (hi - lo)
+    return np.clip(np.where(np.isnan(scaled), 0.5, scaled), 0, 1)
+
+
+@timed('patient_similarity.encode_patients')
+def encode_patients(patients):
+    """Encode a DataFrame of patients as weighted float32 feature vectors.
+
+    ``patients`` has one row per patient with the fields collected on the
+    patient input form (``conditions`` as lists of names) and one risk
+    column per condition in RISK_CONDITIONS; missing columns take neutral
+    values. Returns an (n_patients, len(FEATURE_NAMES)) array whose
+    Euclidean distances rank how alike two patients are.
+    """
+    n = len(patients)
+
+    def column(name, default=np.nan):
+        return patients[name] if name in patients else pd.Series(default, index=patients.index)
+
+    features = []
+    for condition in RISK_CONDITIONS:
+        risks = pd.to_numeric(column(condition, BASE_RISK), errors='coerce')
+        features.append(FEATURE_WEIGHTS['risk'] * risks.fillna(BASE_RISK).to_numpy())
+    age = pd.to_numeric(column('age'), errors='coerce').to_numpy()
+    features.append(FEATURE_WEIGHTS['age'] * _scaled(age, AGE_RANGE))
+    bmi = _bmi(pd.to_numeric(column('height', 0), errors='coerce').fillna(0),
+               pd.to_numeric(column('weight', 0), errors='coerce').fillna(0))
+    features.append(FEATURE_WEIGHTS['bmi'] * _scaled(bmi, BMI_RANGE))
+
+    for field, options in ORDINAL_FIELDS.items():
+        codes = pd.Index(options).get_indexer(column(field))
+        position = np.where(codes < 0, 0.5, codes / (len(options) - 1))
+        features.append(FEATURE_WEIGHTS['lifestyle'] * position)
+
+    # Two different answers differ in two columns, so each column carries
+    # 1/sqrt(2) of the weight and a mismatch costs the full weight
+    one_hot = FEATURE_WEIGHTS['categorical'] / np.sqrt(2)
+    for field, options in CATEGORICAL_FIELDS.items():
+        codes = pd.Index(options).get_indexer(column(field))
+        features.extend(one_hot * (codes == i) for i in range(len(options)))
+
+    exploded = column('conditions').explode()
+    for condition in CONDITIONS:
+        present = (exploded == condition).groupby(level=0, sort=False).any()
+        features.append(FEATURE_WEIGHTS['conditions']
+                        * present.reindex(patients.index, fill_value=False).to_numpy())
+
+    vectors = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32)
+    for i, values in enumerate(features):
+        vectors[:, i] = values
+    return vectors
+
+
+def encode_patient(patient_data, risk_factors):
+    """Feature vector of one patient's sections and genetic risk factors."""
+    features = DataProcessor.patient_features(patient_data, risk_factors)
+    return encode_patients(pd.DataFrame([features]))[0]
+
+
+def _squared_norms(vectors):
+    return np.einsum('ij,ij->i', vectors, vectors)
+
+
+def _nearest(vectors, norms, query, k):
+    """Positions and squared distances of the ``k`` rows nearest ``query``."""
+    distances = norms - 2 * (vectors @ query) + query @ query
+    k = min(k, len(distances))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    nearest = np.argpartition(distances, k - 1)[:k]
+    nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+    return nearest, distances[nearest]
+
+
+def _result(ids, distances):
+    return ids, np.sqrt(np.maximum(distances, 0))
+
+
+class BruteForceIndex:
+    """Exact nearest-neighbour search by comparing the query with every vector.
+
+    Distances come from one matrix-vector product over the precomputed
+    squared norms, and only the top ``k`` are sorted.
+    """
+
+    def __init__(self, vectors, ids):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.ids = np.asarray(ids)
+        self.norms = _squared_norms(self.vectors)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k):
+        """Return (ids, distances) of the ``k`` nearest vectors, nearest first."""
+        positions, distances = _nearest(self.vectors, self.norms,
+                                        np.asarray(query, dtype=np.float32), k)
+        return _result(self.ids[positions], distances)
+
+
+def _assign(vectors, centroids, block_rows=ASSIGN_BLOCK_ROWS):
+    """Index of the nearest centroid for each vector."""
+    centroid_norms = _squared_norms(centroids)
+    labels = np.empty(len(vectors), dtype=np.intp)
+    for start in range(0, len(vectors), block_rows):
+        block = vectors[start:start + block_rows]
+        # The vector's own norm is the same for every centroid
+        labels[start:start + len(block)] = np.argmin(
+            centroid_norms - 2 * (block @ centroids.T), axis=1)
+    return labels
+
+
+def _kmeans(vectors, n_clusters, n_iter, rng):
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.column_stack([np.bincount(labels, weights=vectors[:, j], minlength=n_clusters)
+                                for j in range(vectors.shape[1])])
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Restart empty clusters on random vectors
+        centroids[empty] = vectors[rng.choice(len(vectors), empty.sum())]
+    return centroids
+
+
+class IVFIndex:
+    """Approximate nearest-neighbour search over an inverted file.
+
+    Vectors are grouped by their nearest k-means centroid and stored list
+    by list, so each list is one contiguous slice. A query is compared
+    with the centroids and then only with the vectors of the ``n_probe``
+    closest lists. A true neighbour in an unprobed list is missed; raising
+    ``n_probe`` trades latency for recall.
+    """
+
+    def __init__(self, centroids, offsets, vectors, ids):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.ids = ids
+        self.norms = _squared_norms(vectors)
+
+    @classmethod
+    @timed('patient_similarity.build_ivf')
+    def build(cls, vectors, ids, n_lists=None, n_iter=KMEANS_ITERATIONS, seed=0):
+        """Train centroids on a sample of ``vectors`` and file every vector.
+
+        ``n_lists`` defaults to the square root of the number of vectors.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids)
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), n_lists * KMEANS_SAMPLE_PER_LIST)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = _kmeans(sample, n_lists, n_iter, rng)
+
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.searchsorted(labels[order], np.arange(n_lists + 1))
+        return cls(centroids, offsets, vectors[order], ids[order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k, n_probe=DEFAULT_N_PROBE):
+        """Return (ids, distances) of about the ``k`` nearest vectors, nearest first."""
+        query = np.asarray(query, dtype=np.float32)
+        lists, _ = _nearest(self.centroids, _squared_norms(self.centroids), query, n_probe)
+        positions, distances = [], []
+        for i in lists:
+            start, end = self.offsets[i], self.offsets[i + 1]
+            nearest, nearest_distances = _nearest(self.vectors[start:end],
+                                                  self.norms[start:end], query, k)
+            positions.append(nearest + start)
+            distances.append(nearest_distances)
+        positions, distances = np.concatenate(positions), np.concatenate(distances)
+        best = np.argsort(distances, kind='stable')[:k]
+        return _result(self.ids[positions[best]], distances[best])
+
+
+def build_index(vectors, ids):
+    """Exact search for small cohorts, an IVF index for large ones."""
+    if len(ids) < IVF_MIN_ROWS:
+        return BruteForceIndex(vectors, ids)
+    return IVFIndex.build(vectors, ids)
+
+
+class PatientVectors:
+    """Feature vectors and outcome summaries of stored patients.
+
+    Every write takes the next value of a table-wide sequence, so an index
+    can pick up the changes made by any worker since it was built.
+    """
+
+    def __init__(self, path):
+        self.pool = ConnectionPool(path, size=2)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def record(self, patient_id, fingerprint, vector, outcome):
+        """Store a patient's vector; a no-op if its fingerprint is unchanged."""
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT fingerprint FROM patient_vectors WHERE patient_id = ?',
+                               (patient_id,)).fetchone()
+            if row is not None and row[0] == fingerprint:
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO patient_vectors '
+                '(patient_id, seq, fingerprint, vector, outcome) VALUES '
+                '(?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM patient_vectors), ?, ?, ?)',
+                (patient_id, fingerprint, np.asarray(vector, dtype=np.float32).tobytes(),
+                 json.dumps(outcome)))
+        return True
+
+    def last_seq(self):
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM patient_vectors').fetchone()[0]
+
+    def changes(self, since=0):
+        """(last seq, ids, vectors) of every vector written after ``since``."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT seq, patient_id, vector FROM patient_vectors WHERE seq > ? ORDER BY seq',
+                (since,)).fetchall()
+        if not rows:
+            return since, np.empty(0, dtype=np.int64), np.empty((0, len(FEATURE_NAMES)),
+                                                               dtype=np.float32)
+        ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        vectors = np.frombuffer(b''.join(row[2] for row in rows), dtype=np.float32)
+        return rows[-1][0], ids, vectors.reshape(len(rows), -1)
+
+    def outcomes(self, patient_ids):
+        """Outcome summaries by patient id."""
+        patient_ids = [int(patient_id) for patient_id in patient_ids]
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT patient_id, outcome FROM patient_vectors WHERE patient_id IN '
+                f'({",".join("?" * len(patient_ids))})', patient_ids).fetchall()
+        return {patient_id: json.loads(outcome) for patient_id, outcome in rows}
+
+
+class SimilarityIndex:
+    """Nearest-neighbour search over every stored patient, kept current.
+
+    The index is built from a snapshot of the stored vectors. Vectors
+    written since then, by this or any other worker, are searched
+    exhaustively in a delta that supersedes the snapshot's entries for the
+    same patients. Once the delta outgrows DELTA_MAX_ROWS a new snapshot
+    is built on a background thread, so no request waits for it; searches
+    keep using the exhaustive delta until it is swapped in.
+    """
+
+    def __init__(self, vectors):
+        self.store = vectors
+        self._lock = threading.Lock()
+        self._builder = None
+        empty = BruteForceIndex(np.empty((0, len(FEATURE_NAMES)), dtype=np.float32),
+                                np.empty(0, dtype=np.int64))
+        # (snapshot index, its seq, delta index, delta seq, superseded ids),
+        # swapped as a whole so searches never see a half-applied refresh
+        self._state = (empty, 0, empty, 0, frozenset())
+
+    def refresh(self):
+        """Pick up vectors written since the last refresh."""
+        with self._lock:
+            base, base_seq, _, seq, _ = self._state
+            if self.store.last_seq() == seq:
+                return
+            # Each patient has one row, so this is the newest vector per patient
+            seq, ids, vectors = self.store.changes(base_seq)
+            stale = frozenset(ids[np.isin(ids, base.ids)].tolist())
+            self._state = (base, base_seq, BruteForceIndex(vectors, ids), seq, stale)
+            if len(ids) > DELTA_MAX_ROWS and self._builder is None:
+                # Without a snapshot the delta already holds every stored vector
+                snapshot = (seq, ids, vectors) if base_seq == 0 else None
+                self._builder = threading.Thread(target=self._rebuild, args=(snapshot,),
+                                                 name='similarity-index', daemon=True)
+                self._builder.start()
+
+    def _rebuild(self, snapshot):
+        try:
+            seq, ids, vectors = snapshot or self.store.changes()
+            base = build_index(vectors, ids)
+            with self._lock:
+                # Vectors written after the snapshot are reloaded by the next refresh
+                self._state = (base, seq, BruteForceIndex(vectors[:0], ids[:0]), seq,
+                               frozenset())
+        except Exception as e:
+            logger.error("Could not rebuild the similarity index: %s", e)
+        finally:
+            self._builder = None
+
+    def __len__(self):
+        base, _, delta, _, stale = self._state
+        return len(base) + len(delta) - len(stale)
+
+    def search(self, vector, k=DEFAULT_NEIGHBOURS, exclude=None):
+        """Return [(patient_id, distance)] of the ``k`` nearest stored patients."""
+        self.refresh()
+        base, _, delta, _, stale = self._state
+        # Over-fetch by as many entries as may be dropped
+        results = [(patient_id, distance)
+                   for patient_id, distance in zip(*base.search(vector, k + len(stale) + 1))
+                   if patient_id not in stale and patient_id != exclude]
+        results += [(patient_id, distance)
+                    for patient_id, distance in zip(*delta.search(vector, k + 1))
+                    if patient_id != exclude]
+        results.sort(key=lambda result: result[1])
+        return [(int(patient_id), float(distance)) for patient_id, distance in results[:k]]
+
+
+@lru_cache(maxsize=None)
+def get_patient_vectors():
+    """Open the shared vector store once per process."""
+    return PatientVectors(data_path('patient_vectors.db'))
+
+
+@lru_cache(maxsize=None)
+def get_similarity_index():
+    """The similar-patient index, built once per process."""
+    return SimilarityIndex(get_patient_vectors())
+
+
+def record_patient_vector(patient_data, analysis, fingerprint):
+    """Store a stored patient's feature vector and outcome; others are skipped."""
+    patient_id = getattr(patient_data, 'patient_id', None)
+    if patient_id is None:
+        return False
+    personal_info = patient_data.get('personal_info') or {}
+    outcome = {
+        'age': personal_info.get('age'),
+        'gender': personal_info.get('gender'),
+        'conditions': (patient_data.get('medical_history') or {}).get('conditions') or [],
+        'health_score': analysis['health_score'],
+        'risk_factors': analysis['risk_factors'],
+    }
+    return get_patient_vectors().record(
+        patient_id, fingerprint, encode_patient(patient_data, analysis['risk_factors']), outcome)
+
+
+@timed('patient_similarity.find_similar_patients')
+def find_similar_patients(patient_data, analysis, k=DEFAULT_NEIGHBOURS):
+    """The ``k`` stored patients most like this one, with their outcomes.
+
+    Returns a list of outcome dicts (age, gender, conditions, health score
+    and risk factors) with ``patient_id`` and ``distance`` added, nearest
+    first. The patient itself is never included.
+    """
+    vector = encode_patient(patient_data, analysis['risk_factors'])
+    neighbours = get_similarity_index().search(
+        vector, k, exclude=getattr(patient_data, 'patient_id', None))
+    outcomes = get_patient_vectors().outcomes([patient_id for patient_id, _ in neighbours])
+    return [{'patient_id': patient_id, 'distance': distance, **outcomes[patient_id]}
+            for patient_id, distance in neighbours if patient_id in outcomes]
+
+
+def main(argv=None):
+    """Store the feature vector of every saved patient, e.g. after an upgrade."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.parse_args(argv)
+
+    # Imported here so this module stays free of the analysis stack
+    from utils.analysis_cache import get_patient_analysis, patient_fingerprint
+    from utils.patient_repository import StoredPatient, get_patient_repository
+
+    for patient_id in get_patient_repository().ids():
+        patient = StoredPatient(patient_id)
+        record_patient_vector(patient, get_patient_analysis(patient),
+                              patient_fingerprint(patient))
+    print(f"{len(get_similarity_index())} patients in the similarity index")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+from utils.incremental import digest_value
+from utils.storage import data_path
+
+# Disk space used by cached PDFs before the least recently used are removed
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_MB', '256')) * 2**20
+
+# Patient fields printed on the treatment plan; other edits keep the PDF cached
+PLAN_FIELDS = ('name', 'age', 'gender')
+
+# Bump when the treatment plan layout changes so stale PDFs are not served
+PLAN_FORMAT_VERSION = 1
+
+
+def treatment_plan_key(personal_info, recommendations):
+    """Content address of a treatment plan PDF."""
+    fields = {field: (personal_info or {}).get(field) for field in PLAN_FIELDS}
+    return digest_value(['treatment_plan', PLAN_FORMAT_VERSION, fields, recommendations])
+
+
+class PDFCache:
+    """Content-addressed PDFs on disk, evicted least-recently-used by size.
+
+    Files are named by their key and written atomically, so any number of
+    sessions and worker processes can share one directory. A hit bumps the
+    file's mtime, which is what eviction orders by. Hit and byte counters
+    are per process.
+    """
+
+    def __init__(self, root=None, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.root = root or data_path('pdf_cache', '')
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_rendered = 0
+
+    def path(self, key):
+        return os.path.join(self.root, f'{key}.pdf')
+
+    def open(self, key, render):
+        """Open the cached PDF for ``key``, rendering it first on a miss.
+
+        ``render`` is called with a binary file object to write the PDF
+        into. Returns an open binary file; the handle stays readable even if
+        another worker evicts the file meanwhile.
+        """
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted by another worker since it was opened; f is still readable
+                pass
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += os.fstat(f.fileno()).st_size
+            return f
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                render(output)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        f = open(path, 'rb')
+        with self._lock:
+            self.misses += 1
+            self.bytes_rendered += os.fstat(f.fileno()).st_size
+        self.evict(keep=path)
+        return f
+
+    def entries(self):
+        """(mtime, size, path) of every cached PDF, oldest first."""
+        entries = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if not entry.name.endswith('.pdf'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """Remove the least recently used PDFs until the cache fits."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        entries = self.entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'bytes_saved': self.bytes_saved,
+                'bytes_rendered': self.bytes_rendered,
+                'files': len(entries),
+                'disk_bytes': sum(size for _, size, _ in entries),
+            }
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+@lru_cache(maxsize=None)
+def get_pdf_cache():
+    """The shared on-disk PDF cache, opened once per process."""
+    return PDFCache()
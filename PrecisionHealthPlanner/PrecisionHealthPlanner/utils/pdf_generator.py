@@ -1,54 +1,324 @@
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, String
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
+                                PageBreak)
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
 import io
+import os
+import re
+import tempfile
+import zipfile
+
+import numpy as np
+
+from utils.instrumentation import timed
+from utils.storage import data_path
+from utils.timeseries_store import METRIC_DTYPES, TIMESTAMP_COLUMN, TimeSeriesStore
+
+# Plans rendered per worker process before the parent waits for results
+BATCH_IN_FLIGHT_PER_WORKER = 4
+
+# Flowables pulled ahead of the one being laid out (keep-with-next lookahead)
+FLOWABLE_LOOKAHEAD = 16
+
+# Daily summary rows per trend table; one table fits on a letter page
+TREND_TABLE_ROWS = 40
+
+# Line colours for the trend charts, in METRIC_DTYPES order
+TREND_CHART_COLORS = [colors.HexColor('#0066cc'), colors.HexColor('#ff9900'),
+                      colors.HexColor('#33aa55')]
+
+
+@lru_cache(maxsize=None)
+def get_pdf_styles():
+    """Build the stylesheet and table style once per process."""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30
+    )
+    info_table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey)
+    ])
+    return styles, title_style, info_table_style
+
+
+class FlowableStream(list):
+    """A story for ``doc.build`` that is filled lazily from an iterable.
+
+    ``doc.build`` consumes flowables from the front of its list and only
+    looks a few items ahead, so buffering ``lookahead`` flowables at a time
+    lets a generator produce the story while it is laid out. Drawn
+    flowables are dropped as soon as their page is finished instead of
+    the whole story being held until the build ends.
+    """
+
+    def __init__(self, flowables, lookahead=FLOWABLE_LOOKAHEAD):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def _fill(self):
+        while self._source is not None and super().__len__() < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._fill()
+        return super().__getitem__(index)
+
+
+def _plan_flowables(patient_data, recommendations):
+    """Title, patient details and recommendations, one flowable at a time."""
+    styles, title_style, info_table_style = get_pdf_styles()
+
+    # Title
+    yield Paragraph("Treatment Plan Summary", title_style)
+    yield Spacer(1, 12)
+
+    # Patient Information
+    personal_info = patient_data.get('personal_info', {})
+    patient_info_data = [
+        ["Patient Name:", personal_info.get('name', 'N/A')],
+        ["Age:", personal_info.get('age', 'N/A')],
+        ["Gender:", personal_info.get('gender', 'N/A')]
+    ]
+
+    patient_info_table = Table(patient_info_data, colWidths=[120, 300])
+    patient_info_table.setStyle(info_table_style)
+    yield patient_info_table
+    yield Spacer(1, 20)
+
+    # Recommendations
+    yield Paragraph("Recommendations:", styles['Heading2'])
+    for category, items in recommendations.items():
+        yield Paragraph(f"{category}:", styles['Heading3'])
+        for item in items:
+            yield Paragraph(f"• {item}", styles['Normal'])
+        yield Spacer(1, 12)
+
+
+def _daily_summaries(store, patient_id, month):
+    """Per-day (date, min, mean, max per metric) rows for one stored month."""
+    start = np.datetime64(month, 'M')
+    readings = store.query(patient_id, start, start + 1)
+    days = readings[TIMESTAMP_COLUMN].astype('datetime64[D]')
+    if not len(days):
+        return []
+    starts = np.r_[0, np.flatnonzero(days[1:] != days[:-1]) + 1]
+    counts = np.diff(np.r_[starts, len(days)])
+    columns = [days[starts]]
+    for metric in METRIC_DTYPES:
+        values = np.asarray(readings[metric], dtype=float)
+        columns += [np.minimum.reduceat(values, starts),
+                    np.add.reduceat(values, starts) / counts,
+                    np.maximum.reduceat(values, starts)]
+    return list(zip(*columns))
+
+
+def _trend_chart(year, rows):
+    """Line chart of one year's daily means, one line per metric."""
+    drawing = Drawing(460, 260)
+    drawing.add(String(230, 245, f"Daily mean readings, {year}", textAnchor='middle',
+                       fontName='Helvetica-Bold', fontSize=12))
+    plot = LinePlot()
+    plot.x, plot.y, plot.width, plot.height = 40, 50, 400, 180
+    day_of_year = [int((row[0] - np.datetime64(f'{year}-01-01', 'D')).astype(int)) + 1
+                   for row in rows]
+    plot.data = [list(zip(day_of_year, (row[2 + 3 * i] for row in rows)))
+                 for i in range(len(METRIC_DTYPES))]
+    for i, color in enumerate(TREND_CHART_COLORS):
+        plot.lines[i].strokeColor = color
+    plot.xValueAxis.valueMin, plot.xValueAxis.valueMax = 1, 366
+    plot.xValueAxis.valueSteps = [1, 91, 182, 274, 366]
+    plot.xValueAxis.labelTextFormat = lambda day: f"day {int(day)}"
+    drawing.add(plot)
+
+    legend = Legend()
+    legend.x, legend.y = 40, 20
+    legend.alignment = 'right'
+    legend.columnMaximum = 1
+    legend.colorNamePairs = [(color, metric.replace('_', ' ').title())
+                             for color, metric in zip(TREND_CHART_COLORS, METRIC_DTYPES)]
+    drawing.add(legend)
+    return drawing
+
+
+def _trend_tables(rows):
+    """Daily summary rows as page-sized tables with a repeated header."""
+    header = ['Date'] + [f"{metric.replace('_', ' ').title()} (min / mean / max)"
+                         for metric in METRIC_DTYPES]
+    table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ])
+    for start in range(0, len(rows), TREND_TABLE_ROWS):
+        body = [[str(row[0])] + [f"{row[1 + 3 * i]:.0f} / {row[2 + 3 * i]:.1f} / "
+                                 f"{row[3 + 3 * i]:.0f}" for i in range(len(METRIC_DTYPES))]
+                for row in rows[start:start + TREND_TABLE_ROWS]]
+        table = Table([header] + body, repeatRows=1, colWidths=[64, 134, 134, 134])
+        table.setStyle(table_style)
+        yield table
+        yield Spacer(1, 12)
+
+
+def _trend_flowables(patient_id, store=None):
+    """A chart page and daily tables per year of stored readings.
+
+    Only one month of readings and one year of daily summaries are held at
+    a time, however many years are stored.
+    """
+    store = store or TimeSeriesStore()
+    months = store.months(patient_id)
+    if not months:
+        return
+    styles = get_pdf_styles()[0]
+
+    years = {}
+    for month in months:
+        years.setdefault(month[:4], []).append(month)
+    for year, year_months in years.items():
+        rows = [row for month in year_months
+                for row in _daily_summaries(store, patient_id, month)]
+        if not rows:
+            continue
+        yield PageBreak()
+        yield Paragraph(f"Health Trends {year}", styles['Heading2'])
+        yield _trend_chart(year, rows)
+        yield Spacer(1, 12)
+        yield from _trend_tables(rows)
+
+
+def _report_flowables(patient_data, recommendations, store=None):
+    yield from _plan_flowables(patient_data, recommendations)
+    personal_info = patient_data.get('personal_info', {})
+    patient_id = personal_info.get('patient_id', personal_info.get('name'))
+    if patient_id is not None:
+        yield from _trend_flowables(patient_id, store)
+
+
+def _plan_file_name(name, index):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', str(name or 'patient')).strip('_') or 'patient'
+    return f"treatment_plan_{index:06d}_{slug}.pdf"
+
+
+def _render_plan(job):
+    """Worker entry point: render one plan to bytes, or to ``path`` if given."""
+    patient_data, recommendations, path = job
+    if path is None:
+        return PDFGenerator.generate_treatment_plan_pdf(patient_data, recommendations).getvalue()
+    PDFGenerator.write_treatment_plan_pdf(patient_data, recommendations, path)
+    return path
+
 
 class PDFGenerator:
     @staticmethod
+    @timed('pdf_generator.generate_treatment_plan_pdf')
     def generate_treatment_plan_pdf(patient_data, recommendations):
         """Generate a PDF report of the treatment plan."""
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        elements = []
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30
-        )
-        elements.append(Paragraph("Treatment Plan Summary", title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Patient Information
-        personal_info = patient_data.get('personal_info', {})
-        patient_info_data = [
-            ["Patient Name:", personal_info.get('name', 'N/A')],
-            ["Age:", personal_info.get('age', 'N/A')],
-            ["Gender:", personal_info.get('gender', 'N/A')]
-        ]
-        
-        patient_info_table = Table(patient_info_data, colWidths=[120, 300])
-        patient_info_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey)
-        ]))
-        elements.append(patient_info_table)
-        elements.append(Spacer(1, 20))
-        
-        # Recommendations
-        elements.append(Paragraph("Recommendations:", styles['Heading2']))
-        for category, items in recommendations.items():
-            elements.append(Paragraph(f"{category}:", styles['Heading3']))
-            for item in items:
-                elements.append(Paragraph(f"• {item}", styles['Normal']))
-            elements.append(Spacer(1, 12))
-        
-        doc.build(elements)
+        PDFGenerator.write_treatment_plan_pdf(patient_data, recommendations, buffer)
         buffer.seek(0)
         return buffer
+
+    @staticmethod
+    def write_treatment_plan_pdf(patient_data, recommendations, output):
+        """Render the treatment plan to a file path or binary file object."""
+        doc = SimpleDocTemplate(output, pagesize=letter)
+        doc.build(list(_plan_flowables(patient_data, recommendations)))
+
+    @staticmethod
+    @timed('pdf_generator.write_report_pdf')
+    def write_report_pdf(patient_data, recommendations, output, store=None):
+        """Render the full report, with stored health trends, streaming.
+
+        Flowables are generated as the document is laid out rather than
+        collected up front, and page streams are compressed, so memory
+        grows with the number of pages only by their compressed size.
+        """
+        doc = SimpleDocTemplate(output, pagesize=letter, pageCompression=1)
+        doc.build(FlowableStream(_report_flowables(patient_data, recommendations, store)))
+
+    @staticmethod
+    def generate_report_file(patient_data, recommendations, store=None):
+        """Render the full report to a temporary file and return its path.
+
+        The caller owns the file and should delete it once it is served.
+        """
+        fd, path = tempfile.mkstemp(suffix='.pdf', dir=data_path('reports', ''))
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                PDFGenerator.write_report_pdf(patient_data, recommendations, output, store)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    @staticmethod
+    @timed('pdf_generator.export_batch')
+    def export_batch(plans, output, processes=None):
+        """Render many treatment plans in a process pool.
+
+        ``plans`` is an iterable of ``(patient_data, recommendations)`` pairs
+        and is consumed lazily. If ``output`` ends in ``.zip`` each finished
+        PDF is streamed into that archive; otherwise PDFs are written by the
+        workers straight into the ``output`` directory. Only a bounded
+        window of plans is in flight at once, so memory does not grow with
+        the number of plans. Returns the number of PDFs written.
+        """
+        to_zip = str(output).endswith('.zip')
+        if not to_zip:
+            os.makedirs(output, exist_ok=True)
+
+        processes = processes or os.cpu_count()
+        max_in_flight = processes * BATCH_IN_FLIGHT_PER_WORKER
+        archive = zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) if to_zip else None
+        written = 0
+
+        def collect(futures):
+            nonlocal written
+            for future in futures:
+                result = future.result()
+                if archive is not None:
+                    archive.writestr(pending.pop(future), result)
+                else:
+                    pending.pop(future)
+                written += 1
+
+        try:
+            with ProcessPoolExecutor(max_workers=processes,
+                                     initializer=get_pdf_styles) as pool:
+                pending = {}
+                for index, (patient_data, recommendations) in enumerate(plans):
+                    name = _plan_file_name(
+                        patient_data.get('personal_info', {}).get('name'), index)
+                    path = None if to_zip else os.path.join(output, name)
+                    future = pool.submit(_render_plan, (patient_data, recommendations, path))
+                    pending[future] = name
+                    if len(pending) >= max_in_flight:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                collect(list(pending))
+        finally:
+            if archive is not None:
+                archive.close()
+        return written
@@ -0,0 +1,207 @@
+import argparse
+import json
+from functools import lru_cache
+
+import numpy as np
+
+from utils.storage import ConnectionPool, data_path
+
+# Equal-width bins over [0, 1] for each condition's risk distribution
+RISK_BINS = 100
+
+# Health scores are integers in [0, 100]; one bin per score
+SCORE_BINS = 101
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_bins (
+    metric TEXT NOT NULL,
+    bin TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (metric, bin)
+);
+CREATE TABLE IF NOT EXISTS rollup_contributions (
+    patient_id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    entries TEXT NOT NULL
+);
+"""
+
+
+def _risk_bin(risk):
+    return str(min(int(risk * RISK_BINS), RISK_BINS - 1))
+
+
+def contribution_entries(analysis):
+    """The (metric, bin, value) rows one patient's analysis adds to the rollups."""
+    entries = [('patients', '', 1.0),
+               ('health_score', str(int(analysis['health_score'])),
+                float(analysis['health_score']))]
+    for condition, risk in analysis['risk_factors'].items():
+        entries.append((f'risk:{condition}', _risk_bin(risk), float(risk)))
+    for category, items in analysis['recommendations'].items():
+        for item in items:
+            entries.append((f'recommendation:{category}', item, 1.0))
+    return entries
+
+
+def histogram_quantile(counts, edges, q, discrete=False):
+    """Quantile ``q`` of a histogram.
+
+    The position within the bin is interpolated, which approximates the
+    quantile of continuous values. With ``discrete`` each bin holds a
+    single value, its lower edge, and the result is exact: it matches
+    ``numpy.percentile`` over those values, interpolating between the two
+    neighbouring values when the rank falls between them.
+    """
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    if not total:
+        return float('nan')
+    cumulative = np.cumsum(counts)
+    if discrete:
+        rank = q * (total - 1)
+        lower = int(rank)
+        # Bin holding the value at each 0-based rank
+        i = int(np.searchsorted(cumulative, lower, side='right'))
+        j = int(np.searchsorted(cumulative, min(lower + 1, total - 1), side='right'))
+        return float(edges[i] + (rank - lower) * (edges[j] - edges[i]))
+    i = int(np.searchsorted(cumulative, q * total))
+    below = cumulative[i - 1] if i else 0.0
+    fraction = (q * total - below) / counts[i] if counts[i] else 0.0
+    return float(edges[i] + fraction * (edges[i + 1] - edges[i]))
+
+
+class PopulationRollups:
+    """Cohort counts, sums and histograms maintained one patient at a time.
+
+    Each patient's last contribution is stored next to the rollups, so
+    re-scoring a patient subtracts the old bins and adds the new ones in a
+    single transaction. Reading the rollups costs the number of bins, not
+    the number of patients.
+    """
+
+    def __init__(self, path):
+        self.pool = ConnectionPool(path, size=2)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def record(self, patient_id, fingerprint, analysis):
+        """Replace a patient's contribution; a no-op if it is unchanged."""
+        entries = contribution_entries(analysis)
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT fingerprint, entries FROM rollup_contributions WHERE patient_id = ?',
+                (patient_id,)).fetchone()
+            if row is not None and row[0] == fingerprint:
+                return False
+            old_entries = json.loads(row[1]) if row is not None else []
+            self._apply(conn, old_entries, -1)
+            self._apply(conn, entries, 1)
+            conn.execute(
+                'INSERT OR REPLACE INTO rollup_contributions (patient_id, fingerprint, entries) '
+                'VALUES (?, ?, ?)', (patient_id, fingerprint, json.dumps(entries)))
+        return True
+
+    def remove(self, patient_id):
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT entries FROM rollup_contributions WHERE patient_id = ?',
+                (patient_id,)).fetchone()
+            if row is None:
+                return
+            self._apply(conn, json.loads(row[0]), -1)
+            conn.execute('DELETE FROM rollup_contributions WHERE patient_id = ?', (patient_id,))
+
+    @staticmethod
+    def _apply(conn, entries, sign):
+        conn.executemany(
+            'INSERT INTO rollup_bins (metric, bin, count, total) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (metric, bin) DO UPDATE SET '
+            '  count = count + excluded.count, total = total + excluded.total',
+            [(metric, bin_, sign, sign * value) for metric, bin_, value in entries])
+        if sign < 0:
+            conn.execute('DELETE FROM rollup_bins WHERE count <= 0')
+
+    def snapshot(self):
+        """Current rollups as histograms and frequency tables.
+
+        Returns ``{'patients', 'health_score', 'risks', 'recommendations'}``;
+        each histogram has ``edges``, ``counts``, ``mean`` and quartiles.
+        """
+        with self.pool.connection() as conn:
+            rows = conn.execute('SELECT metric, bin, count, total FROM rollup_bins').fetchall()
+
+        patients = 0
+        scores = np.zeros(SCORE_BINS)
+        score_total = 0.0
+        risks, risk_totals, recommendations = {}, {}, {}
+        for metric, bin_, count, total in rows:
+            if metric == 'patients':
+                patients = count
+            elif metric == 'health_score':
+                scores[int(bin_)] = count
+                score_total += total
+            elif metric.startswith('risk:'):
+                condition = metric[len('risk:'):]
+                risks.setdefault(condition, np.zeros(RISK_BINS))[int(bin_)] = count
+                risk_totals[condition] = risk_totals.get(condition, 0.0) + total
+            elif metric.startswith('recommendation:'):
+                category = metric[len('recommendation:'):]
+                recommendations.setdefault(category, {})[bin_] = count
+
+        def summary(counts, edges, total, discrete=False):
+            n = counts.sum()
+            return {'edges': edges, 'counts': counts,
+                    'mean': total / n if n else float('nan'),
+                    **{name: histogram_quantile(counts, edges, q, discrete)
+                       for name, q in [('p25', 0.25), ('median', 0.5), ('p75', 0.75)]}}
+
+        risk_edges = np.linspace(0, 1, RISK_BINS + 1)
+        return {
+            'patients': patients,
+            # Integer scores: bin i covers [i, i + 1)
+            'health_score': summary(scores, np.arange(SCORE_BINS + 1, dtype=float),
+                                    score_total, discrete=True),
+            'risks': {condition: summary(counts, risk_edges, risk_totals[condition])
+                      for condition, counts in sorted(risks.items())},
+            'recommendations': {
+                category: dict(sorted(items.items(), key=lambda item: -item[1]))
+                for category, items in recommendations.items()},
+        }
+
+
+@lru_cache(maxsize=None)
+def get_population_rollups():
+    """Open the shared rollup store once per process."""
+    return PopulationRollups(data_path('population_rollups.db'))
+
+
+def record_patient_analysis(patient_data, analysis, fingerprint):
+    """Fold a stored patient's analysis into the rollups; others are skipped."""
+    patient_id = getattr(patient_data, 'patient_id', None)
+    if patient_id is None:
+        return False
+    return get_population_rollups().record(patient_id, fingerprint, analysis)
+
+
+def main(argv=None):
+    """Fold every saved patient into the rollups, e.g. after an upgrade."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.parse_args(argv)
+
+    # Imported here so the rollups module stays free of the analysis stack
+    from utils.analysis_cache import get_patient_analysis, patient_fingerprint
+    from utils.patient_repository import StoredPatient, get_patient_repository
+
+    for patient_id in get_patient_repository().ids():
+        patient = StoredPatient(patient_id)
+        record_patient_analysis(patient, get_patient_analysis(patient),
+                                patient_fingerprint(patient))
+    print(f"{get_population_rollups().snapshot()['patients']} patients in the rollups")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,189 @@
+import json
+import os
+import operator
+from collections.abc import Hashable
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.data_processor import DataProcessor
+from utils.instrumentation import timed
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'recommendation_rules.json')
+
+# Rule operators matched against categorical fields via a lookup table
+CATEGORICAL_OPS = ('eq', 'ne', 'in')
+
+# Rule operators compared against numeric fields
+NUMERIC_OPS = {
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'lt': operator.lt,
+    'le': operator.le,
+}
+
+# Medical history fields holding lists; no rule operator can match them
+LIST_FIELDS = ('conditions', 'medications', 'allergies')
+
+
+def _code(codes, value):
+    """Vocabulary code of a categorical value; -1 if absent or unhashable."""
+    try:
+        return codes.get(value, -1)
+    except TypeError:
+        return -1
+
+
+def _to_float(value):
+    """Scalar twin of ``pd.to_numeric(errors='coerce')``: NaN if not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class RuleSet:
+    """Declarative recommendation rules compiled for vectorized evaluation.
+
+    Rules on the same categorical field share one boolean lookup table
+    indexed by the field's value code, and numeric rules on the same
+    field and operator share one broadcast comparison, so evaluating a
+    whole cohort costs one pass per field rather than one per rule.
+    """
+
+    def __init__(self, categories, rules):
+        self.categories = list(categories)
+        self.rules = list(rules)
+        for rule in self.rules:
+            if rule['op'] not in CATEGORICAL_OPS and rule['op'] not in NUMERIC_OPS:
+                raise ValueError(f"Unknown operator {rule['op']!r} in rule {rule['id']!r}")
+            if rule['category'] not in self.categories:
+                raise ValueError(f"Unknown category {rule['category']!r} in rule {rule['id']!r}")
+            if rule['field'] in LIST_FIELDS:
+                raise ValueError(f"Field {rule['field']!r} in rule {rule['id']!r} holds a list")
+            if rule['op'] in CATEGORICAL_OPS:
+                values = rule['value'] if rule['op'] == 'in' else [rule['value']]
+                if not all(isinstance(value, Hashable) for value in values):
+                    raise ValueError(f"Unhashable value in rule {rule['id']!r}")
+
+        # field -> (vocabulary index, value->code dict, lookup table, rule columns)
+        self._categorical = {}
+        grouped = {}
+        for i, rule in enumerate(self.rules):
+            if rule['op'] in CATEGORICAL_OPS:
+                grouped.setdefault(rule['field'], []).append(i)
+        for field, columns in grouped.items():
+            vocabulary = []
+            for i in columns:
+                values = self.rules[i]['value']
+                for value in (values if self.rules[i]['op'] == 'in' else [values]):
+                    if value not in vocabulary:
+                        vocabulary.append(value)
+            codes = {value: code for code, value in enumerate(vocabulary)}
+            # Extra last row for values outside the vocabulary (code -1)
+            table = np.zeros((len(vocabulary) + 1, len(columns)), dtype=bool)
+            for j, i in enumerate(columns):
+                rule = self.rules[i]
+                if rule['op'] == 'eq':
+                    table[codes[rule['value']], j] = True
+                elif rule['op'] == 'ne':
+                    table[:, j] = True
+                    table[codes[rule['value']], j] = False
+                else:
+                    table[[codes[v] for v in rule['value']], j] = True
+            self._categorical[field] = (pd.Index(vocabulary), codes, table,
+                                        np.array(columns))
+
+        # (field, op) -> (thresholds, rule columns)
+        self._numeric = {}
+        for i, rule in enumerate(self.rules):
+            if rule['op'] in NUMERIC_OPS:
+                self._numeric.setdefault((rule['field'], rule['op']), []).append(i)
+        self._numeric = {
+            key: (np.array([self.rules[i]['value'] for i in columns], dtype=float),
+                  np.array(columns))
+            for key, columns in self._numeric.items()
+        }
+
+    @classmethod
+    def from_file(cls, path):
+        """Load and compile a rule table from a JSON file."""
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec['categories'], spec['rules'])
+
+    def evaluate(self, patients):
+        """Return an (n_patients, n_rules) boolean matrix for a DataFrame of patients."""
+        n = len(patients)
+        mask = np.zeros((n, len(self.rules)), dtype=bool)
+        for field, (vocabulary, lookup, table, columns) in self._categorical.items():
+            if field in patients:
+                try:
+                    codes = vocabulary.get_indexer(patients[field])
+                except TypeError:
+                    # Unhashable values (lists, dicts) match no value
+                    codes = np.array([_code(lookup, value) for value in patients[field]],
+                                     dtype=int)
+            else:
+                codes = np.full(n, -1)
+            mask[:, columns] = table[codes]
+        for (field, op), (thresholds, columns) in self._numeric.items():
+            if field not in patients:
+                continue
+            values = pd.to_numeric(patients[field], errors='coerce').to_numpy(dtype=float)
+            # NaN compares False, so missing values never fire a rule
+            mask[:, columns] = NUMERIC_OPS[op](values[:, None], thresholds[None, :])
+        return mask
+
+    def evaluate_one(self, features):
+        """Return the boolean rule vector for a single patient's feature dict.
+
+        Values are coerced as in ``evaluate``, so both paths fire the same
+        rules: a missing, non-numeric or unhashable value fires none.
+        """
+        mask = np.zeros(len(self.rules), dtype=bool)
+        for field, (_, codes, table, columns) in self._categorical.items():
+            mask[columns] = table[_code(codes, features.get(field))]
+        for (field, op), (thresholds, columns) in self._numeric.items():
+            mask[columns] = NUMERIC_OPS[op](_to_float(features.get(field)), thresholds)
+        return mask
+
+    def recommendations_for(self, mask):
+        """Expand one patient's rule vector into the category -> items dict."""
+        recommendations = {category: [] for category in self.categories}
+        for i in np.flatnonzero(mask):
+            rule = self.rules[i]
+            recommendations[rule['category']].append(rule['text'])
+        return recommendations
+
+
+@lru_cache(maxsize=None)
+def get_rule_set(path=RULES_PATH):
+    """Compile the rule table once per process."""
+    return RuleSet.from_file(path)
+
+
 class RecommendationEngine:
     @staticmethod
+    @timed('recommendation_engine.generate_recommendations')
     def generate_recommendations(patient_data, risk_factors):
         """Generate treatment recommendations based on patient data and risk factors."""
-        recommendations = {
-            'Medications': [],
-            'Lifestyle Changes': [],
-            'Preventive Measures': []
-        }
-        
-        # Process lifestyle factors
-        lifestyle = patient_data.get('lifestyle_factors', {})
-        if lifestyle.get('exercise_frequency') == 'Rarely':
-            recommendations['Lifestyle Changes'].append(
-                "Increase physical activity to at least 150 minutes per week"
-            )
-        
-        if lifestyle.get('smoking_status') == 'Current':
-            recommendations['Lifestyle Changes'].append(
-                "Quit smoking - consider nicotine replacement therapy"
-            )
-        
-        # Process risk factors
-        if risk_factors.get('heart_disease', 0) > 0.5:
-            recommendations['Medications'].append(
-                "Consider preventive cardiovascular medication"
-            )
-            recommendations['Preventive Measures'].append(
-                "Regular blood pressure monitoring"
-            )
-        
-        if risk_factors.get('diabetes', 0) > 0.5:
-            recommendations['Preventive Measures'].append(
-                "Regular blood glucose monitoring"
-            )
-            recommendations['Lifestyle Changes'].append(
-                "Follow a low-glycemic diet plan"
-            )
-        
-        return recommendations
+        rules = get_rule_set()
+        features = DataProcessor.patient_features(patient_data, risk_factors)
+        return rules.recommendations_for(rules.evaluate_one(features))
+
+    @staticmethod
+    @timed('recommendation_engine.generate_cohort_recommendations')
+    def generate_cohort_recommendations(patients):
+        """Evaluate every rule for a DataFrame of flattened patient features.
+
+        ``patients`` has one row per patient and one column per feature (as
+        produced by DataProcessor.patient_features). Returns a boolean
+        DataFrame with one column per rule id; pass a row to
+        ``get_rule_set().recommendations_for`` to get the grouped text.
+        """
+        rules = get_rule_set()
+        return pd.DataFrame(rules.evaluate(patients), index=patients.index,
+                            columns=[rule['id'] for rule in rules.rules])
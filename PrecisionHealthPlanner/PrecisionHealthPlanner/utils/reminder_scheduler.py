@@ -0,0 +1,189 @@
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Recurrence options offered on the treatment plan page
+FREQUENCY_INTERVALS = {
+    'Daily': 24 * 3600,
+    'Every 2 days': 2 * 24 * 3600,
+    'Weekly': 7 * 24 * 3600,
+}
+
+# Reminders claimed per transaction by the worker
+DUE_BATCH_SIZE = 500
+
+# Upper bound on how long the worker sleeps before re-checking the store
+MAX_IDLE_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY,
+    phone TEXT NOT NULL,
+    message TEXT NOT NULL,
+    interval_seconds INTEGER,
+    next_fire_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_next_fire_at ON reminders (next_fire_at);
+"""
+
+
+class ReminderScheduler:
+    """SQLite-backed reminder store ordered by next fire time.
+
+    Due reminders are found through the ``next_fire_at`` index, so the
+    earliest-due lookup and each batch claim cost O(log n + batch) no
+    matter how many reminders are stored. Recurring reminders are moved to
+    their next slot in the same transaction that claims them, which keeps
+    several worker processes from sending the same reminder twice.
+
+    ``send(phone, messages)`` receives every reminder claimed for a number
+    in one call. With ``window`` > 0 a number's reminders are only claimed
+    once its earliest due reminder has waited ``window`` seconds, so those
+    falling due meanwhile go out with it; until then they stay in the
+    store, and a restart loses nothing.
+
+    Delivery is at most once. Claiming deletes a one-off reminder (or
+    moves a recurring one to its next slot) before it is handed to
+    ``send``, so an occurrence whose ``send`` raises, whose SMS fails for
+    good after the dispatcher's retries, or whose process dies in between
+    is logged at most and never sent again.
+    """
+
+    def __init__(self, path, send, clock=time.time, window=0):
+        self.send = send
+        self.clock = clock
+        self.window = window
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+
+    def add(self, phone, message, frequency=None, first_fire_at=None):
+        """Store a reminder and return its id; ``frequency=None`` fires once."""
+        interval = FREQUENCY_INTERVALS[frequency] if frequency else None
+        fire_at = self.clock() if first_fire_at is None else first_fire_at
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO reminders (phone, message, interval_seconds, next_fire_at) '
+                'VALUES (?, ?, ?, ?)',
+                (phone, message, interval, fire_at)
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def add_many(self, rows):
+        """Bulk-insert (phone, message, interval_seconds, next_fire_at) rows."""
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                'INSERT INTO reminders (phone, message, interval_seconds, next_fire_at) '
+                'VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._conn.execute('COMMIT')
+        self._wakeup.set()
+
+    def cancel(self, reminder_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM reminders WHERE id = ?', (reminder_id,))
+
+    def next_due_time(self):
+        """Earliest next_fire_at, or None when nothing is scheduled."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT MIN(next_fire_at) FROM reminders').fetchone()[0]
+
+    def claim_due(self, now=None, limit=DUE_BATCH_SIZE):
+        """Claim due reminders and reschedule or delete them.
+
+        Claims at most ``limit`` reminders, or with a window, every due
+        reminder of at most ``limit`` numbers.
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if self.window > 0:
+                    # Every due reminder of up to ``limit`` numbers whose earliest
+                    # one has waited out the window, so no number is split
+                    due = self._conn.execute(
+                        'SELECT id, phone, message, interval_seconds, next_fire_at '
+                        'FROM reminders WHERE next_fire_at <= ? AND phone IN '
+                        '(SELECT DISTINCT phone FROM reminders WHERE next_fire_at <= ? LIMIT ?) '
+                        'ORDER BY next_fire_at',
+                        (now, now - self.window, limit)
+                    ).fetchall()
+                else:
+                    due = self._conn.execute(
+                        'SELECT id, phone, message, interval_seconds, next_fire_at '
+                        'FROM reminders WHERE next_fire_at <= ? '
+                        'ORDER BY next_fire_at LIMIT ?',
+                        (now, limit)
+                    ).fetchall()
+
+                once = [(row[0],) for row in due if not row[3]]
+                # Skip slots missed while no worker was running
+                recurring = [
+                    (fire_at + interval * (math.floor((now - fire_at) / interval) + 1),
+                     reminder_id)
+                    for reminder_id, _, _, interval, fire_at in due if interval
+                ]
+                self._conn.executemany('DELETE FROM reminders WHERE id = ?', once)
+                self._conn.executemany(
+                    'UPDATE reminders SET next_fire_at = ? WHERE id = ?', recurring)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [(reminder_id, phone, message) for reminder_id, phone, message, _, _ in due]
+
+    def run_pending(self, now=None):
+        """Send every reminder that is due, grouped by number; returns the count."""
+        by_phone = {}
+        while True:
+            batch = self.claim_due(now)
+            for _, phone, message in batch:
+                by_phone.setdefault(phone, []).append(message)
+            if len(batch) < DUE_BATCH_SIZE:
+                break
+        for phone, messages in by_phone.items():
+            try:
+                self.send(phone, messages)
+            except Exception as e:
+                # Already claimed; this occurrence is not retried
+                logger.error("Dropped %d reminders for %s: %s", len(messages), phone, e)
+        return sum(len(messages) for messages in by_phone.values())
+
+    def start(self):
+        """Start the background worker that fires reminders at their due time."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='reminder-worker',
+                                            daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+                due = self.next_due_time()
+            except sqlite3.Error as e:
+                logger.error("Reminder worker error: %s", e)
+                due = None
+            timeout = MAX_IDLE_SECONDS if due is None else due + self.window - self.clock()
+            self._wakeup.wait(min(max(timeout, 0), MAX_IDLE_SECONDS))
+            self._wakeup.clear()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import data_path
+
+
+def encode_column(values, vocabulary):
+    """Integer-code a column against ``vocabulary``, -1 for unknown values."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Re-code only the categories, not every row
+        category_codes = vocabulary.get_indexer(values.cat.categories)
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, category_codes[codes], -1)
+    return vocabulary.get_indexer(values)
+
+
+class RiskIndex:
+    """Precompiled (gene, variant) -> per-condition risk contribution table.
+
+    Genes and variants are integer-coded and the contributions live in a
+    dense ``(genes, variants, conditions)`` float32 array, so scoring a set
+    of calls is a single fancy-indexing lookup. The array is saved to disk
+    once and memory-mapped read-only, letting every worker process share
+    the same pages.
+    """
+
+    def __init__(self, genes, variants, conditions, table):
+        self.genes = pd.Index(genes)
+        self.variants = pd.Index(variants)
+        self.conditions = list(conditions)
+        self.table = table
+
+    @classmethod
+    def build(cls, gene_weights, variant_effect, conditions):
+        """Compile the risk model dictionaries into an in-memory index."""
+        genes = list(gene_weights)
+        variants = list(variant_effect)
+        weights = np.array([[gene_weights[g][c] for c in conditions] for g in genes],
+                           dtype=np.float32)
+        effects = np.array([variant_effect[v] for v in variants], dtype=np.float32)
+        table = weights[:, None, :] * effects[None, :, None]
+        return cls(genes, variants, conditions, table)
+
+    @classmethod
+    def load_or_build(cls, gene_weights, variant_effect, conditions, directory=None):
+        """Memory-map the index for this model, compiling it on first use."""
+        directory = directory or data_path('risk_index', '')
+        model = {'genes': list(gene_weights), 'variants': list(variant_effect),
+                 'conditions': list(conditions),
+                 'weights': gene_weights, 'effects': variant_effect}
+        digest = hashlib.sha256(
+            json.dumps(model, sort_keys=True).encode()).hexdigest()[:16]
+        meta_path = os.path.join(directory, f'{digest}.json')
+        table_path = os.path.join(directory, f'{digest}.npy')
+
+        if not (os.path.exists(meta_path) and os.path.exists(table_path)):
+            index = cls.build(gene_weights, variant_effect, conditions)
+            index.save(meta_path, table_path)
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        table = np.load(table_path, mmap_mode='r')
+        return cls(meta['genes'], meta['variants'], meta['conditions'], table)
+
+    def save(self, meta_path, table_path):
+        """Write the index atomically so concurrent workers never see a partial file."""
+        pid = os.getpid()
+        with open(f'{table_path}.{pid}.tmp', 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.table))
+        os.replace(f'{table_path}.{pid}.tmp', table_path)
+        with open(f'{meta_path}.{pid}.tmp', 'w') as f:
+            json.dump({'genes': list(self.genes), 'variants': list(self.variants),
+                       'conditions': self.conditions}, f)
+        os.replace(f'{meta_path}.{pid}.tmp', meta_path)
+
+    def contributions(self, genes, variants):
+        """Return an (n_calls, n_conditions) array of risk contributions."""
+        gene_codes = encode_column(genes, self.genes)
+        variant_codes = encode_column(variants, self.variants)
+        known = (gene_codes >= 0) & (variant_codes >= 0)
+        result = np.zeros((len(gene_codes), len(self.conditions)), dtype=np.float32)
+        result[known] = self.table[gene_codes[known], variant_codes[known]]
+        return result
+
+    def patient_scores(self, patient_codes, n_patients, genes, variants, severity):
+        """(n_patients, n_conditions) summed contributions, one call per gene.
+
+        A patient has a single genotype per gene, so when a gene is called
+        more than once only the call with the highest ``severity`` (one
+        value per entry of ``self.variants``) counts. This matches a
+        GenotypeMatrix built from the same calls.
+        """
+        gene_codes = encode_column(genes, self.genes)
+        variant_codes = encode_column(variants, self.variants)
+        known = (gene_codes >= 0) & (variant_codes >= 0)
+        order = np.argsort(np.asarray(severity), kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+
+        n_genes = len(self.genes)
+        best = np.full(n_patients * n_genes, -1, dtype=np.intp)
+        keys = np.asarray(patient_codes)[known] * n_genes + gene_codes[known]
+        np.maximum.at(best, keys, rank[variant_codes[known]])
+        called = np.flatnonzero(best >= 0)
+        contributions = self.table[called % n_genes, order[best[called]]]
+        return np.column_stack([
+            np.bincount(called // n_genes, weights=contributions[:, i], minlength=n_patients)
+            for i in range(len(self.conditions))
+        ])
+
+    def genotype_table(self, genes, genotypes=('wild', 'het', 'hom')):
+        """(len(genes), len(genotypes) + 1, n_conditions) contributions per genotype.
+
+        Rows follow ``genes`` and columns follow ``genotypes`` plus a final
+        all-zero column for a missing call, matching the genotype codes of
+        utils.genotype_matrix. Genes and genotypes outside the model
+        contribute nothing.
+        """
+        gene_codes = self.genes.get_indexer(genes)
+        variant_codes = self.variants.get_indexer(list(genotypes))
+        result = np.zeros((len(gene_codes), len(variant_codes) + 1, len(self.conditions)),
+                          dtype=np.float32)
+        for j, variant in enumerate(variant_codes):
+            known = (gene_codes >= 0) & (variant >= 0)
+            result[known, j] = self.table[gene_codes[known], variant]
+        return result
@@ -0,0 +1,232 @@
+"""State shared by every worker process serving the app.
+
+``HEALTH_PLANNER_STATE`` picks the backend:
+
+* ``sqlite`` (default) - a WAL-mode SQLite file under the data directory,
+  shared by all processes on the host (or on a shared volume);
+* ``memory`` - a dict in this process, for single-process runs;
+* ``redis://...`` - any Redis-compatible server, via the optional ``redis``
+  package.
+
+Backends implement a handful of Redis-like primitives (get, set with a TTL,
+delete, incr); caches and the notification rate limit are built on top.
+Values are pickled, so only trusted processes may share a backend.
+"""
+import os
+import pickle
+import threading
+import time
+from functools import lru_cache
+
+from utils.storage import ConnectionPool, data_path
+
+# How often the SQLite backend deletes expired keys, in seconds
+PURGE_INTERVAL = 60
+
+# Target length of a rate limit window, in seconds. Short windows keep the
+# burst at a window boundary small; each window still fits a whole number
+# of acquisitions, so slow rates get longer windows
+RATE_WINDOW = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_state (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_shared_state_expires_at ON shared_state (expires_at);
+"""
+
+
+class MemoryBackend:
+    """Process-local backend; state is not shared with other workers."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, self.clock())
+            return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            now = self.clock()
+            self._entries[key] = (value, None if ttl is None else now + ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key, ttl=None):
+        """Increment a counter, creating it (with ``ttl``) if absent or expired."""
+        with self._lock:
+            now = self.clock()
+            entry = self._live(key, now)
+            if entry is None:
+                entry = (0, None if ttl is None else now + ttl)
+            self._entries[key] = (int(entry[0]) + 1, entry[1])
+            return self._entries[key][0]
+
+
+class SQLiteBackend:
+    """Backend in a SQLite file that any number of processes can open."""
+
+    def __init__(self, path, clock=time.time):
+        self.clock = clock
+        self.pool = ConnectionPool(path)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+        self._purged_at = 0.0
+
+    def get(self, key):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT value FROM shared_state WHERE key = ? '
+                'AND (expires_at IS NULL OR expires_at > ?)',
+                (key, self.clock())).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, key, value, ttl=None):
+        now = self.clock()
+        with self.pool.connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, None if ttl is None else now + ttl))
+            if now - self._purged_at > PURGE_INTERVAL:
+                self._purged_at = now
+                conn.execute('DELETE FROM shared_state WHERE expires_at <= ?', (now,))
+
+    def delete(self, key):
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM shared_state WHERE key = ?', (key,))
+
+    def incr(self, key, ttl=None):
+        """Increment a counter, creating it (with ``ttl``) if absent or expired."""
+        now = self.clock()
+        expires_at = None if ttl is None else now + ttl
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'INSERT INTO shared_state (key, value, expires_at) VALUES (?, 1, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                '  value = CASE WHEN expires_at <= ? THEN 1 ELSE value + 1 END, '
+                '  expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at '
+                '                    ELSE expires_at END '
+                'RETURNING value',
+                (key, expires_at, now, now)).fetchone()[0]
+
+
+def _milliseconds(ttl):
+    return max(1, round(ttl * 1000))
+
+
+class RedisBackend:
+    """Backend on a Redis-compatible client.
+
+    ``client`` needs ``get``, ``set(px=)``, ``delete``, ``incr`` and
+    ``pexpire`` with redis-py semantics, so a local stub can stand in for a
+    server. TTLs are sent in milliseconds so sub-second windows keep their
+    length.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url):
+        # Optional dependency, only needed when a Redis URL is configured
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, px=None if ttl is None else _milliseconds(ttl))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key, ttl=None):
+        count = self.client.incr(key)
+        if count == 1 and ttl is not None:
+            self.client.pexpire(key, _milliseconds(ttl))
+        return count
+
+
+class SharedState:
+    """Typed access to a backend: pickled values and shared counters."""
+
+    def __init__(self, backend, namespace='health_planner'):
+        self.backend = backend
+        self.namespace = namespace
+
+    def _key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def get(self, key):
+        raw = self.backend.get(self._key(key))
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(self._key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+
+    def incr(self, key, ttl=None):
+        return self.backend.incr(self._key(key), ttl)
+
+
+class SharedRateLimiter:
+    """Rate limit shared by every process using the same state backend.
+
+    Drop-in for ``sms_dispatcher.RateLimiter``: ``acquire`` blocks until
+    this call fits within ``rate`` acquisitions per second across all
+    workers. Each fixed window admits ``limit`` calls and lasts exactly
+    ``limit / rate`` seconds, so the long-run rate is never exceeded, even
+    for fractional rates. Around a window boundary two windows' worth can
+    pass back to back, which is why windows are kept short.
+    """
+
+    def __init__(self, state, name, rate, window=RATE_WINDOW):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.state = state
+        self.key = f'rate:{name}'
+        self.rate = float(rate)
+        self.limit = max(1, round(self.rate * window))
+        self.window = self.limit / self.rate
+
+    def acquire(self):
+        while True:
+            if self.state.incr(self.key, ttl=self.window) <= self.limit:
+                return
+            time.sleep(1 / self.rate)
+
+
+def create_backend(spec=None):
+    """Build the backend named by ``spec`` or HEALTH_PLANNER_STATE."""
+    spec = spec or os.getenv('HEALTH_PLANNER_STATE', 'sqlite')
+    if spec == 'memory':
+        return MemoryBackend()
+    if spec == 'sqlite':
+        return SQLiteBackend(data_path('shared_state.db'))
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend.from_url(spec)
+    raise ValueError(f"Unknown shared state backend: {spec}")
+
+
+@lru_cache(maxsize=None)
+def get_shared_state():
+    """The configured shared state, opened once per process."""
+    return SharedState(create_backend())
@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Seconds a number's first due reminder waits so reminders falling due
+# meanwhile go out in the same SMS; 0 sends each as soon as it is due
+COALESCE_WINDOW = float(os.getenv('SMS_COALESCE_SECONDS', '30'))
+
+# Longest body Twilio accepts; a group that would exceed it is split
+MAX_BODY_CHARS = 1600
+
+# Body of a coalesced SMS: a header line, then one line per reminder
+COALESCED_HEADER = "You have {count} reminders:"
+COALESCED_LINE = "- {body}"
+
+
+def merge_bodies(bodies):
+    """One SMS body for a batch of reminder bodies."""
+    if len(bodies) == 1:
+        return bodies[0]
+    return '\n'.join([COALESCED_HEADER.format(count=len(bodies)),
+                      *(COALESCED_LINE.format(body=body) for body in bodies)])
+
+
+class ReminderCoalescer:
+    """Merges the reminders due together for one phone number into one SMS.
+
+    ReminderScheduler hands over every reminder it claimed for a number in
+    one ``submit`` (its ``window`` decides how long they wait in the store
+    first). Exact duplicates are dropped and the rest go to
+    ``send(to_number, body)`` as a single templated message, split only
+    where the body would pass Twilio's length limit. Nothing is held in
+    memory between calls, so there is nothing to flush on shutdown.
+    """
+
+    def __init__(self, send):
+        self.send = send
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.duplicates = 0
+        self.sent = 0
+
+    def submit(self, to_number, bodies):
+        """Send one number's reminders; returns a Future per SMS sent."""
+        unique = list(dict.fromkeys(bodies))
+        batches = []
+        for body in unique:
+            if batches and len(merge_bodies(batches[-1] + [body])) <= MAX_BODY_CHARS:
+                batches[-1].append(body)
+            else:
+                batches.append([body])
+        with self._lock:
+            self.submitted += len(bodies)
+            self.duplicates += len(bodies) - len(unique)
+            self.sent += len(batches)
+        return [self._send(to_number, batch) for batch in batches]
+
+    def _send(self, to_number, bodies):
+        future = Future()
+        try:
+            job = self.send(to_number, merge_bodies(bodies))
+        except Exception as e:
+            logger.error("Could not dispatch reminders to %s: %s", to_number, e)
+            future.set_exception(e)
+            return future
+        if not isinstance(job, Future):
+            future.set_result(job)
+            return future
+
+        def resolve(job):
+            if job.exception() is not None:
+                future.set_exception(job.exception())
+            else:
+                future.set_result(job.result())
+        job.add_done_callback(resolve)
+        return future
+
+    def stats(self):
+        """Reminders submitted, duplicates dropped, SMS sent and SMS saved."""
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'duplicates': self.duplicates,
+                'sent': self.sent,
+                # Reminders delivered inside another SMS, or dropped
+                'saved': self.submitted - self.sent,
+            }
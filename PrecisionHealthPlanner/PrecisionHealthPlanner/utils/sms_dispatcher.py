@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing ``rate`` acquisitions per second."""
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = float(rate)
+        # Below 1/s the bucket must still fit one whole token
+        self.capacity = max(1.0, float(burst or rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_retryable(error):
+    """Retry throttling, server errors and transport failures, not bad requests."""
+    status = getattr(error, 'status', None)
+    return status is None or status == 429 or status >= 500
+
+
+class SMSDispatcher:
+    """Background SMS sender with bounded concurrency, rate limiting and retries.
+
+    ``client`` is anything exposing Twilio's ``messages.create(body=, from_=, to=)``,
+    so a local fake can stand in for the real SDK. Pass ``rate_limiter`` (any
+    object with ``acquire()``) to share one limit between processes.
+    """
+
+    def __init__(self, client, from_number, concurrency=4, rate_per_second=10,
+                 max_retries=3, backoff=0.5, rate_limiter=None):
+        self.client = client
+        self.from_number = from_number
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter or RateLimiter(rate_per_second)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency,
+                                            thread_name_prefix='sms-dispatch')
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retries = 0
+        self.failures = 0
+
+    def submit(self, to_number, body):
+        """Queue a message and return a Future resolving to the message SID."""
+        return self._executor.submit(self._send, to_number, body)
+
+    def _send(self, to_number, body):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                with span('twilio.messages.create'):
+                    message = self.client.messages.create(
+                        body=body,
+                        from_=self.from_number,
+                        to=to_number
+                    )
+                with self._lock:
+                    self.sent += 1
+                return getattr(message, 'sid', None)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    logger.error("Failed to send SMS to %s: %s", to_number, e)
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                with self._lock:
+                    self.retries += 1
+                delay = self.backoff * 2 ** attempt
+                logger.warning("SMS to %s failed (%s), retrying in %.1fs",
+                               to_number, e, delay)
+                time.sleep(delay)
+
+    def stats(self):
+        """Messages sent, retry attempts, and messages that failed for good."""
+        with self._lock:
+            return {'sent': self.sent, 'retries': self.retries, 'failures': self.failures}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
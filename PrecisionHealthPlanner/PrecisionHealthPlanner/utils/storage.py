@@ -0,0 +1,40 @@
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+# Root directory for on-disk state shared by every Streamlit worker
+DATA_DIR = os.getenv(
+    'HEALTH_PLANNER_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+)
+
+# SQLite connections shared by all sessions in a process
+POOL_SIZE = 8
+
+
+def data_path(*parts):
+    """Return a path under DATA_DIR, creating its parent directory."""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections usable from any thread."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._connections.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._connections.put(conn)
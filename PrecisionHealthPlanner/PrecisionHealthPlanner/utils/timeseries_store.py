@@ -0,0 +1,185 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import data_path
+
+# Health metrics stored per reading, with their on-disk dtypes
+METRIC_DTYPES = {
+    'blood_pressure': np.float32,
+    'glucose_levels': np.float32,
+    'cholesterol': np.float32,
+}
+TIMESTAMP_COLUMN = 'timestamp'
+
+# Most points per metric the dashboard sends to the browser
+MAX_TREND_POINTS = 2000
+
+
+def _patient_dir_name(patient_id):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(patient_id))
+
+
+class TimeSeriesStore:
+    """Append-only columnar store of health readings.
+
+    Readings are partitioned by patient and calendar month; each partition
+    holds one raw binary file per column (epoch-second int64 timestamps and
+    float32 metrics). Partitions are read back with ``np.memmap``, so a
+    range query within one month returns views of the mapped file rather
+    than copies; queries spanning several months concatenate the slices.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or data_path('timeseries', '')
+
+    def _columns(self, metrics):
+        return {TIMESTAMP_COLUMN: np.int64,
+                **{metric: METRIC_DTYPES[metric] for metric in metrics}}
+
+    def _partition(self, patient_id, month):
+        return os.path.join(self.root, _patient_dir_name(patient_id), month)
+
+    def _column_length(self, partition, column, dtype):
+        path = os.path.join(partition, f'{column}.bin')
+        if not os.path.exists(path):
+            return 0
+        # A torn write can leave a partial value at the end; ignore it
+        return os.path.getsize(path) // np.dtype(dtype).itemsize
+
+    def _read_column(self, partition, column, dtype, length=None):
+        available = self._column_length(partition, column, dtype)
+        length = available if length is None else min(length, available)
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(partition, f'{column}.bin'), dtype=dtype, mode='r',
+                         shape=(length,))
+
+    def _partition_length(self, partition, metrics):
+        # Columns are appended one after another; trust only complete rows
+        return min(self._column_length(partition, column, dtype)
+                   for column, dtype in self._columns(metrics).items())
+
+    def append(self, patient_id, timestamps, metrics):
+        """Append readings; ``timestamps`` must not precede stored readings.
+
+        ``timestamps`` is anything ``pd.to_datetime`` accepts and ``metrics``
+        maps each metric name in METRIC_DTYPES to an equal-length array.
+        """
+        times = pd.to_datetime(timestamps).to_numpy(dtype='datetime64[s]')
+        if np.any(np.diff(times.astype(np.int64)) < 0):
+            raise ValueError("Readings must be appended in time order")
+        columns = {TIMESTAMP_COLUMN: times.astype(np.int64)}
+        for metric, dtype in METRIC_DTYPES.items():
+            columns[metric] = np.asarray(metrics[metric], dtype=dtype)
+            if len(columns[metric]) != len(times):
+                raise ValueError(f"Expected {len(times)} values for {metric}")
+
+        months = times.astype('datetime64[M]')
+        boundaries = np.flatnonzero(months[1:] != months[:-1]) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(times)]):
+            partition = self._partition(patient_id, str(months[start]))
+            os.makedirs(partition, exist_ok=True)
+            stored = self._partition_length(partition, METRIC_DTYPES)
+            if stored:
+                last = self._read_column(partition, TIMESTAMP_COLUMN, np.int64, stored)[-1]
+                if columns[TIMESTAMP_COLUMN][start] < last:
+                    raise ValueError("Readings must be appended in time order")
+            # Timestamps last, so a torn write never exposes a partial row; the
+            # rows it left in other columns are cut off before appending
+            for column in list(METRIC_DTYPES) + [TIMESTAMP_COLUMN]:
+                with open(os.path.join(partition, f'{column}.bin'), 'ab') as f:
+                    f.truncate(stored * np.dtype(columns[column].dtype).itemsize)
+                    f.write(columns[column][start:end].tobytes())
+
+    def months(self, patient_id):
+        """Sorted partition months ('YYYY-MM') stored for a patient."""
+        patient_dir = os.path.join(self.root, _patient_dir_name(patient_id))
+        if not os.path.isdir(patient_dir):
+            return []
+        return sorted(os.listdir(patient_dir))
+
+    def query(self, patient_id, start=None, end=None, metrics=None):
+        """Return {'timestamp': datetime64[s], metric: values} for [start, end)."""
+        metrics = list(metrics or METRIC_DTYPES)
+        start = None if start is None else np.datetime64(pd.Timestamp(start), 's')
+        end = None if end is None else np.datetime64(pd.Timestamp(end), 's')
+        columns = self._columns(metrics)
+
+        pieces = {column: [] for column in columns}
+        for month in self.months(patient_id):
+            month_start = np.datetime64(month, 's')
+            month_end = np.datetime64(np.datetime64(month, 'M') + 1, 's')
+            if (start is not None and month_end <= start) or (end is not None and month_start >= end):
+                continue
+            partition = self._partition(patient_id, month)
+            length = self._partition_length(partition, metrics)
+            timestamps = self._read_column(partition, TIMESTAMP_COLUMN, np.int64, length)
+            lo = 0 if start is None else np.searchsorted(timestamps, start.astype(np.int64))
+            hi = length if end is None else np.searchsorted(timestamps, end.astype(np.int64))
+            for column, dtype in columns.items():
+                pieces[column].append(self._read_column(partition, column, dtype, length)[lo:hi])
+
+        result = {}
+        for column, dtype in columns.items():
+            parts = pieces[column]
+            result[column] = (parts[0] if len(parts) == 1
+                              else np.concatenate(parts) if parts
+                              else np.empty(0, dtype=dtype))
+        result[TIMESTAMP_COLUMN] = result[TIMESTAMP_COLUMN].view('datetime64[s]')
+        return result
+
+
+def downsample(timestamps, values, max_points=MAX_TREND_POINTS):
+    """Reduce sorted readings to at most ``max_points`` equal-width time buckets.
+
+    Returns (bucket start times, min, max, mean) arrays; empty buckets are
+    dropped rather than filled.
+    """
+    if len(timestamps) <= max_points:
+        values = np.asarray(values, dtype=float)
+        return np.asarray(timestamps), values, values, values
+
+    seconds = np.asarray(timestamps).astype('datetime64[s]').astype(np.int64)
+    span = seconds[-1] - seconds[0] + 1
+    buckets = (seconds - seconds[0]) * max_points // span
+    starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+    counts = np.diff(np.r_[starts, len(seconds)])
+
+    values = np.asarray(values, dtype=float)
+    bucket_times = (seconds[0] + buckets[starts] * span // max_points).astype('datetime64[s]')
+    return (bucket_times,
+            np.minimum.reduceat(values, starts),
+            np.maximum.reduceat(values, starts),
+            np.add.reduceat(values, starts) / counts)
+
+
+def get_health_trends(patient_id, max_points=MAX_TREND_POINTS, store=None):
+    """Downsampled trends for the dashboard, or None if nothing is stored."""
+    store = store or TimeSeriesStore()
+    readings = store.query(patient_id)
+    if not len(readings[TIMESTAMP_COLUMN]):
+        return None
+
+    trends = {}
+    for metric in METRIC_DTYPES:
+        bucket_times, _, _, means = downsample(readings[TIMESTAMP_COLUMN],
+                                               readings[metric], max_points)
+        trends[metric] = means.tolist()
+    trends['dates'] = np.datetime_as_string(bucket_times, unit='m').tolist()
+    return trends
+
+
+def latest_readings(patient_id, store=None):
+    """Each metric's most recent reading, or None if nothing is stored."""
+    store = store or TimeSeriesStore()
+    months = store.months(patient_id)
+    if not months:
+        return None
+    # Only the newest partition has to be read
+    readings = store.query(patient_id, start=months[-1])
+    if not len(readings[TIMESTAMP_COLUMN]):
+        return None
+    return {metric: float(readings[metric][-1]) for metric in METRIC_DTYPES}